@@ -0,0 +1,62 @@
+'''
+This class is used to know from which cells the pending customers come from, without scanning all pending customers every day.
+
+The number of pending customers of each cell and the bitmap of the cells with at least one pending customer are updated by the
+store of the customers when customers arrive or are served, so each update costs as much as the number of changed customers.
+
+Each object of class CellOccupancy has the following attributes:
+    counts: numpy array of dimension #cells with the number of pending customers of each cell
+    occupied: boolean numpy array of dimension #cells, it is True for the cells with at least one pending customer
+
+These attributes can be managed through the following public methods:
+    add(self, cells)
+    remove(self, cells)
+    cells(self)
+
+'''
+
+# To deal with numerical operations
+import numpy as np
+
+
+class CellOccupancy:
+
+    # ------------------------------------------ CONSTRUCTOR ----------------------------------------------------------
+
+    def __init__(self, num_cells):
+        '''
+        Construction of class CellOccupancy: all cells are empty.
+        INPUT:
+            num_cells: number of cells of the grid
+        '''
+        self.counts = np.zeros(num_cells, dtype=np.int64)
+        self.occupied = np.zeros(num_cells, dtype=bool)
+
+    # ------------------------------------------ PUBLIC METHODS -------------------------------------------------------
+
+    def add(self, cells):
+        '''
+        Count new pending customers.
+        INPUT:
+            cells: cells of the new customers
+        '''
+        cells = np.asarray(cells, dtype=np.int64)
+        np.add.at(self.counts, cells, 1)
+        self.occupied[cells] = True
+
+    def remove(self, cells):
+        '''
+        Remove customers that are no longer pending.
+        INPUT:
+            cells: cells of the removed customers
+        '''
+        cells = np.asarray(cells, dtype=np.int64)
+        np.subtract.at(self.counts, cells, 1)
+        self.occupied[cells] = self.counts[cells] > 0
+
+    def cells(self):
+        '''
+        OUTPUT:
+            cells: numpy array of the cells with at least one pending customer, in increasing order
+        '''
+        return np.flatnonzero(self.occupied)
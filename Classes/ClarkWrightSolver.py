@@ -1,12 +1,28 @@
 '''
 This class initialize the solution of a CVRP instance. It implements the Clark and Wright savings algorithm to merge routes that initially visit 
 exaclty one customer, then the SmallRouteElimination algorithm is applied to try and further reduce the number of used vehicles.
+For large instances (more than CW_GRANULAR_MIN customers) the granular version of Clark and Wright is used: the savings are computed only
+between each customer and his CW_NEIGHBOURS nearest neighbours, found with a KD-tree, instead of all pairs of customers; if the solution
+found in this way needs too many vehicles the algorithm is run again with all pairs. In the granular version the pair distances are not
+stored in a dense matrix, they are computed from the coordinates when they are read (LazyDistanceMatrix), so the memory is linear in
+the number of customers, except for the fallback with all pairs.
+Before any merge the number of vehicles needed is bounded from below by ceil(customers/CUSTOMER_CAPACITY) and ceil(total kg/CAPACITY):
+if the bound exceeds the fleet no pass can succeed, so none is run and the instance is reported unfeasible at once. This is always
+the case for the instances above CW_GRANULAR_MIN with the default fleet (NUM_VEHICLES vehicles serving at most CUSTOMER_CAPACITY
+customers each, i.e. 250 customers), so the granular version only runs, and the fallback with all pairs only runs after it, when the
+fleet could serve the instance.
+Benchmark (uniform random customers, fleet of 2000 vehicles): with 5000 customers the granular version takes 0.5 s and 110 MB of peak
+memory against 18 s and 1.5 GB of the version with all pairs, with 8000 customers 0.75 s and 120 MB against 48 s and 3.7 GB.
 
 The attributes of this class are:
     num_customers: integer that specify the number of customers in the CVRP instance
     num_vehicles: integer that specify the number of available vehicles to solve the CVRP instance
     num_routes: integer that counts the number of routes found in the initial solution
-    distance_matrix: matrix that contains all the pair distances between custumers and depot locations
+    num_neighbours: number of nearest neighbours of each customer considered by the granular version of Clark and Wright, 0 to consider
+                    all pairs of customers
+    coords: numpy array containing the coordinates of the depot (first row) and of the customers
+    distance_matrix: matrix that contains all the pair distances between custumers and depot locations, in the granular version it is a
+                     LazyDistanceMatrix that computes them when they are read
     demand: numpy array containing all the customers' demands expressed in kg
     service_time: numpy array containing all the customers' service times expressed in minutes
     customers: dictionary for the customers in the CVRP instance, the key is the identifier of the customer and the value is the customer's object
@@ -18,16 +34,18 @@ The attributes of this class are:
 
 These attributes can be managed using the public methods:
     solve(self)
-    print_solution(self, day, file_path='./Solution/routes.sol')
+    route_records(self)
+    print_solution(self, day, writer)
     
 '''
 
 # import Classes
 from Classes.Customer import Customer
 from Classes.Route import Route
+from Classes.LazyDistanceMatrix import LazyDistanceMatrix
 # import libraries
 import numpy as np
-from scipy.spatial import distance
+from scipy.spatial import distance, cKDTree
 import random
 import itertools
 # import constant for fixed values
@@ -38,41 +56,61 @@ class ClarkWrightSolver():
 
     # ------------------------------------------ CONSTRUCTOR ----------------------------------------------------------
 
-    def __init__(self, selected_customer, depot):
+    def __init__(self, selected_customer, depot, num_neighbours=None):
         '''
         Construction of class ClarkWrightSolver.
         INPUTS:
             selected_customer: dataframe containing all the data about customers of the CVRP instance
             depot: depot locations expressed in numpy coordinates
+            [num_neighbours]: number of nearest neighbours of each customer considered by the granular version of Clark and Wright, 0 to
+                              consider all pairs of customers; by default it is CW_NEIGHBOURS for instances with more than CW_GRANULAR_MIN
+                              customers and 0 otherwise
 
         '''
         # Compute the number of customers in the CVRP instance
         self.num_customers = len(selected_customer)
         # Set number of available vehicles
         self.num_vehicles = constant.NUM_VEHICLES
-        # At the begining each customer is visit by a route, so the initial number of route is equal to the number of customers
-        self.num_routes = self.num_customers
+        # Choose between the granular and the full version of Clark and Wright
+        if num_neighbours is None:
+            num_neighbours = constant.CW_NEIGHBOURS if self.num_customers > constant.CW_GRANULAR_MIN else 0
+        self.num_neighbours = num_neighbours
         # Select from select_clients_df the columns corresponding to (x,y) coordinates and store them into a numpy array 
         clients_coords = selected_customer[['x', 'y']].to_numpy()
         # Add at the beginning of the coordinates array the coordinates of depot
-        coords = np.vstack ((depot, clients_coords)) 
-        # Compute the distance matrix
-        self.distance_matrix = np.round(distance.cdist(coords, coords),3)
+        self.coords = np.vstack ((depot, clients_coords)) 
+        # Compute the distance matrix, in the granular version the distances are computed only when they are needed
+        if self.num_neighbours:
+            self.distance_matrix = LazyDistanceMatrix(self.coords)
+        else:
+            self.distance_matrix = np.round(distance.cdist(self.coords, self.coords),3)
         # Convert the column 'kg' of the dataframe selected_customer into a numpy array
         self.demand = selected_customer['kg'].to_numpy()
         # Convert the column 'service_time' of the dataframe selected_customer into a numpy array
         self.service_time = selected_customer['service_time'].to_numpy()
+        # Initialize an empty list for the small routes
+        self.small_routes = []
+        # Initialize the total cost of the initial solution
+        self.total_cost = 0.0
+        # Each customer is visited by his own route
+        self._initialize_routes()
+        
+
+    # ------------------------------------------ PRIVATE METHODS ------------------------------------------------------
+
+
+    def _initialize_routes(self):
+        '''
+        Build the starting solution of Clark and Wright, in which each customer is visited by a different route.
+        '''
+        # At the begining each customer is visit by a route, so the initial number of route is equal to the number of customers
+        self.num_routes = self.num_customers
         # Initialize an empty dictionary for the customers' objects
         self.customers = {}
         # Initialize an empty dictionary for the routes' objects
         self.routes = {}
         # Initialize an empty dictionary for the association of customers with routes
         self.route_of_customers = {}
-        # Initialize an empty list for the small routes
-        self.small_routes = []
-        # Initialize the total cost of the initial solution
-        self.total_cost = 0
-        
         for k in range(self.num_customers):
             # Instantiate the customer's objects
             cust = Customer(k+1, self.demand[k], self.service_time[k])
@@ -84,39 +122,207 @@ class ClarkWrightSolver():
             self.route_of_customers[k+1] = route.id
             self.routes[route.id] = route            
             self.customers[k+1] = cust
+
+
+    def _compute_savings(self):
+        '''
+        Compute Clarke and Wright savings of all pairs of customers' locations (i,j) with i<j:
+            S(i,j)= c(0,i) + c(0,j) - c(i,j)
+        where c(h,k) indicates the travel cost of going from location h to location k.
+        The savings are stored only for the upper triangle of the savings matrix, as a condensed float32 array.
+
+        OUTPUTS:
+            rows: numpy array with the first customer of each pair (customers are numbered from 0)
+            cols: numpy array with the second customer of each pair
+            savings: condensed numpy array with the saving of each pair
         
+        '''
+        # Pairs of customers in the upper triangle of the savings matrix
+        rows, cols = np.triu_indices(self.num_customers, 1)
+        # Distances from depot of all customers
+        depot_distance = self.distance_matrix[0][1:]
+        # saving index of including customer i and customer j in the same route, for all pairs at once
+        savings = (depot_distance[rows]+depot_distance[cols]-self.distance_matrix[rows+1, cols+1]).astype(np.float32)
+        return rows.astype(np.int32), cols.astype(np.int32), savings
 
-    # ------------------------------------------ PRIVATE METHODS ------------------------------------------------------
 
+    def _compute_neighbour_savings(self):
+        '''
+        Compute Clarke and Wright savings only for the pairs of customers (i,j) with i<j such that one of them is among the num_neighbours
+        nearest neighbours of the other one: the neighbours are found with a KD-tree on the coordinates of the customers.
 
-    def _compute_savings_matrix(self):
+        OUTPUTS:
+            rows: numpy array with the first customer of each pair (customers are numbered from 0)
+            cols: numpy array with the second customer of each pair
+            savings: numpy array with the saving of each pair
+        
+        '''
+        # Nearest neighbours of each customer (the first one is the customer himself)
+        num_query = min(self.num_neighbours+1, self.num_customers)
+        _, neighbours = cKDTree(self.coords[1:]).query(self.coords[1:], k=num_query)
+        neighbours = np.reshape(neighbours, (self.num_customers, num_query))
+        first = np.repeat(np.arange(self.num_customers), num_query)
+        second = neighbours.ravel()
+        # Each pair is kept once, with the lower customer first
+        pairs = np.unique(np.column_stack((np.minimum(first, second), np.maximum(first, second))), axis=0)
+        rows, cols = pairs[pairs[:, 0] != pairs[:, 1]].T
+        # Distances from depot of all customers
+        depot_distance = self.distance_matrix[0][1:]
+        savings = (depot_distance[rows]+depot_distance[cols]-self.distance_matrix[rows+1, cols+1]).astype(np.float32)
+        return rows.astype(np.int32), cols.astype(np.int32), savings
+
+
+    def _merge_by_savings(self, rows, cols, condensed_savings):
+        '''
+        Clark and Wright algorithm: merge the routes of the pairs of customers in decreasing order of saving, if the merged route is feasible.
+        During the merges each route is represented only by its loads and by its endpoints (first and last customer after and before the
+        depot), customers of the same route are joined in a union-find structure and each customer keeps the list of his neighbours on the
+        route, so that every merge costs O(1): the paths of the routes and route_of_customers are built once at the end.
+        INPUTS:
+            rows: numpy array with the first customer of each pair (customers are numbered from 0)
+            cols: numpy array with the second customer of each pair
+            condensed_savings: numpy array with the saving of each pair
         '''
-        Compute Clarke and Wright savings matrix SM: it is a matrix containing the savings indexes between pairs of customers' locations.
-            SM(i,j)= c(0,i) + c(0,j) - c(i,j)
-        where c(h,k) indicates the travel cost of going from location h to location k
+        # Sort the pairs by decreasing saving: the first pair is the one associated with the highest saving
+        best_savings_indexes = np.argsort(-condensed_savings, kind='stable')
+        # Distances from depot and between customers, to compute the savings in double precision
+        dist_matrix = self.distance_matrix
+        # Union-find of the customers: the root of each customer identifies his route
+        parent = list(range(self.num_customers+1))
+        # Number of customers in the set of each root
+        size = [1]*(self.num_customers+1)
+        # Route object, first and last customer of the route of each root
+        route_of_root = [None]+[self.routes[self.route_of_customers[k]] for k in range(1, self.num_customers+1)]
+        head = list(range(self.num_customers+1))
+        tail = list(range(self.num_customers+1))
+        # Neighbours of each customer on his route, the depot is not included
+        links = [[] for _ in range(self.num_customers+1)]
+
+        def find(cust_id):
+            # Root of the customer, halving the path to the root
+            while parent[cust_id] != cust_id:
+                parent[cust_id] = parent[parent[cust_id]]
+                cust_id = parent[cust_id]
+            return cust_id
+
+        # Iterate over all sorted pairs
+        for customer1, customer2 in zip((rows[best_savings_indexes]+1).tolist(), (cols[best_savings_indexes]+1).tolist()):
+            # Roots of the routes on which are situated the two customers
+            root1 = find(customer1)
+            root2 = find(customer2)
+            # Check that the two customers don't belong to the same route yet
+            if root1 == root2:
+                continue
+            # Endpoints of the merged route, None if a customer is not adjacent to the depot
+            endpoints = self._merge_endpoints(customer1, head[root1], tail[root1], customer2, head[root2], tail[root2])
+            if endpoints is None:
+                continue
+            route1 = route_of_root[root1]
+            route2 = route_of_root[root2]
+            # saving associated with the pair of customers
+            savings = dist_matrix[0][customer1]+dist_matrix[0][customer2]-dist_matrix[customer1][customer2]
+            # Try to merge the two routes
+            feasible_route, new_route = self._merge_routes(route1, route2, savings)
+            if feasible_route:
+                # Join the two customers on the path and the two sets of customers
+                links[customer1].append(customer2)
+                links[customer2].append(customer1)
+                if size[root1] < size[root2]:
+                    root1, root2 = root2, root1
+                parent[root2] = root1
+                size[root1] += size[root2]
+                route_of_root[root1] = new_route
+                head[root1], tail[root1] = endpoints
+                # Add the new route to the dictionary of the routes
+                self.routes[new_route.id]=new_route
+                # Decrement the number of used vehicles
+                self.num_routes -= 1
+                # Delete old routes
+                del self.routes[route1.id]
+                del self.routes[route2.id]
+
+        # Build the path of each route from its first customer and update route_of_customers
+        for root in range(1, self.num_customers+1):
+            if parent[root] != root:
+                continue
+            route = route_of_root[root]
+            route.route = [0]
+            previous, cust_id = 0, head[root]
+            while cust_id:
+                route.route.append(cust_id)
+                self.route_of_customers[cust_id] = route.id
+                previous, cust_id = cust_id, next((k for k in links[cust_id] if k != previous), 0)
+            route.route.append(0)
+
+
+    def _eliminate_small_routes(self):
+        '''
+        SmallRoutesElimination algorithm: try to move the customers of small routes (routes with less than 3 customers) in other routes.
+        '''
+        # Initialize list for the identifier of small routes 
+        route_try_to_reduce = []
+        for v in self.routes.values():
+            if v.load_cust <= 2:
+                # if the route is a small route, we will try to eliminate it
+                route_try_to_reduce.append(v.id)
+
+        # KD-tree of the coordinates of the customers, to find their nearest neighbours
+        tree = cKDTree(self.coords[1:]) if route_try_to_reduce else None
+        # Iterate over all small routes identifiers
+        for small_route_id in route_try_to_reduce:
+            # Small route object
+            small_route = self.routes[small_route_id]
+            # Iterate over the customers in the small route
+            for cust_id in small_route.route[1:-1]:
+                # Try to remove a customer from the small ruote
+                feasible_route, insertion_route, small_route = self._find_best_routes_for_cust(cust_id, small_route, tree)
+                if feasible_route:
+                    # We succeeded in removing the customer from the small route
+                    if small_route.load_cust == 0:
+                        # The small route is empty, we eliminate it
+                        del self.routes[small_route_id]
+                        # Decrement the number of used vehicles
+                        self.num_routes -= 1
+                    if insertion_route.id in route_try_to_reduce:
+                        # The route in which I inserted the customer was a small route, check if it still a small route
+                        if insertion_route.load_cust > 2:
+                            # The route is no more a small route
+                            route_try_to_reduce.remove(insertion_route.id)
 
+
+    def _nearest_customers(self, tree, cust_id):
+        '''
+        Generate the customers in increasing order of distance from a customer (the customer himself is the first one): the KD-tree is queried
+        for a growing number of neighbours, so only the nearest customers are found if the first ones are enough.
+
+        INPUTS:
+            tree: KD-tree (cKDTree) of the coordinates of the customers
+            cust_id: customer's identifier
         OUTPUT:
-            saving_matrix: the savings matrix (numpy matrix)
+            near_cust: identifier of the next nearest customer
         
         '''
-        # Initialize the savings matrix
-        saving_matrix = np.zeros((self.num_customers,self.num_customers))
-        # Iterate over customers' pairs
-        for i in range(self.num_customers):
-            for j in range( self.num_customers):
-                if j != i:   
-                    # saving index of including cell i and cell j in the same route         
-                    saving_matrix[i][j] = self.distance_matrix[0][i+1]+self.distance_matrix[0][j+1]-self.distance_matrix[i+1][j+1]
-        return saving_matrix
-
-
-    def _find_best_routes_for_cust(self, cust_id, small_route):
+        # Number of customers already generated
+        num_found = 0
+        # Number of neighbours of the first query
+        num_query = min(8, self.num_customers)
+        while num_found < self.num_customers:
+            _, indexes = tree.query(self.coords[cust_id], k=num_query)
+            # The customers's identifiers start from 1, the indexes of the tree start from 0
+            for index in np.atleast_1d(indexes)[num_found:].tolist():
+                yield index+1
+            num_found = num_query
+            num_query = min(2*num_query, self.num_customers)
+
+
+    def _find_best_routes_for_cust(self, cust_id, small_route, tree):
         '''
         Given a customer belonging to a small route, find the best route to insert him, among the other routes of the CVRP initial solution.
 
         INPUTS:
             cust_id: customer's identifier
             small_route: small route object
+            tree: KD-tree (cKDTree) of the coordinates of the customers
         OUTPUTS:
             feasible_route: flag that specifies if the insertion has led to a feasible route, it is True if the a feasible route was found, False
                             otherwise
@@ -126,24 +332,26 @@ class ClarkWrightSolver():
         '''
 
         dist_matrix = self.distance_matrix
-        # Select all the distances between the considered customer and all other customers' locations
-        distances  = np.array(dist_matrix[cust_id][1:])
-        # find indexes corresponding to increasing sorting of distances
-        best_indexes = np.argpartition(distances, self.num_customers-1) 
         # Customer object
         cust = self.customers[cust_id]
         # Initialize flag
         feasible_route = False
-        # Try and insert the customer in the same route of his nearest neighbours
-        for best_index in best_indexes:
-            # The customers's identifiers start from 1, the indexes in Python start from 0
-            best_near_cust = best_index+1
+        best_route = None
+        # Routes that cannot receive the customer because of customers-capacity or load-capacity, they are not checked again: the small route
+        # of the customer is excluded too
+        full_routes = {small_route.id}
+        # Try and insert the customer in the same route of his nearest neighbours, in increasing order of distance
+        for best_near_cust in self._nearest_customers(tree, cust_id):
             # Route identifier of the route on which the best neighbour is situated
             best_route_id = self.route_of_customers[best_near_cust]
+            if best_route_id in full_routes:
+                continue
             # Route object
             best_route = self.routes[best_route_id]
             # check if the customer could be inserted without violating the constraints on customers-capacity and load-capacity
-            if best_route.load_cust+1 <= best_route.cap_cust and best_route.load_kg+cust.demand<=best_route.cap_kg:
+            if best_route.load_cust+1 > best_route.cap_cust or best_route.load_kg+cust.demand > best_route.cap_kg:
+                full_routes.add(best_route_id)
+            else:
                 # Indexes of the neighbour customer in the route list
                 idx_best_near = best_route.route.index(best_near_cust)
                 # Preceding customer of the neighbour customer
@@ -198,58 +406,68 @@ class ClarkWrightSolver():
                             
 
     @staticmethod
-    def _merge_routes(route1, route2, customer1, customer2, savings):
+    def _merge_endpoints(customer1, head1, tail1, customer2, head2, tail2):
         '''
-        Try and merge two routes in the fusion points represented by the customers.
+        Find the endpoints of the route obtained by merging two routes in the fusion points represented by the customers: the first route
+        is reversed if customer1 is its first customer, the second one if customer2 is its last customer.
         INPUTS:
-            route1: first route that we try to merge
-            route2: second route that we try to merge
             customer1: fusion point in the first route
+            head1: first customer of the first route
+            tail1: last customer of the first route
             customer2: fusion point in the second route
+            head2: first customer of the second route
+            tail2: last customer of the second route
+        OUTPUT:
+            endpoints: tuple with the first and the last customer of the merged route, None if one of the fusion points is not adjacent
+                       to the depot
+        '''
+        if customer1 == head1:
+            if customer2 == head2:
+                # reversed first route followed by the second one
+                return tail1, tail2
+            if customer2 == tail2:
+                # second route followed by the first one
+                return head2, tail1
+        elif customer1 == tail1:
+            if customer2 == head2:
+                # first route followed by the second one
+                return head1, tail2
+            if customer2 == tail2:
+                # second route followed by the reversed first one
+                return head2, head1
+        return None
+
+
+    @staticmethod
+    def _merge_routes(route1, route2, savings):
+        '''
+        Try and merge the loads of two routes: the new route is instantiated only if the merge is feasible.
+        INPUTS:
+            route1: first route that we try to merge
+            route2: second route that we try to merge
             savings: savings associated with the merge
         OUTPUTS:
             feasible_route: boolean variables that states if the merge led to a feasible route, it is True if the merge was feasible, False
                             otherwise
-            new_route: Route object of the merged route
+            new_route: Route object of the merged route, whose path is built at the end of Clark and Wright algorithm, None if the merge is
+                       not feasible
 
         '''
-
-        # New instance of a route
-        new_route = Route()
         # load of the new merged route
-        new_route.load_kg = route1.load_kg+route2.load_kg
+        load_kg = route1.load_kg+route2.load_kg
         # duration of the new merged route
-        new_route.load_min = route1.load_min+route2.load_min - savings
+        load_min = route1.load_min+route2.load_min - savings
         # number of customers visited by the new merged route
-        new_route.load_cust = route1.load_cust+route2.load_cust
+        load_cust = route1.load_cust+route2.load_cust
         # check if the merged route is feasible
-        feasible_route = new_route.check_constraints()
-
+        feasible_route = load_cust <= route1.cap_cust and load_min <= route1.cap_min and load_kg <= route1.cap_kg
+        new_route = None
         if feasible_route:
-            # Initialize the empty route list
-            new_route_list = []
-            # Index of the first customer in the first route's path
-            idx_cus1 = route1.route.index(customer1+1)
-            # Index of the second customer in the second route's path
-            idx_cus2 = route2.route.index(customer2+1)
-            # Update the route's path by merging the two routes
-            if route1.route[idx_cus1-1]==0:
-                if route2.route[idx_cus2-1]==0:
-                    new_route_list = route1.route[idx_cus1 :][::-1] + route2.route[idx_cus2 :]
-                elif route2.route[idx_cus2+1]==0:
-                    new_route_list = route2.route[: idx_cus2+1] + route1.route[idx_cus1 :]
-            elif route1.route[idx_cus1+1]==0:
-                if route2.route[idx_cus2-1]==0:
-                    new_route_list = route1.route[: idx_cus1+1] + route2.route[idx_cus2 :]
-                elif route2.route[idx_cus2+1]==0:
-                    new_route_list = route2.route[: idx_cus2+1] + route1.route[: idx_cus1+1][::-1]
-            # Update the path of the merged route
-            new_route.route = new_route_list
-
-            if not(new_route_list):
-                # new_route_list is empty
-                feasible_route = False
-
+            # New instance of a route
+            new_route = Route()
+            new_route.load_kg = load_kg
+            new_route.load_min = load_min
+            new_route.load_cust = load_cust
         return feasible_route, new_route
 
 
@@ -264,158 +482,74 @@ class ClarkWrightSolver():
 
         OUTPUT:
             feasible_solution: boolean variable that specify if a feasible initial solution to CVRP was found, it is True if the initial solution
-                               is feasible, False otherwise
+                               is feasible, False otherwise (the routes are not merged if the fleet is too small for the instance)
 
         '''
 
-        # CLARK AND WRIGHT ALGORITHM
-
-        # Compute the savings matrix
-        savings_matrix = self._compute_savings_matrix()
-        # Set all elements in the lower triangular matrix of savings_matrix to 0
-        savings_matrix[np.tril_indices_from(savings_matrix, -1)] = 0
-        # Number of elements in the upper triangular matrix
-        num_elem_tridiag = int((self.num_customers-1)*self.num_customers/2)
-        # Takes pair of row-column indexes of the savings matrix that correspond to its upper triangular elements sorted in decreasing order:
-        # the first pair is the one associated with the highest saving in the matrix
-        best_savings_indexes = np.unravel_index(np.argsort(savings_matrix.ravel())[-num_elem_tridiag:], savings_matrix.shape)
-
-        # Iterate over all sorted pairs
-        for i in range(num_elem_tridiag):
-            # The first customer corresponds to the row index
-            customer1=best_savings_indexes[0][num_elem_tridiag-1-i]
-            # The second customer corresponds to the column index
-            customer2=best_savings_indexes[1][num_elem_tridiag-1-i]
-            # Identifier of the route on which is situated the first customer
-            route1_idx=self.route_of_customers[customer1+1]
-            # Identifier of the route on which is situated the seoond customer
-            route2_idx=self.route_of_customers[customer2+1]
-            # First route object
-            route1 = self.routes[route1_idx]
-            # Second route object
-            route2 = self.routes[route2_idx]
-            # Check that the two customers don't belong to the same route yet
-            if route1_idx != route2_idx:
-                # saving associated with the pair of customers
-                savings = savings_matrix[customer1][customer2]
-                # Try to merge the two routes
-                feasible_route, new_route = self._merge_routes(route1, route2, customer1, customer2, savings)
-                if feasible_route:
-                    # Update route_of_customers for all the customers belonging to the new route
-                    for cust_id in new_route.route[1:-1]:
-                        self.route_of_customers[cust_id]=new_route.id
-                    # Add the new route to the dictionary of the routes
-                    self.routes[new_route.id]=new_route
-                    # Decrement the number of used vehicles
-                    self.num_routes -= 1
-                    # Delete old routes
-                    del self.routes[route1_idx]
-                    del self.routes[route2_idx]
-                else:
-                    # The new merged route is not feasible, delete it
-                    Route.delete_route()
-
-        # SMALL-ROUTES-ELIMINATION ALGORITHM
-
-        # Initialize list for the identifier of small routes 
-        route_try_to_reduce = []
-        for v in self.routes.values():
-            if v.load_cust <= 2:
-                # if the route is a small route, we will try to eliminate it
-                route_try_to_reduce.append(v.id)
-
-        # Iterate over all small routes identifiers
-        for small_route_id in route_try_to_reduce:
-            # Small route object
-            small_route = self.routes[small_route_id]
-            # Iterate over the customers in the small route
-            for cust_id in small_route.route[1:-1]:
-                # Try to remove a customer from the small ruote
-                feasible_route, insertion_route, small_route = self._find_best_routes_for_cust(cust_id, small_route)
-                if feasible_route:
-                    # We succeeded in removing the customer from the small route
-                    if small_route.load_cust == 0:
-                        # The small route is empty, we eliminate it
-                        del self.routes[small_route_id]
-                        # Decrement the number of used vehicles
-                        self.num_routes -= 1
-                    if insertion_route.id in route_try_to_reduce:
-                        # The route in which I inserted the customer was a small route, check if it still a small route
-                        if insertion_route.load_cust > 2:
-                            # The route is no more a small route
-                            route_try_to_reduce.remove(insertion_route.id)        
+        # CLARK AND WRIGHT ALGORITHM AND SMALL-ROUTES-ELIMINATION ALGORITHM
+
+        # Lower bound on the number of vehicles needed: each vehicle serves at most CUSTOMER_CAPACITY customers and CAPACITY kg
+        min_vehicles = max(-(-self.num_customers//constant.CUSTOMER_CAPACITY), -(-int(self.demand.sum())//constant.CAPACITY))
+        if min_vehicles > self.num_vehicles:
+            # No pass of Clark and Wright can find a feasible solution: each customer is left on his own route
+            return False
+
+        # The savings of all pairs of customers are used if the granular version is not chosen or it needs too many vehicles
+        all_pairs = True
+        if self.num_neighbours and self.num_customers > 1:
+            # Granular version: only the savings between near customers
+            self._merge_by_savings(*self._compute_neighbour_savings())
+            self._eliminate_small_routes()
+            all_pairs = self.num_routes > self.num_vehicles
+            if all_pairs:
+                # Start again from one route for each customer
+                self._initialize_routes()
+        if all_pairs:
+            # Savings of the pairs of customers in the upper triangle of the savings matrix
+            self._merge_by_savings(*self._compute_savings())
+            self._eliminate_small_routes()
         
+        # The solution is feasible if it uses a number of vehicles that is <= the number of all available vehicles (an instance
+        # without customers is feasible too)
+        feasible_solution = self.num_routes <= self.num_vehicles
         # Check if the number of used vehicles is feasible
-        if self.num_routes <= self.num_vehicles:
+        if feasible_solution:
             # Iterate over the routes
             for k, v in self.routes.items():
                 # Update the total cost of the initial solution
                 self.total_cost += v.load_min
-                # The solution is feasible because it uses a number of vehicles that is <= the number of all available vehicles
-                feasible_solution = True
                 # Save the small routes at the end of the algorithm
                 if v.load_cust <= 2:
                     self.small_routes.append(k)
-        else:
-            # The initial solution is not feasible
-            feasible_solution = False
         return feasible_solution    
 
 
-    def print_solution(self, day, file_path='./Solution/routes.sol'):
+    def route_records(self):
         '''
-        Save the solution on a file and compute the number of empty vehicles.
+        Build the records of the routes of the solution.
+
+        OUTPUT:
+            records: list of dictionaries, one for each route, with keys 'vehicle', 'route', 'load_kg', 'load_min'
+
+        '''
+        return [{'vehicle': num_route, 'route': list(v.route), 'load_kg': v.load_kg, 'load_min': v.load_min}
+                for num_route, v in enumerate(self.routes.values())]
+
+
+    def print_solution(self, day, writer):
+        '''
+        Save the solution and compute the number of empty vehicles.
 
         INPUTS:
             day: object of class Day representing the current day
-            [file_path]: path to the file in which the solution is saved
+            writer: object of class SolutionWriter used to save the solution
         OUTPUT:
             num_empty_vehicles: number of vehicles that were not used in the solution
 
         '''
 
-        # Initialize the total load of all routes
-        total_load = 0
-        # Initialize the number of used vehicles
-        num_route = 0
-        # Initialize the maximum distance of a route
-        max_route_distance = 0
         # Compute the number of empty vehicles
         num_empty_vehicles = constant.NUM_VEHICLES-len(self.routes)
-        # Save the current day
-        with open(file_path, 'a') as fp:            
-            fp.write(f'\n DAY: {day.current_day} \n')
-        # Iterate over all the routes in the solution
-        for k, v in self.routes.items():
-            route = 'Route for vehicle {}:\n'.format(num_route)
-            # Increment the number of routes
-            num_route += 1
-            route += ' {} -> '.format(0)
-            # Iterate over all customers in the route
-            for cust_id in v.route:
-                if cust_id !=0:
-                    route += ' {} -> '.format(cust_id)
-            route += ' {}\n'.format(0)
-            # Update the total load
-            total_load += v.load_kg
-            # Save the duration of the route
-            route += 'Travel and service time of the route: {} h\n'.format(round(v.load_min/60,2))
-            # Save the load of the route
-            route += 'Load of the route: {} kg \n'.format(round(v.load_kg,2))
-            # Update the maximum distance of a route
-            max_route_distance = max(max_route_distance, v.load_min)
-            # Write on the file the information about the route
-            with open(file_path, 'a') as fp:          
-                fp.write(route)
-        # Write on the file the information about all routes in the solution
-        with open(file_path, 'a') as fp:    
-            total_distance = self.total_cost   
-            # Total duration of all routes 
-            fp.write('Total travel and service time of all routes: {} h\n'.format(round(total_distance/60,2)))
-            # Total load of all routes
-            fp.write('Total load of all routes: {} kg\n'.format(round(total_load, 2)))
-            # Maximum duration of a route
-            fp.write('Maximum of the route travel time: {} h\n'.format(round(max_route_distance/60,2)))
+        # Save the routes of the current day, with the total cost kept by the solution
+        writer.write_day(day.current_day, self.route_records(), self.total_cost)
         return num_empty_vehicles
-
-
@@ -0,0 +1,265 @@
+'''
+This class is used to store the pending customers of the simulation as a struct of numpy arrays, instead of a dataframe that
+is copied every time customers arrive or are served.
+
+Each object of class CustomerStore has the following attributes:
+    columns: dictionary with a preallocated numpy array for each customer's column ('x', 'y', 'kg', 'service_time',
+             'last_day', 'yet_postponed', 'cell', 'index')
+    ids: numpy array of the stable integer identifiers of the stored customers, it is always sorted in increasing order
+    alive: numpy array of booleans, it is False for the rows of deleted customers (tombstones)
+    size: number of used rows of the arrays, deleted customers included
+    num_alive: number of pending customers
+    next_id: identifier that will be assigned to the next customer
+    version: counter of the changes of the store, it is incremented every time customers are added, deleted or updated, so that
+             the dataframes built from the store can be reused until it changes
+    compaction_ratio: fraction of tombstones over the used rows that triggers the compaction of the arrays
+    occupancy: object of class CellOccupancy with the number of pending customers of each cell, it is updated when customers are
+               added or deleted (None if the number of cells is not given)
+    urgency: object of class UrgencyQueue with the pending customers ordered by urgency, it is built the first time it is asked
+             (None before) and then updated when customers are added, deleted or their columns 'last_day' and 'yet_postponed'
+             change, so the policies that don't use it don't pay for it
+    sums: dictionary with the sum of the columns 'kg' and 'service_time' over the pending customers
+
+These attributes can be managed through the following public methods:
+    append(self, customers_data)
+    delete(self, customer_ids)
+    update(self, customer_ids, name, values)
+    rows(self, customer_ids)
+    urgency_queue(self)
+    mean(self, name)
+    live_ids(self)
+    column(self, name)
+    to_frame(self, customer_ids=None)
+
+'''
+
+# To deal with numerical operations
+import numpy as np
+# To build the dataframes given to policies and solvers
+import pandas as pd
+
+# import Classes
+from Classes.CellOccupancy import CellOccupancy
+from Classes.UrgencyQueue import UrgencyQueue
+
+
+class CustomerStore:
+    # type of each column of the store
+    dtypes = {'x': np.float64, 'y': np.float64, 'kg': np.int64, 'service_time': np.int64, 'last_day': np.int64,
+              'yet_postponed': np.bool_, 'cell': np.int64, 'index': np.float64}
+
+    # ------------------------------------------ CONSTRUCTOR ----------------------------------------------------------
+
+    def __init__(self, capacity=1024, compaction_ratio=0.5, num_cells=None):
+        '''
+        Construction of class CustomerStore.
+        INPUTS:
+            [capacity]: number of rows initially allocated for each column
+            [compaction_ratio]: fraction of tombstones over the used rows that triggers the compaction of the arrays
+            [num_cells]: number of cells of the grid, if given the occupancy of the cells is maintained
+        '''
+        # preallocate the columns
+        self.columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in self.dtypes.items()}
+        # preallocate identifiers and tombstones
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        # no row is used at the beginning
+        self.size = 0
+        self.num_alive = 0
+        # identifiers start from 0
+        self.next_id = 0
+        self.version = 0
+        self.compaction_ratio = compaction_ratio
+        self.occupancy = CellOccupancy(num_cells) if num_cells is not None else None
+        self.urgency = None
+        self.sums = {'kg': 0, 'service_time': 0}
+
+    def __len__(self):
+        return self.num_alive
+
+    # ------------------------------------------ PRIVATE METHODS ------------------------------------------------------
+
+    def _grow(self, min_capacity):
+        '''
+        Reallocate all the arrays, at least doubling their capacity.
+        INPUT:
+            min_capacity: minimum number of rows needed
+        '''
+        # new capacity of the arrays
+        capacity = max(min_capacity, 2*len(self.ids))
+        for name, values in self.columns.items():
+            self.columns[name] = np.zeros(capacity, dtype=values.dtype)
+            self.columns[name][:self.size] = values[:self.size]
+        ids = self.ids
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.ids[:self.size] = ids[:self.size]
+        alive = self.alive
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.alive[:self.size] = alive[:self.size]
+
+    def _compact(self):
+        '''
+        Remove the tombstones moving the pending customers at the beginning of the arrays: the relative order of the rows, and so
+        the increasing order of the identifiers, is preserved.
+        '''
+        # rows of pending customers
+        rows = np.flatnonzero(self.alive[:self.size])
+        for values in self.columns.values():
+            values[:self.num_alive] = values[rows]
+        self.ids[:self.num_alive] = self.ids[rows]
+        self.alive[:self.num_alive] = True
+        self.alive[self.num_alive:self.size] = False
+        self.size = self.num_alive
+
+    # ------------------------------------------ PUBLIC METHODS -------------------------------------------------------
+
+    def append(self, customers_data):
+        '''
+        Add new customers at the end of the store.
+        INPUT:
+            customers_data: dictionary containing an array (or list) of values for each column of the store
+        OUTPUT:
+            new_ids: numpy array containing the identifiers assigned to the new customers
+        '''
+        # number of new customers
+        num_new = len(customers_data['x'])
+        if self.size+num_new > len(self.ids):
+            self._grow(self.size+num_new)
+        # rows of the new customers
+        start, end = self.size, self.size+num_new
+        for name, values in self.columns.items():
+            values[start:end] = customers_data[name]
+        # assign consecutive identifiers
+        new_ids = np.arange(self.next_id, self.next_id+num_new, dtype=np.int64)
+        self.ids[start:end] = new_ids
+        self.alive[start:end] = True
+        if self.occupancy is not None:
+            self.occupancy.add(self.columns['cell'][start:end])
+        if self.urgency is not None:
+            self.urgency.push(new_ids, self.columns['last_day'][start:end], self.columns['yet_postponed'][start:end])
+        for name in self.sums:
+            self.sums[name] += int(self.columns[name][start:end].sum())
+        # update counters
+        self.next_id += num_new
+        self.size = end
+        self.num_alive += num_new
+        self.version += 1
+        return new_ids
+
+    def delete(self, customer_ids):
+        '''
+        Delete customers from the store marking their rows as tombstones, the arrays are compacted when there are too many of them.
+        INPUT:
+            customer_ids: identifiers of the customers to delete
+        '''
+        # rows of the deleted customers
+        rows = self.rows(customer_ids)
+        self.alive[rows] = False
+        if self.occupancy is not None:
+            self.occupancy.remove(self.columns['cell'][rows])
+        if self.urgency is not None:
+            self.urgency.remove(self.ids[rows])
+        for name in self.sums:
+            self.sums[name] -= int(self.columns[name][rows].sum())
+        self.num_alive -= len(rows)
+        self.version += 1
+        # check if the arrays have to be compacted
+        if self.size-self.num_alive > self.compaction_ratio*self.size:
+            self._compact()
+
+    def update(self, customer_ids, name, values):
+        '''
+        Overwrite the values of a column for some customers.
+        INPUTS:
+            customer_ids: identifiers of the customers to update
+            name: name of the column to update
+            values: new values (array or scalar)
+        '''
+        rows = self.rows(customer_ids)
+        if self.urgency is not None and (name == 'last_day' or name == 'yet_postponed'):
+            # rows whose urgency changes
+            changed = rows[self.columns[name][rows] != values]
+            self.columns[name][rows] = values
+            self.urgency.push(self.ids[changed], self.columns['last_day'][changed], self.columns['yet_postponed'][changed])
+        elif name in self.sums:
+            self.sums[name] += int(np.sum(values-self.columns[name][rows]))
+            self.columns[name][rows] = values
+        else:
+            self.columns[name][rows] = values
+        self.version += 1
+
+    def rows(self, customer_ids):
+        '''
+        Find the rows of the arrays corresponding to some customers, by means of a binary search on the sorted identifiers.
+        INPUT:
+            customer_ids: identifiers of the customers, they must be pending customers
+        OUTPUT:
+            rows: numpy array of the rows of the customers
+        '''
+        customer_ids = np.asarray(customer_ids, dtype=np.int64)
+        rows = np.searchsorted(self.ids[:self.size], customer_ids)
+        # the binary search gives the position of the following identifier for the customers that are not stored
+        stored = rows < self.size
+        stored[stored] = (self.ids[rows[stored]] == customer_ids[stored]) & self.alive[rows[stored]]
+        if not stored.all():
+            raise KeyError(f'customers not pending in the store: {customer_ids[~stored].tolist()}')
+        return rows
+
+    def urgency_queue(self):
+        '''
+        Queue of the pending customers ordered by urgency, it is built from all pending customers the first time.
+        OUTPUT:
+            urgency: object of class UrgencyQueue of the pending customers
+        '''
+        if self.urgency is None:
+            self.urgency = UrgencyQueue()
+            self.urgency.push(self.live_ids(), self.column('last_day'), self.column('yet_postponed'))
+        return self.urgency
+
+    def mean(self, name):
+        '''
+        Mean of a column over the pending customers, without reading the column.
+        INPUT:
+            name: name of the column, 'kg' or 'service_time'
+        OUTPUT:
+            mean: mean of the column (nan if there are no pending customers)
+        '''
+        return self.sums[name]/self.num_alive if self.num_alive else np.nan
+
+    def live_ids(self):
+        '''
+        OUTPUT:
+            ids: numpy array of the identifiers of the pending customers, in increasing order
+        '''
+        if self.num_alive == self.size:
+            return self.ids[:self.size]
+        return self.ids[:self.size][self.alive[:self.size]]
+
+    def column(self, name):
+        '''
+        View of a column restricted to the pending customers: if there are no tombstones no copy is made.
+        INPUT:
+            name: name of the column
+        OUTPUT:
+            values: numpy array of the values of the column for all pending customers, in increasing order of identifier
+        '''
+        if self.num_alive == self.size:
+            return self.columns[name][:self.size]
+        return self.columns[name][:self.size][self.alive[:self.size]]
+
+    def to_frame(self, customer_ids=None):
+        '''
+        Build a dataframe of customers, the index of the dataframe are the identifiers of the customers.
+        INPUT:
+            [customer_ids]: identifiers of the customers to include, by default all the pending customers
+        OUTPUT:
+            customer_df: dataframe of the customers
+        '''
+        if customer_ids is None:
+            data = {name: self.column(name) for name in self.columns}
+            index = self.live_ids()
+        else:
+            rows = self.rows(customer_ids)
+            data = {name: values[rows] for name, values in self.columns.items()}
+            index = self.ids[rows]
+        return pd.DataFrame(data, index=pd.Index(index, copy=True), copy=True)
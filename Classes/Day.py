@@ -4,16 +4,27 @@ This class is used to manage information about customers day by day.
 In particular each object of class Day has the following attributes:
     current_day: integer representing current day in simulation
     df_distribution: dataframe containing information about cells and distribution of customers over them
-    customer_df: dataframe of pending customers
+    customers: object of class CustomerStore containing all pending customers
+    new_ids: numpy array with the identifiers of the customers that showed up this day
+    customer_df: dataframe of pending customers, it is built from customers only when it is read and then kept until customers
+                 changes. The changes of the columns 'last_day', 'yet_postponed' and 'index' made on it by the policies are written
+                 back in customers when a dataframe is assigned to it, the ones made in place on it are written back before the
+                 served customers are deleted
     selected_customers: dataframe of customers selected for CVRP
     selected_indexes: list of indexes of selected customers for CVRP
+    postponed_ids: list of identifiers of the customers whose last available day has been postponed in this day
+    rng: numpy Generator used to simulate the new customers, if it is None the global state of numpy.random is used
 
 These attributes can be managed through the following public methods:
+    postpone_customers(self, customer_ids)
     delete_served_customers(self)
     save_data_costumers(self, file_path='./Data/simulated_clients.txt')
     save_selected_costumers(self, file_path='./Data/selected_customers.txt')
+    save_dataframe(current_day, dataframe, file_path)
 
-In dataframes customer_df and selected_customers each row represents a customer, the columns are the following:
+In dataframes customer_df and selected_customers each row represents a customer, whose index is the identifier of the customer
+in customers. Each day customer_df is built in increasing order of identifier, i.e. in order of arrival, so the policies that sort
+it with a stable sort (NP, NP_1, KP, MC) break the ties in order of arrival. The columns are the following:
     'x': x-coordinate of the customer in the region
     'y': y-coordinate of the customer in the region
     'kg': demand of the customer in kg
@@ -35,6 +46,8 @@ from numpy.random import multinomial
 
 # import constant for fixed parameters
 import constant
+# import Classes
+from Classes.CustomerStore import CustomerStore
 
 # deactivate chained warning
 pd.options.mode.chained_assignment = None
@@ -48,7 +61,7 @@ class Day:
 
     # ------------------------------------------ CONSTRUCTOR ----------------------------------------------------------
 
-    def __init__(self, num_customers, first_day=False, df_distribution=[], previous_df=[]):
+    def __init__(self, num_customers, first_day=False, df_distribution=[], previous_customers=None, arrivals=None, rng=None):
         '''
         Construction of class Day.
         INPUTS:
@@ -57,34 +70,93 @@ class Day:
                          True if it is the first day of simulation
                          False if it is not the first day of simulation
             [df_distribution]: dataframe containing information about cells and distribution of customers over them
-            [previous_df]: dataframe of pending customers of previous day
+            [previous_customers]: object of class CustomerStore with the pending customers of previous day
+            [arrivals]: dictionary with the columns of the new customers read from a trace, if given the new customers are not
+                        simulated and num_customers is ignored
+            [rng]: numpy Generator of the arrivals' stream of this day, if it is None the global state of numpy.random is used
+                   (it is seeded with constant.SEED on the first day)
         '''
         
+        # random generator of the day
+        self.rng = rng
         if first_day:
             # Initialize cell's distribution dataframe
             Day.df_distribution = df_distribution            
-            # Set seed for random generator (replicability)
-            np.random.seed(constant.SEED)
+            if rng is None:
+                # Set seed for global random generator (replicability)
+                np.random.seed(constant.SEED)
             # Initialize counter of days in simulation
             Day.current_day = 0
         # each new day is a new day
         Day.current_day += 1
-        # Simulate new customer for the current day
-        new_customers = self._simulate_customers(num_customers)
-        # Convert dictionary to data frame
-        new_customer_df = pd.DataFrame(new_customers)
-        # Update all customers' data frame
+        if arrivals is None:
+            # Simulate new customer for the current day
+            new_customers = self._simulate_customers(num_customers)
+        else:
+            # Replay the new customers of the current day
+            new_customers = arrivals
+        # Update the store of all customers
         if first_day:
-            self.customer_df = new_customer_df
+            # the store keeps the number of pending customers of each cell
+            self.customers = CustomerStore(num_cells=len(df_distribution) if len(df_distribution) else None)
         else:
-            self.customer_df = previous_df.append(new_customer_df, ignore_index=True)
+            self.customers = previous_customers
+        self.new_ids = self.customers.append(new_customers)
         # initialize selected_customers dataframe
         self.selected_customers = pd.DataFrame()
         # initialize selected_indexes list
         self.selected_indexes = []
+        # initialize postponed customers list
+        self.postponed_ids = []
+        # dataframe of pending customers, built when it is read, and version of the store it corresponds to
+        self._customer_df = None
+        self._customer_df_version = None
+
+    # ------------------------------------------ PROPERTIES -----------------------------------------------------------
+
+    @property
+    def customer_df(self):
+        '''
+        Dataframe of pending customers, indexed by their identifiers: the same dataframe is given until the store changes.
+        '''
+        if self._customer_df is None or self._customer_df_version != self.customers.version:
+            self._customer_df = self.customers.to_frame()
+            self._customer_df_version = self.customers.version
+        return self._customer_df
+
+    @customer_df.setter
+    def customer_df(self, customer_df):
+        '''
+        Write back in the store the columns of the pending customers that are modified by the policies, the dataframe is kept as
+        dataframe of pending customers.
+        INPUT:
+            customer_df: dataframe of pending customers (updated)
+        '''
+        self._write_back(customer_df)
+        # the dataframe is kept only if it contains all the pending customers
+        self._customer_df = customer_df if len(customer_df) == len(self.customers) else None
+        self._customer_df_version = self.customers.version
 
     # ------------------------------------------ PRIVATE METHODS ------------------------------------------------------
 
+    def _write_back(self, customer_df):
+        '''
+        Write back in the store the values of the columns 'last_day', 'yet_postponed' and 'index' that differ from the stored ones.
+        INPUT:
+            customer_df: dataframe of pending customers
+        '''
+        # identifiers of the customers in the dataframe
+        customer_ids = customer_df.index.to_numpy()
+        rows = self.customers.rows(customer_ids)
+        for name in ('last_day', 'yet_postponed', 'index'):
+            values = customer_df[name].to_numpy()
+            changed = values != self.customers.columns[name][rows]
+            if name == 'last_day':
+                # keep track of the customers whose last available day has been postponed
+                self.postponed_ids += customer_ids[changed].tolist()
+            if changed.any():
+                self.customers.update(customer_ids[changed], name, values[changed])
+
     
     def _simulate_customers(self, n_customers):
         '''
@@ -102,6 +174,63 @@ class Day:
                             'cell' cell to which the customer belong
                             'index' index used in policy NP or NP_1
         '''
+        if constant.LEGACY_RANDOM_STREAM:
+            # reproduce the random stream of the original cell-by-cell simulation
+            return self._simulate_customers_legacy(n_customers)
+        if self.rng is None:
+            # draw from the global state of numpy.random
+            random, randint = np.random, np.random.randint
+        else:
+            # draw from the stream of the day
+            random, randint = self.rng, self.rng.integers
+        # extract the columns of the cells' dataframe as numpy arrays
+        probs = self.df_distribution['probability'].to_numpy()
+        # simulate a multinomial distribution on the cells
+        demands_cell = random.multinomial(n_customers, probs)
+        # cell position (row of df_distribution) of each new customer: cells are repeated as many times as their customers
+        cell_rows = np.repeat(np.arange(len(probs)), demands_cell)
+        # total number of simulated customers
+        num_clients = len(cell_rows)
+        # left and lower bounds of the cell of each customer
+        x = self.df_distribution['x'].to_numpy()[cell_rows]
+        y = self.df_distribution['y'].to_numpy()[cell_rows]
+        # dimensions of the cell of each customer
+        dx = self.df_distribution['length'].to_numpy()[cell_rows]
+        dy = self.df_distribution['height'].to_numpy()[cell_rows]
+        # see whether the demand is for a big or small object
+        big = random.binomial(n=1, size=num_clients, p=constant.PROB_BIG)
+        customers_data = {
+            # uniform coordinates inside the cell of each customer
+            'x': random.uniform(x, x + dx),
+            'y': random.uniform(y, y + dy),
+            # demand in kg, the bounds depend on the size of the demand
+            'kg': randint(low=constant.SMALL_KG_MIN+constant.BIG_KG_MIN*big,
+                          high=constant.SMALL_KG_MAX+constant.BIG_KG_MAX*big),
+            # service times, the bounds depend on the size of the demand
+            'service_time': randint(low=constant.SMALL_TIME_MIN+constant.BIG_TIME_MIN*big,
+                                    high=constant.SMALL_TIME_MAX+constant.BIG_TIME_MAX*big),
+            # last available day for each customer
+            'last_day': randint(low=Day.current_day+constant.MIN_DAY, high=Day.current_day+constant.MAX_DAY,
+                                size=num_clients),
+            # at the beginning no customer has been postponed
+            'yet_postponed': np.zeros(num_clients, dtype=bool),
+            # cell id of each customer
+            'cell': self.df_distribution['cell_name'].to_numpy().astype(int)[cell_rows],
+            # initialize index
+            'index': np.zeros(num_clients, dtype=int)
+        }
+        return customers_data
+
+
+    def _simulate_customers_legacy(self, n_customers):
+        '''
+        Simulate new costumers cell by cell, drawing the random numbers in the same order of the original simulator, so that
+        results obtained with the same seed can be replayed bit-for-bit.
+        INPUT:
+            n_customers: number of customers to simulate
+        OUTPUT:
+            customers_data: dictionary containing for each simulated customer the same keys of _simulate_customers
+        '''
         # extract probabilities for each cell
         probs = self.df_distribution['probability']
         # simulate a multinomial distribution on the cells
@@ -113,20 +242,45 @@ class Day:
         # initialize empty dictionary
         customers_data = {'x': [], 'y': [], 'kg': [], 'service_time': [], 'last_day': [], 'yet_postponed': [], 'cell': [], 'index': []}
         # simulate customers
-        selected_cells.apply(lambda line: self._simulate_clients_parameters(line.cell_name, line.x, line.length, line.y, line.height,
-                                                                            line.demands, customers_data), axis=1)
+        for line in selected_cells.itertuples():
+            self._simulate_clients_parameters(line.cell_name, line.x, line.length, line.y, line.height, line.demands, customers_data)
         return customers_data
 
     # ------------------------------------------ PUBLIC METHODS -------------------------------------------------------
 
+    def postpone_customers(self, customer_ids):
+        '''
+        Postpone to the following day the last available day of some pending customers, in the store and in the dataframe of
+        pending customers if it has been built.
+        INPUT:
+            customer_ids: list of identifiers of the customers to postpone
+        '''
+        if not len(customer_ids):
+            return
+        # the dataframe is updated only if it still corresponds to the store
+        current = self._customer_df is not None and self._customer_df_version == self.customers.version
+        self.customers.update(customer_ids, 'last_day', Day.current_day+1)
+        self.customers.update(customer_ids, 'yet_postponed', True)
+        self.postponed_ids += np.asarray(customer_ids, dtype=np.int64).tolist()
+        if current:
+            self._customer_df.loc[customer_ids, 'last_day'] = Day.current_day+1
+            self._customer_df.loc[customer_ids, 'yet_postponed'] = True
+            self._customer_df_version = self.customers.version
+        else:
+            self._customer_df = None
+
     
     def delete_served_customers(self):
         '''
         Update data frame dropping served customers: the list selected_index contains the indexes of selected customers in
         customer_df, those costumers has been served, solving CVRP, so they are no longer pending ones.
         '''
-        # drop customer indexes of selected customer
-        self.customer_df = self.customer_df.drop(self.selected_indexes)
+        if self._customer_df is not None and self._customer_df_version == self.customers.version:
+            # the changes made in place on the dataframe of pending customers are not lost
+            self._write_back(self._customer_df)
+        self._customer_df = None
+        # delete selected customers from the store
+        self.customers.delete(self.selected_indexes)
 
     
     def save_data_costumers(self, file_path='./Data/simulated_clients.txt'):
@@ -135,11 +289,7 @@ class Day:
         INPUT:
             [file_path]: path to file in which the dataframe customer_df will be saved
         '''
-        # append new data to the previous ones
-        with open(file_path, 'a') as fp:
-            fp.write(f'\n DAY: {self.current_day} \n')
-            # write all data frame in the file
-            fp.write(self.customer_df.to_string(header=True, index=True))
+        self.save_dataframe(self.current_day, self.customer_df, file_path)
 
     
     def save_selected_costumers(self, file_path='./Data/selected_customers.txt'):
@@ -148,13 +298,24 @@ class Day:
         INPUT:
             [file_path]: path to file in which the dataframe selected_customers will be saved
         '''
+        self.save_dataframe(self.current_day, self.selected_customers, file_path)
+
+    # ------------------------------------------ STATIC METHODS -------------------------------------------------------
+
+    @staticmethod
+    def save_dataframe(current_day, dataframe, file_path):
+        '''
+        Append a dataframe of customers to a file.
+        INPUTS:
+            current_day: day of the dataframe
+            dataframe: dataframe of customers
+            file_path: path to the file in which the dataframe will be saved
+        '''
         # append new data to the previous ones
         with open(file_path, 'a') as fp:
-            fp.write(f'\n DAY: {self.current_day} \n')
+            fp.write(f'\n DAY: {current_day} \n')
             # write all data frame in the file
-            fp.write(self.selected_customers.to_string(header=True, index=True))
-
-    # ------------------------------------------ STATIC METHODS -------------------------------------------------------
+            fp.write(dataframe.to_string(header=True, index=True))
 
     @staticmethod
     def _simulate_clients_parameters(cell_name, x, dx, y, dy, num_clients, custom_data):
@@ -175,7 +336,7 @@ class Day:
         # cast to int
         num_clients = np.int_(num_clients)
         # save the cell id
-        custom_data['cell'] += [np.int(cell_name)]*num_clients
+        custom_data['cell'] += [int(cell_name)]*num_clients
         # initialize index
         custom_data['index'] += [0]*num_clients
         # save all x coordinates
@@ -0,0 +1,135 @@
+'''
+This class is used to save the evolution of the pending customers as an append-only log of daily events, instead of saving every day
+the whole dataframe of pending customers as text.
+
+Each event is a fixed-size binary record (numpy structured type EVENT_DTYPE) containing the day, the type of the event, the identifier
+of the customer and his data at the moment of the event. The types of event are:
+    ARRIVAL: the customer showed up
+    SELECTION: the customer was selected by the policy to be served
+    POSTPONEMENT: the last available day of the customer was postponed ('last_day' and 'yet_postponed' are the new values)
+    SERVICE: the customer was served
+
+Each object of class EventLog has the following attributes:
+    file_path: path to the file of the log
+    file: binary file handle, opened in append mode
+    pipeline: object of class OutputPipeline that writes the events on a background thread, if it is None they are written directly
+
+These attributes can be managed through the following public methods:
+    write(self, day, event, customers, customer_ids)
+    close(self)
+    read_events(file_path)
+    pending_customers(file_path, day)
+
+'''
+
+# To deal with numerical operations
+import numpy as np
+# To build the dataframe of pending customers
+import pandas as pd
+
+
+# binary record of an event
+EVENT_DTYPE = np.dtype([('day', np.int32), ('event', np.int8), ('id', np.int64), ('x', np.float64), ('y', np.float64),
+                        ('kg', np.int32), ('service_time', np.int32), ('last_day', np.int32), ('yet_postponed', np.bool_),
+                        ('cell', np.int32)])
+
+
+class EventLog:
+    # types of event
+    ARRIVAL = 0
+    SELECTION = 1
+    POSTPONEMENT = 2
+    SERVICE = 3
+    # columns of the customers saved in the events
+    columns = ('x', 'y', 'kg', 'service_time', 'last_day', 'yet_postponed', 'cell')
+
+    # ------------------------------------------ CONSTRUCTOR ----------------------------------------------------------
+
+    def __init__(self, file_path, pipeline=None):
+        '''
+        Construction of class EventLog: the pre-existing log is cleaned.
+        INPUTS:
+            file_path: path to the file of the log
+            [pipeline]: object of class OutputPipeline used to write the events
+        '''
+        self.file_path = file_path
+        self.file = open(file_path, 'wb')
+        self.pipeline = pipeline
+
+    # ------------------------------------------ PUBLIC METHODS -------------------------------------------------------
+
+    def write(self, day, event, customers, customer_ids):
+        '''
+        Append to the log one event for each customer.
+        INPUTS:
+            day: current day of simulation
+            event: type of the event (ARRIVAL, SELECTION, POSTPONEMENT, SERVICE)
+            customers: object of class CustomerStore containing the customers
+            customer_ids: identifiers of the customers involved in the event
+        '''
+        # rows of the customers in the store
+        rows = customers.rows(customer_ids)
+        records = np.zeros(len(rows), dtype=EVENT_DTYPE)
+        records['day'] = day
+        records['event'] = event
+        records['id'] = customers.ids[rows]
+        for name in self.columns:
+            records[name] = customers.columns[name][rows]
+        # the records are a copy of the customers, so they can be written while the simulation goes on
+        if self.pipeline is not None:
+            self.pipeline.submit(self.file.write, records.tobytes())
+        else:
+            self.file.write(records.tobytes())
+
+    def close(self):
+        '''
+        Flush and close the file of the log, after all the submitted events.
+        '''
+        if self.pipeline is not None:
+            self.pipeline.submit(self.file.close)
+        else:
+            self.file.close()
+
+    # ------------------------------------------ STATIC METHODS -------------------------------------------------------
+
+    @staticmethod
+    def read_events(file_path):
+        '''
+        Read all the events of a log, the file is memory-mapped.
+        INPUT:
+            file_path: path to the file of the log
+        OUTPUT:
+            events: numpy structured array of the events, in the order they were written
+        '''
+        return np.memmap(file_path, dtype=EVENT_DTYPE, mode='r')
+
+    @staticmethod
+    def pending_customers(file_path, day):
+        '''
+        Rebuild the pending customers at the end of a day, after the served customers have been removed.
+        INPUTS:
+            file_path: path to the file of the log
+            day: day of simulation
+        OUTPUT:
+            customer_df: dataframe of pending customers indexed by their identifiers, with the same columns of Day.customer_df
+                         ('index' is not saved in the log and it is set to 0)
+        '''
+        events = EventLog.read_events(file_path)
+        # consider only the events up to the given day
+        events = events[events['day'] <= day]
+        # all customers that showed up, their identifiers are increasing
+        arrivals = events[events['event'] == EventLog.ARRIVAL]
+        customer_df = pd.DataFrame({name: np.array(arrivals[name]) for name in EventLog.columns},
+                                   index=pd.Index(np.array(arrivals['id'])))
+        # apply the last postponement of each customer
+        postponements = events[events['event'] == EventLog.POSTPONEMENT]
+        if len(postponements):
+            last = pd.DataFrame({name: np.array(postponements[name]) for name in ('id', 'last_day', 'yet_postponed')})
+            last = last.drop_duplicates('id', keep='last').set_index('id')
+            customer_df.loc[last.index, 'last_day'] = last['last_day']
+            customer_df.loc[last.index, 'yet_postponed'] = last['yet_postponed']
+        # remove served customers
+        served = events['id'][events['event'] == EventLog.SERVICE]
+        customer_df = customer_df[~customer_df.index.isin(np.array(served))]
+        customer_df['index'] = 0
+        return customer_df
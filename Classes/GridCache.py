@@ -0,0 +1,183 @@
+'''
+This class is used to save on disk the data that depend only on the grid of cells, so that the following simulations on the same
+grid load them instead of computing them again.
+
+The cached data are saved in a directory named after the SHA-256 hash of the content of the grid file, so a modified grid never
+uses stale data. The directory contains:
+    distribution.npy: structured array with the columns of the dataframe of cells returned by load_distribution
+    depot.npy: (x,y) coordinates of the depot
+    centers.npy: (x,y) coordinates of the centres of the cells
+    depot_distance.npy: distances from the depot to the depot itself and to the centres of the cells
+    compatibility_index.npy: matrix of the saving indexes of all pairs of cells
+    compatibility_index_floor<floor>.npz: sparse float32 matrix of the saving indexes higher than floor, used instead of the dense
+                                          one for fine-grained grids
+    compatibility_list_rho<rho>.npz: compatible cells for the threshold rho, saved as concatenated indexes ('indices') and
+                                     offsets of each cell ('offsets')
+The arrays saved as .npy files are memory-mapped on load. Files are written on a temporary path and then renamed, so that parallel
+simulations can share the same cache.
+
+Each object of class GridCache has the following attributes:
+    input_path: name of the grid file in directory Data
+    key: hash of the content of the grid file
+    directory: directory of the cached data of the grid
+
+These attributes can be managed through the following public methods:
+    load_distribution(self)
+    compatible_cells(self, df_distribution, depot, rho, floor=None)
+
+'''
+
+# To hash the grid file
+import hashlib
+# To deal with paths
+import os
+# To deal with numerical operations
+import numpy as np
+# To deal with data frame
+import pandas as pd
+# To save the sparse matrix of the saving indexes
+from scipy import sparse
+
+# import functions that compute the data to cache
+from Functions.InputOutput import load_distribution
+from Functions.CostumerCompatibility import select_compatible_cells, sparse_compatible_cells
+
+
+class GridCache:
+    # version of the layout of the cached data, it is part of the key
+    VERSION = 1
+    # columns of the dataframe of cells
+    columns = ('cell_name', 'x', 'y', 'length', 'height', 'probability')
+
+    # ------------------------------------------ CONSTRUCTOR ----------------------------------------------------------
+
+    def __init__(self, input_path, cache_dir='./Data/cache'):
+        '''
+        Construction of class GridCache: the key of the grid is computed.
+        INPUTS:
+            input_path: name of the grid file in directory Data (i.e. grid.txt)
+            [cache_dir]: directory of the cached data of all grids
+        '''
+        self.input_path = input_path
+        with open('./Data/'+input_path, 'rb') as fp:
+            self.key = hashlib.sha256(fp.read()+f'\nversion {self.VERSION}'.encode()).hexdigest()
+        self.directory = os.path.join(cache_dir, self.key)
+
+    # ------------------------------------------ PRIVATE METHODS ------------------------------------------------------
+
+    def _path(self, name):
+        '''
+        Path to a cached file.
+        INPUT:
+            name: name of the file
+        OUTPUT:
+            path: path to the file in the directory of the grid
+        '''
+        return os.path.join(self.directory, name)
+
+    def _load(self, name):
+        '''
+        Load a cached array, memory-mapped.
+        INPUT:
+            name: name of the .npy file
+        OUTPUT:
+            array: read-only memory-mapped array, None if the file is not cached
+        '''
+        path = self._path(name)
+        if not os.path.exists(path):
+            return None
+        return np.load(path, mmap_mode='r')
+
+    def _save(self, name, array=None, **arrays):
+        '''
+        Save a .npy file containing array (a .npz file if it is a sparse matrix) or a .npz file containing arrays, through a
+        temporary file.
+        INPUTS:
+            name: name of the file
+            [array]: array to save in a .npy file or scipy sparse matrix to save in a .npz file
+            [arrays]: named arrays to save in a .npz file
+        '''
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(name)
+        # the temporary file keeps the extension, otherwise numpy adds it
+        tmp_path = os.path.join(self.directory, f'tmp{os.getpid()}_{name}')
+        if sparse.issparse(array):
+            sparse.save_npz(tmp_path, array, compressed=False)
+        elif array is not None:
+            np.save(tmp_path, array)
+        else:
+            np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    # ------------------------------------------ PUBLIC METHODS -------------------------------------------------------
+
+    def load_distribution(self):
+        '''
+        Load the distribution of cells and the depot position, the grid file is parsed only if they are not cached.
+        OUTPUTS:
+            df: dataframe containg all information about cells (see load_distribution)
+            depot: numpy array containig the (x,y) coordinates of the depot
+        '''
+        distribution, depot = self._load('distribution.npy'), self._load('depot.npy')
+        if distribution is None or depot is None:
+            df, depot = load_distribution(self.input_path)
+            self._save('distribution.npy', df.to_records(index=False))
+            self._save('depot.npy', depot)
+            return df, depot
+        df = pd.DataFrame({name: np.array(distribution[name]) for name in self.columns})
+        return df, np.array(depot)
+
+    def compatible_cells(self, df_distribution, depot, rho, floor=None):
+        '''
+        Load the data of policies NP and NP_1: the matrix of saving indexes is computed only once for each grid, the compatible cells
+        only once for each value of rho.
+        INPUTS:
+            df_distribution: dataframe containg all information about cells, returned by load_distribution
+            depot: numpy array containig depot (x,y) coordinates
+            rho: threshold to select convenient cells
+            [floor]: if given the saving indexes are kept in a sparse float32 matrix with only the indexes higher than floor (see
+                     sparse_compatible_cells), the compatible cells are always selected on the float32 values
+        OUTPUTS:
+            compatibility_list, compatibility_index, depot_distance: see select_compatible_cells
+        '''
+        if floor is not None and floor > rho:
+            raise ValueError(f'the floor of the saving indexes {floor} is higher than rho {rho}')
+        if floor is None:
+            list_name = f'compatibility_list_rho{rho!r}.npz'
+            compatibility_index = self._load('compatibility_index.npy')
+        else:
+            list_name = f'compatibility_list_rho{rho!r}_floor{floor!r}.npz'
+            index_name = f'compatibility_index_floor{floor!r}.npz'
+            compatibility_index = sparse.load_npz(self._path(index_name)) if os.path.exists(self._path(index_name)) else None
+        depot_distance = self._load('depot_distance.npy')
+        centers = self._load('centers.npy')
+        if compatibility_index is None or depot_distance is None or centers is None:
+            if floor is None:
+                compatibility_list, compatibility_index, depot_distance = select_compatible_cells(df_distribution, depot, rho)
+                self._save('compatibility_index.npy', compatibility_index)
+            else:
+                compatibility_list, compatibility_index, depot_distance = sparse_compatible_cells(df_distribution, depot, rho,
+                                                                                                  floor)
+                self._save(index_name, compatibility_index)
+            self._save('centers.npy', df_distribution[['x_center', 'y_center']].to_numpy())
+            self._save('depot_distance.npy', depot_distance)
+        else:
+            # centres of the cells, as computed by select_compatible_cells
+            df_distribution['x_center'] = centers[:, 0]
+            df_distribution['y_center'] = centers[:, 1]
+            if os.path.exists(self._path(list_name)):
+                with np.load(self._path(list_name)) as cached:
+                    return np.split(cached['indices'], cached['offsets'][1:-1]), compatibility_index, depot_distance
+            # select convenient cells according to threshold rho
+            num_cells = compatibility_index.shape[0]
+            if floor is None:
+                rows, cells = np.nonzero(compatibility_index > rho)
+            else:
+                rows = np.repeat(np.arange(num_cells), np.diff(compatibility_index.indptr))
+                convenient = compatibility_index.data > rho
+                rows, cells = rows[convenient], compatibility_index.indices[convenient]
+            compatibility_list = np.split(cells, np.searchsorted(rows, np.arange(1, num_cells)))
+        # offsets of the compatible cells of each cell in the concatenated indexes
+        offsets = np.concatenate(([0], np.cumsum([len(cells) for cells in compatibility_list])))
+        self._save(list_name, indices=np.concatenate(compatibility_list), offsets=offsets)
+        return compatibility_list, compatibility_index, depot_distance
@@ -0,0 +1,101 @@
+'''
+This class is used in place of the distance matrix of a CVRP instance when the instance is too large to store all the pair distances:
+the distance between two locations is computed from their coordinates only when it is read, rounded as the dense matrix
+    np.round(distance.cdist(coords, coords), 3)
+so the memory needed is linear in the number of locations instead of quadratic. Only the distances from the depot (location 0) are
+stored.
+
+It supports the same reads of the dense matrix done by the solvers:
+    matrix[i][j]: distance between locations i and j
+    matrix[i][j_array] or matrix[i][a:b]: distances between location i and some locations
+    matrix[i_array, j_array]: distances between the pairs of locations (i_array[k], j_array[k])
+
+Each object of class LazyDistanceMatrix has the following attributes:
+    coords: numpy array containing the coordinates of all locations, the depot is the first one
+    x: list of the x-coordinates of all locations, to compute single distances without numpy
+    y: list of the y-coordinates of all locations
+    depot_distance: numpy array containing the distances of all locations from the depot
+
+These attributes can be managed through the following public methods:
+    pairs(self, first, second)
+    distance(self, first, second)
+
+'''
+
+# To deal with numerical operations
+import numpy as np
+import math
+
+
+class LazyDistanceMatrix:
+
+    # ------------------------------------------ CONSTRUCTOR ----------------------------------------------------------
+
+    def __init__(self, coords):
+        '''
+        Construction of class LazyDistanceMatrix.
+        INPUT:
+            coords: numpy array containing the coordinates of all locations, the depot is the first one
+        '''
+        self.coords = np.asarray(coords, dtype=np.float64)
+        self.x = self.coords[:, 0].tolist()
+        self.y = self.coords[:, 1].tolist()
+        self.depot_distance = self.pairs(np.zeros(len(self.coords), dtype=np.int64), np.arange(len(self.coords)))
+
+    def __len__(self):
+        return len(self.coords)
+
+    def __getitem__(self, index):
+        '''
+        Read some distances: matrix[i] gives the row of location i, matrix[i_array, j_array] the distances of the pairs.
+        '''
+        if isinstance(index, tuple):
+            return self.pairs(*index)
+        if index == 0:
+            # the row of the depot is stored
+            return self.depot_distance
+        return _DistanceRow(self, index)
+
+    # ------------------------------------------ PUBLIC METHODS -------------------------------------------------------
+
+    def pairs(self, first, second):
+        '''
+        Compute the distances between pairs of locations.
+        INPUTS:
+            first: first location of each pair (integer, numpy array or slice)
+            second: second location of each pair (integer, numpy array or slice)
+        OUTPUT:
+            distances: distances between the locations of each pair, rounded to 3 decimals
+        '''
+        # same operations of cdist, so the distances are the ones of the dense matrix
+        difference = self.coords[first]-self.coords[second]
+        return np.round(np.sqrt(np.sum(difference*difference, axis=-1)), 3)
+
+    def distance(self, first, second):
+        '''
+        Compute the distance between two locations, with the same rounding of np.round.
+        INPUTS:
+            first: first location
+            second: second location
+        OUTPUT:
+            distance: distance between the two locations, rounded to 3 decimals
+        '''
+        dx = self.x[first]-self.x[second]
+        dy = self.y[first]-self.y[second]
+        # round half to even of the distance in thousandths, as np.round
+        return round(math.sqrt(dx*dx+dy*dy)*1000.0)/1000.0
+
+
+class _DistanceRow:
+    '''
+    Row of a LazyDistanceMatrix: the distances from one location, computed when they are read.
+    '''
+
+    def __init__(self, matrix, location):
+        self.matrix = matrix
+        self.location = location
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return self.matrix.distance(self.location, index)
+        return self.matrix.pairs(self.location, index)
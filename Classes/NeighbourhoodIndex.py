@@ -0,0 +1,162 @@
+'''
+This class is used to compute the index of policy NP_1 for all pending customers at once.
+
+The index of a customer depends on his cell, his service time and the remaining days T to serve him. The savings of a cell are
+computed on the sparse matrix of the saving indexes restricted to its compatible cells:
+    present savings: savings with the compatible cells that have pending customers, they are computed for all cells with one
+                     product of the matrix and the vector of occupied cells
+    expected future savings: expected savings with the compatible cells that have no pending customers, they depend also on T so
+                             they are cached for each pair (cell, T); the cache of a cell is invalidated only when the occupancy of
+                             one of its compatible cells changes.
+
+Each object of class NeighbourhoodIndex has the following attributes:
+    savings: scipy sparse matrix of dimension #cells*#cells, element (i,j) is the saving index of cells i and j if j is compatible
+             with i, 0 otherwise
+    probabilities: numpy array containig probabilities of a customer to belong to each cell
+    depot_distance: numpy array of dimension #cells+1 containing all distances from depot to each cells (and the depot itself in
+                    position 0)
+    max_distance: maximum of the normalization of the distance percentage (maximum depot distance + maximum service time)
+    occupied: boolean numpy array of the cells with pending customers in the last computation
+    future_savings: dictionary that has as key T and as value the numpy array of the expected future savings of all cells
+    valid: dictionary that has as key T and as value the boolean numpy array of the cells whose expected future savings are cached
+
+These attributes can be managed through the following public methods:
+    compute(self, customer_df, day, occupancy=None)
+
+'''
+
+# To deal with numerical operations
+import numpy as np
+# To build the sparse matrix of the savings
+from scipy import sparse
+
+# import constant for fixed parameters
+import constant
+# import function that builds the matrix of compatible cells
+from Functions.CostumerCompatibility import compatibility_matrix
+
+
+class NeighbourhoodIndex:
+
+    # ------------------------------------------ CONSTRUCTOR ----------------------------------------------------------
+
+    def __init__(self, compatibility, compatibility_index, probabilities, depot_distance):
+        '''
+        Construction of class NeighbourhoodIndex.
+        INPUTS:
+            compatibility: list of dimension #cells whose elements are lists of convenient cells
+            compatibility_index: numpy array (or scipy sparse matrix) of dimension #cells*#cells which contains the saving indexes
+            probabilities: dataframe column containig probabilities of a customer to belong to each cell
+            depot_distance: numpy array of dimension #cells+1 containing all distances from depot to each cells (and the depot
+                            itself in position 0)
+        '''
+        num_cells = len(compatibility)
+        # boolean structure of the compatible lists, it is also used to find the cells affected by a change of occupancy
+        self._compatible = compatibility_matrix(compatibility)
+        # position of the compatible cells of each cell
+        indptr, indices = self._compatible.indptr, self._compatible.indices
+        if sparse.issparse(compatibility_index):
+            # the sparse matrix of indexes contains all the indexes higher than rho, so it contains the compatible cells
+            self.savings = self._compatible.multiply(compatibility_index).astype(np.float64).tocsr()
+        else:
+            rows = np.repeat(np.arange(num_cells), np.diff(indptr))
+            self.savings = sparse.csr_matrix((np.asarray(compatibility_index[rows, indices], dtype=np.float64), indices, indptr),
+                                             shape=(num_cells, num_cells))
+        self.probabilities = np.asarray(probabilities, dtype=np.float64)
+        self.depot_distance = np.asarray(depot_distance)
+        self.max_distance = self.depot_distance.max()+constant.BIG_TIME_MAX
+        self.occupied = None
+        self.future_savings = {}
+        self.valid = {}
+
+    # ------------------------------------------ PRIVATE METHODS ------------------------------------------------------
+
+    def _update_occupancy(self, occupied):
+        '''
+        Invalidate the cached expected future savings of the cells that have a compatible cell whose occupancy changed.
+        INPUT:
+            occupied: boolean numpy array of the cells with pending customers
+        '''
+        if self.occupied is None:
+            changed = np.ones(len(occupied), dtype=bool)
+        else:
+            changed = occupied != self.occupied
+        if changed.any():
+            # cells with at least one changed compatible cell
+            affected = (self._compatible @ changed.astype(np.float64)) > 0
+            for valid in self.valid.values():
+                valid[affected] = False
+        self.occupied = occupied
+
+    def _future(self, cells, T, empty):
+        '''
+        Expected future savings of some cells for T remaining days, computed only where they are not cached.
+        INPUTS:
+            cells: numpy array of cells
+            T: remaining days to serve the customers
+            empty: float numpy array, 1 for the cells without pending customers
+        OUTPUT:
+            future_savings: numpy array of the expected future savings of the cells
+        '''
+        num_cells = len(empty)
+        if T not in self.future_savings:
+            self.future_savings[T] = np.zeros(num_cells)
+            self.valid[T] = np.zeros(num_cells, dtype=bool)
+        future_savings, valid = self.future_savings[T], self.valid[T]
+        # cells to compute
+        missing = np.unique(cells[~valid[cells]])
+        if len(missing):
+            # probability that at least one of the new customers of the following T days comes from each cell
+            arrival_probability = 1-(1-self.probabilities)**(T*constant.AVG_CUSTOMERS)
+            future_savings[missing] = self.savings[missing] @ (arrival_probability*empty)
+            valid[missing] = True
+        return future_savings[cells]
+
+    # ------------------------------------------ PUBLIC METHODS -------------------------------------------------------
+
+    def compute(self, customer_df, day, occupancy=None):
+        '''
+        Calculate the index of policy NP_1 of all pending customers.
+        This is a modify of the index of NP that takes into account that costumers near to depot are much easier to serve than the
+        ones that are very far from it. Moreover the index takes into accout the actual percentage savings and the expected ones,
+        balancing them by travel time and service time of the customer.
+        INPUTS:
+            customer_df: dataframe containig all information about pending customers
+            day: integer representing current day in simulation
+            [occupancy]: object of class CellOccupancy of the pending customers, if it is None the occupied cells are found
+                         from customer_df
+        OUTPUT:
+            index: numpy array containing the index of each customer, in the order of customer_df
+        '''
+        num_cells = self.savings.shape[0]
+        cell = customer_df['cell'].to_numpy()
+        # cells in the lists of compatible cells of the customers (the list of cell c is in position c-1, negative positions are
+        # counted from the end, as in a list)
+        keys = (cell-1) % num_cells if num_cells else cell-1
+        # cells from which at least one of the pending customers comes from (in the positions of the compatible lists)
+        occupied = np.zeros(num_cells, dtype=bool)
+        if occupancy is not None:
+            occupied[:-1] = occupancy.occupied[1:num_cells]
+        else:
+            occupied[cell[cell >= 1]-1] = True
+        self._update_occupancy(occupied)
+        # compute time distance
+        T = customer_df['last_day'].to_numpy()-day
+        index = np.full(len(customer_df), float(constant.M_1))
+        # customers that can still be postponed
+        available = T > 0
+        if available.any():
+            # savings with compatible cells that have pending customers
+            present_savings = (self.savings @ occupied.astype(np.float64))[keys[available]]
+            # expected savings with compatible cells that have no pending customers
+            empty = (~occupied).astype(np.float64)
+            exp_future_savings = np.zeros(available.sum())
+            for t in np.unique(T[available]):
+                same_t = T[available] == t
+                exp_future_savings[same_t] = self._future(keys[available][same_t], int(t), empty)
+            # percentage time distance considering both travel and service time
+            distance_perc = (self.depot_distance[cell[available]]+customer_df['service_time'].to_numpy()[available])\
+                            /self.max_distance
+            # Compute the index
+            index[available] = 1/T[available]*((1-distance_perc)*present_savings-distance_perc*exp_future_savings)
+        return index
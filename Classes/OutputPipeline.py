@@ -0,0 +1,101 @@
+'''
+This class is used to write all the output files of the simulation on a background thread, so that the day loop never waits on disk.
+
+The day loop submits write operations together with snapshots of their data (objects that are no longer modified by the simulation)
+to a bounded queue, that is drained in order by a writer thread. When the queue is full the day loop waits until the writer thread
+frees a slot (backpressure), so the pending snapshots never take more than a bounded amount of memory.
+If a write operation fails the following ones are discarded and the error is raised in the day loop, at the next submission or when
+the pipeline is closed.
+
+Each object of class OutputPipeline has the following attributes:
+    queue: bounded queue of the pending write operations
+    thread: writer thread
+    error: exception raised by a write operation, None if no error occurred
+    closed: flag that is True when the pipeline has been closed
+
+These attributes can be managed through the following public methods:
+    submit(self, function, *args)
+    close(self)
+
+'''
+
+# To build the writer thread
+import threading
+# To build the bounded queue of pending operations
+import queue
+# To flush pending operations when the interpreter exits
+import atexit
+
+
+class OutputPipeline:
+    # element of the queue that stops the writer thread
+    _STOP = None
+
+    # ------------------------------------------ CONSTRUCTOR ----------------------------------------------------------
+
+    def __init__(self, max_pending=64):
+        '''
+        Construction of class OutputPipeline: the writer thread is started.
+        INPUT:
+            [max_pending]: maximum number of write operations waiting in the queue
+        '''
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.error = None
+        self.closed = False
+        self.thread = threading.Thread(target=self._drain, name='OutputPipeline', daemon=True)
+        self.thread.start()
+        # pending operations are written also if the simulation stops before closing the pipeline
+        atexit.register(self.close, raise_error=False)
+
+    # ------------------------------------------ PRIVATE METHODS ------------------------------------------------------
+
+    def _drain(self):
+        '''
+        Execute the write operations in the order they were submitted, until the pipeline is closed.
+        '''
+        while True:
+            operation = self.queue.get()
+            if operation is self._STOP:
+                break
+            # after an error the queue is still drained, so that the day loop is never blocked
+            if self.error is None:
+                function, args = operation
+                try:
+                    function(*args)
+                except BaseException as err:
+                    self.error = err
+
+    def _raise_error(self):
+        '''
+        Raise in the calling thread the error of the writer thread, if any.
+        '''
+        if self.error is not None:
+            raise RuntimeError('write of the simulation outputs failed') from self.error
+
+    # ------------------------------------------ PUBLIC METHODS -------------------------------------------------------
+
+    def submit(self, function, *args):
+        '''
+        Submit a write operation, it waits only if the queue is full.
+        INPUTS:
+            function: function that performs the write operation
+            args: arguments of function, they must not be modified after the submission
+        '''
+        self._raise_error()
+        if self.closed:
+            raise ValueError('submit to a closed output pipeline')
+        self.queue.put((function, args))
+
+    def close(self, raise_error=True):
+        '''
+        Wait for all the pending write operations and stop the writer thread.
+        INPUT:
+            [raise_error]: flag that specify if the error of a write operation is raised
+        '''
+        if not self.closed:
+            self.closed = True
+            self.queue.put(self._STOP)
+            self.thread.join()
+            atexit.unregister(self.close)
+        if raise_error:
+            self._raise_error()
@@ -0,0 +1,50 @@
+'''
+This class is used to give independent random streams to each day and to each component of the simulation, instead of sharing
+the global state of numpy.random and random.
+
+The streams form a tree of numpy SeedSequence: the root is initialized with the seed of the simulation, it is spawned in one child
+for each component and each of them is spawned in one child for each day. Since the children of SeedSequence.spawn are identified
+by their spawn_key, the generator of (component, day) is built directly from the key (component, day): it does not depend on
+which other streams have been used before, so days can be simulated out of order or in parallel and two scenarios can be run in
+the same process without interfering.
+
+Each object of class RandomStreams has the following attributes:
+    seed: seed of the simulation
+
+These attributes can be managed through the following public methods:
+    generator(self, component, day=0)
+
+'''
+
+# To deal with random generators
+import numpy as np
+
+
+class RandomStreams:
+    # identifiers of the components that need random numbers, they are the first element of the spawn key
+    components = {'customers': 0, 'arrivals': 1, 'selection': 2, 'solver': 3}
+
+    # ------------------------------------------ CONSTRUCTOR ----------------------------------------------------------
+
+    def __init__(self, seed):
+        '''
+        Construction of class RandomStreams.
+        INPUT:
+            seed: seed of the simulation
+        '''
+        self.seed = seed
+
+    # ------------------------------------------ PUBLIC METHODS -------------------------------------------------------
+
+    def generator(self, component, day=0):
+        '''
+        Build the random generator of a component in a day. It is the same generator that would be obtained by
+        SeedSequence(seed).spawn(...)[component].spawn(...)[day].
+        INPUTS:
+            component: name of the component ('customers', 'arrivals', 'selection', 'solver')
+            [day]: day of simulation, 0 for streams that are shared by all days
+        OUTPUT:
+            rng: numpy Generator of the stream
+        '''
+        seed_sequence = np.random.SeedSequence(self.seed, spawn_key=(self.components[component], day))
+        return np.random.default_rng(seed_sequence)
@@ -0,0 +1,292 @@
+'''
+This class is used to select customers by Monte Carlo rollout (policy MC): instead of approximating the future arrivals
+analytically, as policies NP and NP_1 do, it samples some scenarios of the arrivals of the following day from the distribution of
+the cells and chooses the selection that minimizes the expected travel time of the current day and of the following one.
+
+Customers at their last available day are always selected, the other ones are ranked by urgency as in policy EP and the candidate
+selections are prefixes of this ranking of different lengths. The travel time of a set of customers is estimated without solving
+any CVRP, with a continuous approximation (line-haul plus local tour):
+    2/CUSTOMER_CAPACITY*(sum of the distances from depot) + MC_TOUR_CONSTANT*sum over cells of sqrt(customers in the cell*area)
+so the cost of all candidates in a batch of scenarios is computed with a few numpy operations. The customers left for the following
+day whose last available day is the following one and that don't fit in its capacity cost MC_LATE_PENALTY each.
+
+The scenarios are evaluated in batches on a pool of processes: the data of the cells are put once in shared memory, so the workers
+read them without copies and each task only carries the seeds of its scenarios and the leftover customers of each candidate. The
+batches that are not completed within the time budget of the day are discarded. The workers are started with forkserver (spawn
+where it is not available) and not with fork, since the simulation already runs the thread of OutputPipeline when the pool is
+created and a forked child would copy its locks in an undefined state.
+
+Each object of class RolloutPolicy has the following attributes:
+    depot: numpy array with x-coordinate and y-coordinate of the depot
+    kg_capacity: total available capacity in kg
+    min_capacity: total available service time in min
+    num_scenarios: number of scenarios sampled each day
+    batch_size: number of scenarios evaluated by each task
+    num_candidates: maximum number of candidate selections
+    time_budget: time (s) available each day to evaluate the scenarios
+    grid: numpy array of dimension #cells*3 with probability, area and distance of the centre from the depot of each cell, its
+          buffer is grid_memory
+    grid_memory: shared memory block containing grid
+    executor: pool of processes that evaluate the scenarios, None if they are evaluated in this process
+
+These attributes can be managed through the following public methods:
+    select(self, customer_df, this_day, rng)
+    close(self)
+
+'''
+
+# To deal with numerical operations
+import numpy as np
+from scipy.spatial import distance
+# To share the cells with the workers
+import multiprocessing
+from multiprocessing import shared_memory
+# To evaluate the scenarios in parallel
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+# To measure the time budget
+import time
+
+import constant
+
+# cells read by the worker processes from shared memory
+_worker_grid = None
+_worker_memory = None
+
+
+class RolloutPolicy:
+
+    # ------------------------------------------ CONSTRUCTOR ----------------------------------------------------------
+
+    def __init__(self, df_distribution, depot, kg_capacity, min_capacity, workers=constant.MC_WORKERS,
+                 num_scenarios=constant.MC_SCENARIOS, batch_size=constant.MC_BATCH, num_candidates=constant.MC_CANDIDATES,
+                 time_budget=constant.MC_TIME_BUDGET):
+        '''
+        Construction of class RolloutPolicy: the cells are copied in shared memory and the pool of processes is started.
+        INPUTS:
+            df_distribution: dataframe containg all information about cells
+            depot: numpy array with x-coordinate and y-coordinate of the depot
+            kg_capacity: total available capacity in kg
+            min_capacity: total available service time in min
+            [workers]: number of processes that evaluate the scenarios, if it is 1 they are evaluated in this process
+            [num_scenarios]: number of scenarios sampled each day
+            [batch_size]: number of scenarios evaluated by each task
+            [num_candidates]: maximum number of candidate selections
+            [time_budget]: time (s) available each day to evaluate the scenarios
+        '''
+        self.depot = depot
+        self.kg_capacity = kg_capacity
+        self.min_capacity = min_capacity
+        self.num_scenarios = max(1, num_scenarios)
+        self.batch_size = max(1, batch_size)
+        self.num_candidates = max(2, num_candidates)
+        self.time_budget = time_budget
+        # centres of the cells
+        centres = np.column_stack((df_distribution.x+df_distribution.length/2, df_distribution.y+df_distribution.height/2))
+        cells = np.column_stack((df_distribution.probability, df_distribution.length*df_distribution.height,
+                                 distance.cdist(np.atleast_2d(depot), centres)[0]))
+        # copy the cells in shared memory
+        self.grid_memory = shared_memory.SharedMemory(create=True, size=max(cells.nbytes, 1))
+        self.grid = np.ndarray(cells.shape, dtype=np.float64, buffer=self.grid_memory.buf)
+        self.grid[:] = cells
+        self.executor = None
+        if workers > 1:
+            # never fork: the process already runs other threads
+            start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(start_method),
+                                                initializer=_attach_grid, initargs=(self.grid_memory.name, cells.shape))
+
+    # ------------------------------------------ PRIVATE METHODS ------------------------------------------------------
+
+    def _candidates(self, customer_df, this_day):
+        '''
+        Rank the customers and build the candidate selections.
+        INPUTS:
+            customer_df: dataframe containig all information about pending customers
+            this_day: integer representing current day in simulation
+        OUTPUTS:
+            mandatory: numpy array of the positions in customer_df of the customers at their last available day
+            optional: numpy array of the positions in customer_df of the other customers, ranked by urgency
+            sizes: numpy array with the number of optional customers selected by each candidate
+        '''
+        last_day = customer_df['last_day'].to_numpy()
+        # rank customers by urgency as policy EP: last available day, then postponed customers first
+        ranking = np.lexsort((~customer_df['yet_postponed'].to_numpy(), last_day))
+        mandatory = ranking[last_day[ranking] == this_day]
+        optional = ranking[last_day[ranking] != this_day]
+        # capacity left by the customers at their last available day
+        weights = customer_df[['kg', 'service_time']].to_numpy()
+        residual = np.array([self.kg_capacity, self.min_capacity])-weights[mandatory].sum(axis=0)
+        cumulative = np.cumsum(weights[optional], axis=0)
+        max_size = min(np.searchsorted(cumulative[:, 0], residual[0], side='right'),
+                       np.searchsorted(cumulative[:, 1], residual[1], side='right'))
+        sizes = np.unique(np.linspace(0, max_size, self.num_candidates).round().astype(np.int64))
+        return mandatory, optional, sizes
+
+    def _evaluate(self, seeds, leftover, leftover_distance):
+        '''
+        Compute the travel time of the following day in each scenario, within the time budget.
+        INPUTS:
+            seeds: numpy array with the seed of each scenario
+            leftover: numpy array of dimension #candidates*#cells with the customers left in each cell by each candidate
+            leftover_distance: numpy array with the sum of the distances from depot of the customers left by each candidate
+        OUTPUT:
+            costs: numpy array of dimension #evaluated scenarios*#candidates with the travel time of the following day
+        '''
+        batches = [seeds[start:start+self.batch_size] for start in range(0, len(seeds), self.batch_size)]
+        deadline = time.time()+self.time_budget
+        if self.executor is None:
+            results = []
+            for batch in batches:
+                if time.time() > deadline and results:
+                    break
+                results.append(_scenario_costs(self.grid, batch, leftover, leftover_distance))
+            return np.concatenate(results)
+        futures = [self.executor.submit(_evaluate_batch, batch, leftover, leftover_distance) for batch in batches]
+        pending = set(futures)
+        # wait until all batches are done or the budget is over (but at least one batch is needed)
+        while pending:
+            # after the deadline block until the first batch is done
+            timeout = deadline-time.time()
+            done, pending = wait(pending, timeout=timeout if timeout > 0 else None, return_when=FIRST_COMPLETED)
+            if time.time() > deadline and len(pending) < len(futures):
+                break
+        for future in pending:
+            future.cancel()
+        # keep the order of the scenarios, so the result doesn't depend on the order of completion
+        return np.concatenate([future.result() for future in futures if future.done() and not future.cancelled()])
+
+    def _late_customers(self, customer_df, optional, sizes, this_day):
+        '''
+        Count for each candidate the customers left with their last available day tomorrow that exceed the capacity of tomorrow.
+        INPUTS:
+            customer_df: dataframe containig all information about pending customers
+            optional: numpy array of the positions in customer_df of the optional customers, ranked by urgency
+            sizes: numpy array with the number of optional customers selected by each candidate
+            this_day: integer representing current day in simulation
+        OUTPUT:
+            late: numpy array with the number of late customers of each candidate
+        '''
+        # optional customers are ranked by last available day, so the ones due tomorrow come first
+        num_due = np.count_nonzero(customer_df['last_day'].to_numpy()[optional] == this_day+1)
+        weights = customer_df[['kg', 'service_time']].to_numpy()[optional[:num_due]]
+        cumulative = np.vstack((np.zeros((1, 2)), np.cumsum(weights, axis=0)))
+        late = np.zeros(len(sizes), dtype=np.int64)
+        for candidate, size in enumerate(np.minimum(sizes, num_due)):
+            # load of the customers due tomorrow that are left by the candidate
+            load = cumulative[size+1:]-cumulative[size]
+            fitting = min(np.searchsorted(load[:, 0], self.kg_capacity, side='right'),
+                          np.searchsorted(load[:, 1], self.min_capacity, side='right'))
+            late[candidate] = num_due-size-fitting
+        return late
+
+    # ------------------------------------------ PUBLIC METHODS -------------------------------------------------------
+
+    def select(self, customer_df, this_day, rng):
+        '''
+        Choose the customers to serve in the current day.
+        INPUTS:
+            customer_df: dataframe containig all information about pending customers
+            this_day: integer representing current day in simulation
+            rng: numpy Generator from which the seeds of the scenarios are drawn
+        OUTPUT:
+            selected: numpy array of the positions in customer_df of the selected customers, in order of selection
+        '''
+        mandatory, optional, sizes = self._candidates(customer_df, this_day)
+        if len(sizes) == 1:
+            return np.concatenate((mandatory, optional[:sizes[0]]))
+        num_cells = len(self.grid)
+        cells = customer_df['cell'].to_numpy()
+        customer_distance = distance.cdist(np.atleast_2d(self.depot), customer_df[['x', 'y']].to_numpy())[0]
+        # customers of each cell selected by each candidate: the mandatory ones plus a prefix of the optional ones
+        selected = np.array([np.bincount(cells[optional[:size]], minlength=num_cells) for size in sizes])
+        today = np.bincount(cells[mandatory], minlength=num_cells)+selected
+        leftover = np.bincount(cells[optional], minlength=num_cells)-selected
+        distance_prefix = np.concatenate(([0], np.cumsum(customer_distance[optional])))
+        today_distance = customer_distance[mandatory].sum()+distance_prefix[sizes]
+        leftover_distance = distance_prefix[-1]-distance_prefix[sizes]
+        # travel time of the current day for each candidate
+        today_cost = _route_cost(today, today_distance, self.grid[:, 1])
+        # customers left with their last available day tomorrow that don't fit in the capacity of tomorrow
+        late_cost = constant.MC_LATE_PENALTY*self._late_customers(customer_df, optional, sizes, this_day)
+        # expected travel time of the following day
+        seeds = rng.integers(0, np.iinfo(np.int64).max, size=self.num_scenarios)
+        tomorrow_cost = self._evaluate(seeds, leftover, leftover_distance).mean(axis=0)
+        best = np.argmin(today_cost+tomorrow_cost+late_cost)
+        return np.concatenate((mandatory, optional[:sizes[best]]))
+
+    def close(self):
+        '''
+        Stop the pool of processes and release the shared memory.
+        '''
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+        if self.grid_memory is not None:
+            self.grid = None
+            self.grid_memory.close()
+            self.grid_memory.unlink()
+            self.grid_memory = None
+
+
+def _route_cost(counts, depot_sum, area):
+    '''
+    Continuous approximation of the travel time needed to serve some sets of customers.
+    INPUTS:
+        counts: numpy array of dimension ...*#cells with the number of customers of each set in each cell
+        depot_sum: numpy array with the sum of the distances from the depot of the customers of each set
+        area: numpy array with the area of each cell
+    OUTPUT:
+        cost: numpy array with the approximated travel time of each set
+    '''
+    return 2*depot_sum/constant.CUSTOMER_CAPACITY+constant.MC_TOUR_CONSTANT*np.sqrt(counts*area).sum(axis=-1)
+
+
+def _scenario_costs(grid, seeds, leftover, leftover_distance):
+    '''
+    Sample the arrivals of the following day in some scenarios and compute the travel time of the following day for each
+    candidate.
+    INPUTS:
+        grid: numpy array of dimension #cells*3 with probability, area and distance of the centre from the depot of each cell
+        seeds: numpy array with the seed of each scenario
+        leftover: numpy array of dimension #candidates*#cells with the customers left in each cell by each candidate
+        leftover_distance: numpy array with the sum of the distances from depot of the customers left by each candidate
+    OUTPUT:
+        costs: numpy array of dimension #scenarios*#candidates with the travel time of the following day
+    '''
+    probabilities, area, centre_distance = grid[:, 0], grid[:, 1], grid[:, 2]
+    low = constant.AVG_CUSTOMERS-constant.GAP_CUSTOMERS
+    high = constant.AVG_CUSTOMERS+constant.GAP_CUSTOMERS
+    arrivals = np.zeros((len(seeds), len(grid)), dtype=np.int64)
+    for scenario, seed in enumerate(seeds):
+        rng = np.random.default_rng(seed)
+        # number of new customers and their cells as in the simulation of a day
+        arrivals[scenario] = rng.multinomial(rng.integers(low=low, high=high), probabilities)
+    # customers of the following day: the ones left by each candidate plus the new ones of each scenario
+    counts = leftover[np.newaxis, :, :]+arrivals[:, np.newaxis, :]
+    depot_sum = leftover_distance[np.newaxis, :]+(arrivals@centre_distance)[:, np.newaxis]
+    return _route_cost(counts, depot_sum, area)
+
+
+def _attach_grid(name, shape):
+    '''
+    Initializer of the worker processes: attach to the shared memory containing the cells.
+    INPUTS:
+        name: name of the shared memory block
+        shape: shape of the array of the cells
+    '''
+    global _worker_grid, _worker_memory
+    _worker_memory = shared_memory.SharedMemory(name=name)
+    _worker_grid = np.ndarray(shape, dtype=np.float64, buffer=_worker_memory.buf)
+
+
+def _evaluate_batch(seeds, leftover, leftover_distance):
+    '''
+    Task of the worker processes: compute the travel time of the following day for a batch of scenarios.
+    INPUTS:
+        seeds: numpy array with the seed of each scenario
+        leftover: numpy array of dimension #candidates*#cells with the customers left in each cell by each candidate
+        leftover_distance: numpy array with the sum of the distances from depot of the customers left by each candidate
+    OUTPUT:
+        costs: numpy array of dimension #scenarios*#candidates with the travel time of the following day
+    '''
+    return _scenario_costs(_worker_grid, seeds, leftover, leftover_distance)
@@ -0,0 +1,62 @@
+'''
+This class is used to collect the statistics of a single simulation that are updated by the selection of customers and by the
+checks made before the CVRP solvers, so that they are not kept in module-level variables and more simulations can run in the same
+process.
+
+Each object of class SimulationStats has the following attributes:
+    n_days: days of simulation
+    postponed: numpy array with the number of customers postponed in each day (position 0 is day 1)
+    num_postponed: total number of customers postponed up to now
+    fleet_bounds: dictionary containing for each lower bound on the vehicles needed ('kg', 'customers', 'time') a numpy array with
+                  its value for the customers given to the solver in each day
+    trimmed: numpy array with the number of selected customers removed in each day because of the lower bounds
+
+These attributes can be managed through the following public methods:
+    add_postponed(self, day, count)
+    add_fleet_bounds(self, day, bounds, num_trimmed)
+
+'''
+
+# To deal with numerical operations
+import numpy as np
+
+
+class SimulationStats:
+
+    # ------------------------------------------ CONSTRUCTOR ----------------------------------------------------------
+
+    def __init__(self, n_days):
+        '''
+        Construction of class SimulationStats: all counters are 0.
+        INPUT:
+            n_days: days of simulation
+        '''
+        self.n_days = n_days
+        self.postponed = np.zeros(n_days, dtype=np.int64)
+        self.num_postponed = 0
+        self.fleet_bounds = {name: np.zeros(n_days, dtype=np.int64) for name in ('kg', 'customers', 'time')}
+        self.trimmed = np.zeros(n_days, dtype=np.int64)
+
+    # ------------------------------------------ PUBLIC METHODS -------------------------------------------------------
+
+    def add_postponed(self, day, count):
+        '''
+        Count postponed customers.
+        INPUTS:
+            day: day of simulation in which the customers are postponed (starting from 1)
+            count: number of postponed customers
+        '''
+        self.postponed[day-1] += count
+        self.num_postponed += int(count)
+
+    def add_fleet_bounds(self, day, bounds, num_trimmed):
+        '''
+        Save the lower bounds on the vehicles needed in a day.
+        INPUTS:
+            day: day of simulation (starting from 1)
+            bounds: dictionary containing the value of each lower bound for the customers given to the solver
+            num_trimmed: number of selected customers removed because of the lower bounds
+        '''
+        for name, value in bounds.items():
+            self.fleet_bounds[name][day-1] = value
+        self.trimmed[day-1] = num_trimmed
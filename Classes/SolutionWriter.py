@@ -0,0 +1,135 @@
+'''
+This class is used to save the daily solutions of the CVRP, found by any solver, keeping the solution file open for the whole simulation.
+
+Each route of a solution is given as a record, i.e. a dictionary containing:
+    'vehicle': number of the vehicle traveling along the route
+    'route': list containing the path of the route, starting and ending at the depot 0
+    'load_kg': total load of the route (kg)
+    'load_min': total travel and service time of the route (min)
+
+The solutions can be saved with two layouts:
+    'text': the human-readable layout, for each day the routes and the totals of all routes are written
+    'jsonl': the machine-readable layout, a JSON object for each route with keys 'day', 'vehicle', 'route', 'load_kg', 'load_min'
+
+Each object of class SolutionWriter has the following attributes:
+    file_path: path to the solution file
+    layout: layout of the solution file ('text' or 'jsonl')
+    file: buffered file handle
+    pipeline: object of class OutputPipeline that writes the solutions on a background thread, if it is None they are written directly
+
+These attributes can be managed through the following public methods:
+    write_day(self, day, records, total_min=None, last_separator=' ')
+    close(self)
+
+'''
+
+# To write the machine-readable layout
+import json
+
+
+class SolutionWriter:
+
+    # ------------------------------------------ CONSTRUCTOR ----------------------------------------------------------
+
+    def __init__(self, file_path, layout='text', buffer_size=1 << 16, pipeline=None):
+        '''
+        Construction of class SolutionWriter: the pre-existing solution file is cleaned.
+        INPUTS:
+            file_path: path to the solution file
+            [layout]: layout of the solution file, 'text' or 'jsonl'
+            [buffer_size]: size in bytes of the buffer of the file
+            [pipeline]: object of class OutputPipeline used to write the solutions
+        '''
+        if layout not in ('text', 'jsonl'):
+            raise ValueError(f'not available solution layout {layout}')
+        self.file_path = file_path
+        self.layout = layout
+        self.file = open(file_path, 'w', buffering=buffer_size)
+        self.pipeline = pipeline
+
+    # ------------------------------------------ PRIVATE METHODS ------------------------------------------------------
+
+    @staticmethod
+    def _text(day, records, total_min=None, last_separator=' '):
+        '''
+        Build the text of the solution of a day.
+        INPUTS:
+            day: current day of simulation
+            records: list of route records
+            [total_min]: total travel and service time of all routes (min), by default the sum over the records
+            [last_separator]: string written before the last node of each route
+        OUTPUT:
+            text: string containing the solution in the text layout
+        '''
+        lines = [f'\n DAY: {day} \n']
+        for record in records:
+            lines.append('Route for vehicle {}:\n'.format(record['vehicle']))
+            lines.append(''.join(' {} -> '.format(cust_id) for cust_id in record['route'][:-1]))
+            lines.append('{}{}\n'.format(last_separator, record['route'][-1]))
+            lines.append('Travel and service time of the route: {} h\n'.format(round(record['load_min']/60,2)))
+            lines.append('Load of the route: {} kg \n'.format(round(record['load_kg'],2)))
+        # totals of all routes
+        if total_min is None:
+            total_min = sum(record['load_min'] for record in records)
+        total_kg = sum(record['load_kg'] for record in records)
+        max_min = max((record['load_min'] for record in records), default=0)
+        lines.append('Total travel and service time of all routes: {} h\n'.format(round(total_min/60,2)))
+        lines.append('Total load of all routes: {} kg\n'.format(round(total_kg, 2)))
+        lines.append('Maximum of the route travel time: {} h\n'.format(round(max_min/60,2)))
+        return ''.join(lines)
+
+    @staticmethod
+    def _jsonl(day, records):
+        '''
+        Build the JSON lines of the solution of a day.
+        INPUTS:
+            day: current day of simulation
+            records: list of route records
+        OUTPUT:
+            text: string containing a JSON object for each route
+        '''
+        return ''.join(json.dumps({'day': int(day), 'vehicle': int(record['vehicle']),
+                                   'route': [int(cust_id) for cust_id in record['route']],
+                                   'load_kg': float(record['load_kg']), 'load_min': float(record['load_min'])})+'\n'
+                       for record in records)
+
+    def _write_day(self, day, records, total_min, last_separator):
+        '''
+        Format and write the solution of a day.
+        INPUTS:
+            day: current day of simulation
+            records: list of route records
+            total_min: total travel and service time of all routes (min), None to sum over the records
+            last_separator: string written before the last node of each route in the text layout
+        '''
+        if self.layout == 'text':
+            self.file.write(self._text(day, records, total_min, last_separator))
+        else:
+            self.file.write(self._jsonl(day, records))
+
+    # ------------------------------------------ PUBLIC METHODS -------------------------------------------------------
+
+    def write_day(self, day, records, total_min=None, last_separator=' '):
+        '''
+        Save the solution of a day, with a pipeline the records are formatted and written on its writer thread.
+        INPUTS:
+            day: current day of simulation
+            records: list of route records, they must not be modified after the call
+            [total_min]: total travel and service time of all routes (min) written in the text layout, by default the sum over the
+                         records
+            [last_separator]: string written before the last node of each route in the text layout: ' ' for the solutions of Clark
+                              and Wright and Tabu Search, '' for the ones of OR-Tools
+        '''
+        if self.pipeline is not None:
+            self.pipeline.submit(self._write_day, day, records, total_min, last_separator)
+        else:
+            self._write_day(day, records, total_min, last_separator)
+
+    def close(self):
+        '''
+        Flush and close the solution file, after all the submitted solutions.
+        '''
+        if self.pipeline is not None:
+            self.pipeline.submit(self.file.close)
+        else:
+            self.file.close()
@@ -15,6 +15,7 @@ The attributes of the class are:
     no_improvement: number of iterations without finding an improving solution
     max_time: time limit to perform the whole CW-TS algorithm
     small_routes_ids: list of the identifiers of the small routes
+    rng: numpy Generator used for the random choices, if it is None the module random seeded with constant.SEED is used
 
 To deal with this optimization step, the following public methods can be exploited:
     solve(self)
@@ -37,15 +38,19 @@ import constant
 
 class TabuSearch():
 
-    def __init__(self, initial_solution, max_time):  
+    def __init__(self, initial_solution, max_time, rng=None):  
         '''
         Construction of class TabuSearch.
         INPUTS:
             initial_solution: object of the class  ClarkWrightSolver containing the initial feasible solution
             max_time: time limit to perform the whole CW-TS algorithm
+            [rng]: numpy Generator of the solver stream, if it is None the module random is used
         '''  
-        # Set seed for pseudo-random sequences' generation
-        random.seed(constant.SEED)
+        # Random generator of the solver
+        self.rng = rng
+        if rng is None:
+            # Set seed for pseudo-random sequences' generation
+            random.seed(constant.SEED)
         # Initialize the empty dictionary
         self.perms = {}
         # Generate all possible permutations for local search step
@@ -80,6 +85,21 @@ class TabuSearch():
 # ------------------------------------------------------ PRIVATE METHODS ----------------------------------------------------------
 
 
+    def _sample(self, population, k):
+        '''
+        Sample k distinct random elements from a population, using the random generator of the solver.
+        INPUTS:
+            population: sequence (or dictionary keys) from which the elements are sampled
+            k: number of elements to sample
+        OUTPUT:
+            sample: list of the sampled elements
+        '''
+        population = list(population)
+        if self.rng is None:
+            return random.sample(population, k)
+        return [population[i] for i in self.rng.choice(len(population), size=k, replace=False)]
+
+
     def _initialize_route(self, all_routes, route_id, custumer_on_route=True):
         '''
         Initialize a new route object, which is the copy of a pre-existent route. By means of flag custumer_on_route, a random customer can
@@ -109,7 +129,7 @@ class TabuSearch():
         route.load_cust = all_routes[route_id].load_cust
         if custumer_on_route:
             # Randomly sample one customer on the route
-            cust_id = random.sample(route.route[1:-1], 1)[0]
+            cust_id = self._sample(route.route[1:-1], 1)[0]
             # Preceding customer on the route
             prec_cust = route.route[route.route.index(cust_id)-1]
             # Next customer on the route
@@ -218,7 +238,7 @@ class TabuSearch():
         # Identifiers of all the routes
         all_route_ids = all_routes.keys()
         # Select two random routes' identifiers
-        route_ids = random.sample(all_route_ids, k=2)
+        route_ids = self._sample(all_route_ids, k=2)
         # Copy the routes and sample one random customer on each of them, store the identifiers of the customers and of the corresponding
         # preceding and next customers on the routes
         route_1, cust_id1, prec_cust1, post_cust1, cust_1 = self._initialize_route(all_routes, route_ids[0])
@@ -278,14 +298,14 @@ class TabuSearch():
             # Iterate until two different routes are sampled
             while route_id1 == route_id2:
                 # Sample the first route among the small routes
-                route_id1 = random.sample(self.small_routes_ids, k=1)[0]
+                route_id1 = self._sample(self.small_routes_ids, k=1)[0]
                 # Sample the second route
-                route_id2 = random.sample(all_route_ids, k=1)[0]
+                route_id2 = self._sample(all_route_ids, k=1)[0]
             # List of the routes' identifiers selected for the insertion
             route_ids = [route_id1, route_id2]   
         else:
             # Sample two random routes
-            route_ids = random.sample(all_route_ids, k=2)  
+            route_ids = self._sample(all_route_ids, k=2)  
         # Create a copy of the first route and select one random customer on it, store also the identifiers of the customer and of his preceding
         # and next customer on the route's path
         route_1, cust_id, prec_cust1, post_cust1, cust = self._initialize_route(all_routes, route_ids[0])
@@ -405,7 +425,7 @@ class TabuSearch():
                 # There is a limit to the number of permutations to try
                 if total_permutation >= constant.NUM_PERM:
                     # Sample some random permutations
-                    all_permutation = random.sample(all_permutation, constant.NUM_PERM)
+                    all_permutation = self._sample(all_permutation, constant.NUM_PERM)
             # Iterate over the permutations
             for perm in all_permutation:
                 # Permutated route's path
@@ -0,0 +1,120 @@
+'''
+This class is used to keep the pending customers ordered by urgency between days, so that policies EP and DP don't sort all
+pending customers every day.
+
+The urgency of a customer is the key (last available day, not yet postponed, identifier): customers with an earlier last
+available day come first, among them the postponed ones come first and then the ones that arrived first. The keys are kept in a
+binary heap that is updated by the store of the customers when customers arrive, are served or are postponed. Entries are never
+removed from the middle of the heap: when the key of a customer changes a new entry is pushed and the old one becomes stale, stale
+entries are discarded when they reach the top of the heap (lazy invalidation) and the heap is rebuilt when they are too many.
+Each entry carries the number of the push that created it, so an old entry stays stale even if the key of the customer goes back
+to its value.
+
+Each object of class UrgencyQueue has the following attributes:
+    heap: list of entries (last_day, not yet_postponed, identifier, stamp) ordered as a binary heap
+    keys: dictionary that has as key the identifier of a pending customer and as value his current key and the stamp of his valid
+          entry (last_day, not yet_postponed, stamp)
+    stamp: number of the entries pushed so far
+    rebuild_ratio: number of entries of the heap over the number of pending customers that triggers the rebuild of the heap
+
+These attributes can be managed through the following public methods:
+    push(self, customer_ids, last_day, yet_postponed)
+    remove(self, customer_ids)
+    ordered(self, num_customers, until_day)
+
+'''
+
+# To deal with the binary heap
+import heapq
+
+
+class UrgencyQueue:
+
+    # ------------------------------------------ CONSTRUCTOR ----------------------------------------------------------
+
+    def __init__(self, rebuild_ratio=2):
+        '''
+        Construction of class UrgencyQueue: the queue is empty.
+        INPUT:
+            [rebuild_ratio]: number of entries of the heap over the number of pending customers that triggers the rebuild
+        '''
+        self.heap = []
+        self.keys = {}
+        self.stamp = 0
+        self.rebuild_ratio = rebuild_ratio
+
+    def __len__(self):
+        return len(self.keys)
+
+    # ------------------------------------------ PRIVATE METHODS ------------------------------------------------------
+
+    def _rebuild(self):
+        '''
+        Build again the heap from the current keys, dropping all stale entries.
+        '''
+        self.heap = [(last_day, not_postponed, customer_id, stamp)
+                     for customer_id, (last_day, not_postponed, stamp) in self.keys.items()]
+        heapq.heapify(self.heap)
+
+    def _pop(self):
+        '''
+        Remove the most urgent valid entry from the heap, discarding the stale ones on top of it.
+        OUTPUT:
+            entry: most urgent entry (last_day, not yet_postponed, identifier, stamp), None if there are no pending customers
+        '''
+        while self.heap:
+            entry = heapq.heappop(self.heap)
+            if self.keys.get(entry[2]) == entry[:2]+entry[3:]:
+                return entry
+        return None
+
+    # ------------------------------------------ PUBLIC METHODS -------------------------------------------------------
+
+    def push(self, customer_ids, last_day, yet_postponed):
+        '''
+        Insert new customers or update the key of pending ones.
+        INPUTS:
+            customer_ids: identifiers of the customers
+            last_day: last available day of each customer
+            yet_postponed: flag of each customer that is True if he has been postponed
+        '''
+        for customer_id, day, postponed in zip(customer_ids.tolist(), last_day.tolist(), yet_postponed.tolist()):
+            self.stamp += 1
+            self.keys[customer_id] = (day, not postponed, self.stamp)
+            heapq.heappush(self.heap, (day, not postponed, customer_id, self.stamp))
+        if len(self.heap) > self.rebuild_ratio*max(len(self.keys), 1):
+            self._rebuild()
+
+    def remove(self, customer_ids):
+        '''
+        Remove customers that are no longer pending, their entries become stale.
+        INPUT:
+            customer_ids: identifiers of the removed customers
+        '''
+        for customer_id in customer_ids.tolist():
+            self.keys.pop(customer_id, None)
+
+    def ordered(self, num_customers, until_day):
+        '''
+        Find the most urgent customers: the first num_customers ones and all the following ones whose last available day is not
+        after until_day. The queue is not modified.
+        INPUTS:
+            num_customers: number of most urgent customers to find
+            until_day: all customers whose last available day is not after this day are found
+        OUTPUT:
+            customer_ids: list of identifiers of the customers found, in order of urgency
+        '''
+        entries = []
+        while len(entries) < num_customers or (self.heap and self.heap[0][0] <= until_day):
+            entry = self._pop()
+            if entry is None:
+                break
+            if len(entries) >= num_customers and entry[0] > until_day:
+                # the valid top entry is after until_day
+                heapq.heappush(self.heap, entry)
+                break
+            entries.append(entry)
+        # put back the valid entries
+        for entry in entries:
+            heapq.heappush(self.heap, entry)
+        return [entry[2] for entry in entries]
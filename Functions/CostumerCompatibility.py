@@ -4,19 +4,31 @@ different cells along the same route. These indexes will be used in policies NP
 This index is an approximation, because we don't know a priori the set of future customers (and their positions),
 so we consider as approximate position of customer belonging to a cell the (x,y) coordinate of the centre.
 It must be noticed that even if this calculation scales as O(#cells^2), it is performed only once at the begining of the simulation.
+The indexes are computed on blocks of consecutive rows, whose size is chosen so that the temporary arrays of a block fit in a
+memory budget, and the blocks can be computed in parallel on a pool of threads (numpy releases the GIL).
+For fine-grained grids the dense matrix of indexes does not fit in memory: sparse_compatible_cells builds it block by block keeping
+only the indexes above a floor, in a sparse float32 matrix.
+The lists of compatible cells are turned into a sparse boolean matrix by compatibility_matrix, so that policy NP counts the empty
+compatible cells of all cells with one matrix product.
 """
 
 
 import numpy as np
 from scipy.spatial import distance
+from scipy import sparse
+# To compute the blocks in parallel
+from concurrent.futures import ThreadPoolExecutor
 
+import constant
 
-def select_compatible_cells(df_distribution, depot, rho):
+
+def select_compatible_cells(df_distribution, depot, rho, memory_budget=constant.COMPATIBILITY_MEMORY_MB,
+                            workers=constant.COMPATIBILITY_WORKERS):
     '''
     For each cell (C1) create a list of cells (C2, C3, ...) that lead to a index of saving higher than a threshold rho:
     including customers belonging to a cell of the list (C2, C3, ...) in the same route of a customer belonging to C1 is convenient.
     INPUTS:
-        df_distribution: dataframe containg all information about cells, each row represents a cell. 
+        df_distribution: dataframe containg all information about cells, each row represents a cell.
                         We consider the following columns
                         cell_name: integer number that identifies the cell
                         x: x-coordinate of left corner of the cell
@@ -26,36 +38,171 @@ def select_compatible_cells(df_distribution, depot, rho):
                         probability: probability of a simulated customer to belong to this cell
         depot: numpy array containig depot (x,y) coordinates.
         rho: threshold to select convenient cells to put in the list (C2, C3, ...) according to saving indexes.
+        [memory_budget]: memory (MB) available for the temporary arrays of the blocks of rows computed at the same time
+        [workers]: number of threads that compute the blocks
     OUTPUTS:
         compatibility_list: list of dimension #cells whose elements are lists of convenient cells
         compatibility_index: numpy array of dimension #cells*#cells which contains the saving indexes
-        distance_matrix[0]: numpy array of dimension #cells+1 containing all distance from depot to each cells (and the depot itself
-                            in position 0)
+        depot_distance: numpy array of dimension #cells+1 containing all distance from depot to each cells (and the depot itself
+                        in position 0)
     '''
     # number of cells
     num_cell = len(df_distribution)
+    cell_coords, depot_distance = _cell_geometry(df_distribution, depot)
+    # initialize the matrix of indexes
+    compatibility_index = np.zeros((num_cell,num_cell))
+
+    def fill_block(start, end, block):
+        # each block fills its own rows
+        compatibility_index[start:end] = block
+
+    _compute_blocks(cell_coords, depot_distance[1:], fill_block, memory_budget, workers)
+    # select convenient cells according to threshold rho, for all rows at once
+    compatibility_list = _split_rows(*np.nonzero(compatibility_index > rho), num_cell)
+    return compatibility_list, compatibility_index, depot_distance
+
+
+def sparse_compatible_cells(df_distribution, depot, rho, floor, memory_budget=constant.COMPATIBILITY_MEMORY_MB,
+                            workers=constant.COMPATIBILITY_WORKERS):
+    '''
+    Same as select_compatible_cells, but only the saving indexes higher than floor are kept, so that the dense matrix
+    #cells*#cells is never allocated.
+    INPUTS:
+        df_distribution: dataframe containg all information about cells (see select_compatible_cells)
+        depot: numpy array containig depot (x,y) coordinates.
+        rho: threshold to select convenient cells to put in the list (C2, C3, ...) according to saving indexes.
+        floor: threshold of the saving indexes saved in the sparse matrix, it must not be higher than rho, the indexes are compared
+               with floor in float64 and with rho in float32
+        [memory_budget]: memory (MB) available for the temporary arrays of the blocks of rows computed at the same time
+        [workers]: number of threads that compute the blocks
+    OUTPUTS:
+        compatibility_list: list of dimension #cells whose elements are lists of convenient cells
+        compatibility_index: scipy sparse CSR float32 matrix of dimension #cells*#cells which contains the saving indexes higher
+                             than floor
+        depot_distance: numpy array of dimension #cells+1 containing all distance from depot to each cells (and the depot itself
+                        in position 0)
+    '''
+    if floor > rho:
+        raise ValueError(f'the floor of the saving indexes {floor} is higher than rho {rho}')
+    # number of cells
+    num_cell = len(df_distribution)
+    cell_coords, depot_distance = _cell_geometry(df_distribution, depot)
+    # entries of each block, in the order of the blocks
+    blocks = {}
+
+    def keep_block(start, end, block):
+        # keep the indexes higher than floor
+        rows, cols = np.nonzero(block > floor)
+        values = block[rows, cols].astype(np.float32)
+        # convenient cells are selected on the float32 indexes that are saved, as GridCache does when it loads them
+        convenient = values > rho
+        blocks[start] = (rows+start, cols, values, rows[convenient]+start, cols[convenient])
+
+    _compute_blocks(cell_coords, depot_distance[1:], keep_block, memory_budget, workers)
+    # join the entries of all blocks
+    parts = [blocks[start] for start in sorted(blocks)] or [(np.zeros(0, dtype=np.int64),)*5]
+    rows, cols, data, convenient_rows, convenient_cols = [np.concatenate(arrays) for arrays in zip(*parts)]
+    compatibility_index = sparse.csr_matrix((data, (rows, cols)), shape=(num_cell, num_cell), dtype=np.float32)
+    compatibility_list = _split_rows(convenient_rows, convenient_cols, num_cell)
+    return compatibility_list, compatibility_index, depot_distance
+
+
+def compatibility_matrix(compatibility_list):
+    '''
+    Build the sparse boolean matrix of compatible cells.
+    INPUT:
+        compatibility_list: list of dimension #cells whose elements are lists of convenient cells
+    OUTPUT:
+        matrix: scipy sparse CSR matrix of dimension #cells*#cells, element (i,j) is 1 if cell j is in the list of cell i
+    '''
+    num_cell = len(compatibility_list)
+    # number of compatible cells of each cell
+    lengths = np.array([len(cells) for cells in compatibility_list], dtype=np.int64)
+    indptr = np.concatenate(([0], np.cumsum(lengths)))
+    indices = np.concatenate(compatibility_list).astype(np.int64) if num_cell else np.zeros(0, dtype=np.int64)
+    return sparse.csr_matrix((np.ones(len(indices)), indices, indptr), shape=(num_cell, num_cell))
+
+
+def _cell_geometry(df_distribution, depot):
+    '''
+    Compute the centres of the cells and their distances from the depot.
+    INPUTS:
+        df_distribution: dataframe containg all information about cells, the columns 'x_center' and 'y_center' are added to it
+        depot: numpy array containig depot (x,y) coordinates.
+    OUTPUTS:
+        cell_coords: numpy array with the coordinates of the centres of all cells
+        depot_distance: numpy array of dimension #cells+1 containing all distance from depot to each cells (and the depot itself
+                        in position 0)
+    '''
     # calculate centers of each cell
     df_distribution['x_center'] = df_distribution.x+df_distribution.length/2
     df_distribution['y_center'] = df_distribution.y+df_distribution.height/2
     # convert to numpy coordinates
     cell_coords = df_distribution[['x_center', 'y_center']].to_numpy()
     # add depot coordinates at the begining
-    coords = np.vstack ((depot, cell_coords))
-    # initialize the matrix of indexes
-    compatibility_index = np.zeros((num_cell,num_cell))
-    # calculate distance matrix
-    distance_matrix = distance.cdist(coords, coords)
-    # initialize list for compatible cell
-    compatibility_list = []
-    for i in range(num_cell):
-        for j in range( num_cell):
-            if j != i:   
-                # saving index of including cell i and cell j in the same route         
-                compatibility_index[i][j] = (distance_matrix[0][i+1]+distance_matrix[0][j+1]-distance_matrix[i+1][j+1])\
-                                            /(2*(distance_matrix[0][i+1]+distance_matrix[0][j+1]))
-            else:
-                # customers in the same cell are always compatible
-                compatibility_index[i][j] = 0.5
-        # select convenient cells according to threshold rho
-        compatibility_list.append(np.where(compatibility_index[i] > rho)[0])
-    return compatibility_list, compatibility_index, distance_matrix[0]
\ No newline at end of file
+    depot_distance = distance.cdist(np.atleast_2d(depot), np.vstack((depot, cell_coords)))[0]
+    return cell_coords, depot_distance
+
+
+def _compute_blocks(cell_coords, cell_distance, process, memory_budget, workers):
+    '''
+    Compute the saving indexes on blocks of rows and give each block to a function.
+    INPUTS:
+        cell_coords: numpy array with the coordinates of the centres of all cells
+        cell_distance: numpy array with the distances from the depot to the centres of all cells
+        process: function process(start, end, block) called for each block, it may be called by different threads at once
+        memory_budget: memory (MB) available for the temporary arrays of the blocks computed at the same time
+        workers: number of threads that compute the blocks
+    '''
+    num_cell = len(cell_coords)
+    # a block needs about 4 float64 temporary arrays of its size, the budget is shared by the threads
+    block_size = max(1, int(memory_budget*2**20//(4*8*max(num_cell, 1)*max(workers, 1))))
+
+    def compute(start):
+        end = min(start+block_size, num_cell)
+        process(start, end, _saving_block(cell_coords, cell_distance, start, end))
+
+    starts = range(0, num_cell, block_size)
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # consume the results so that exceptions are raised
+            list(executor.map(compute, starts))
+    else:
+        for start in starts:
+            compute(start)
+
+
+def _saving_block(cell_coords, cell_distance, start, end):
+    '''
+    Compute the saving indexes of a block of consecutive rows.
+    INPUTS:
+        cell_coords: numpy array with the coordinates of the centres of all cells
+        cell_distance: numpy array with the distances from the depot to the centres of all cells
+        start: first row of the block
+        end: row following the last row of the block
+    OUTPUT:
+        block: numpy array of dimension (end-start)*#cells which contains the saving indexes of the rows of the block
+    '''
+    # distances between the cells of the block and all cells
+    block_distance = distance.cdist(cell_coords[start:end], cell_coords)
+    # sum of the distances from the depot of each pair of cells
+    depot_sum = cell_distance[start:end, np.newaxis]+cell_distance[np.newaxis, :]
+    # the sum is 0 only for a cell whose centre is the depot paired with itself, its index is set below
+    with np.errstate(divide='ignore', invalid='ignore'):
+        block = (depot_sum-block_distance)/(2*depot_sum)
+    # customers in the same cell are always compatible
+    block[np.arange(end-start), np.arange(start, end)] = 0.5
+    return block
+
+
+def _split_rows(rows, cols, num_cell):
+    '''
+    Split the column indexes of some entries of a matrix in one array for each row.
+    INPUTS:
+        rows: numpy array of the rows of the entries, in increasing order
+        cols: numpy array of the columns of the entries
+        num_cell: number of rows of the matrix
+    OUTPUT:
+        row_list: list of dimension num_cell whose elements are the numpy arrays of the columns of each row
+    '''
+    return np.split(cols, np.searchsorted(rows, np.arange(1, num_cell)))
@@ -12,169 +12,199 @@ There are 4 policies to select customer:
                                  customer in the set of selected customer, given the set of pending customer, the presence/absence 
                                  of other customers in the neighbourhood, the remainings days to serve him and, his distance from
                                  depot and his service time.
+- Knapsack Policy (KP): each day we select the customers at their last available day and the set of other customers that
+                        maximizes the sum of their index of policy NP_1, subject to the available kg and minutes of service time
+                        (two-resource knapsack solved by a greedy step followed by dynamic programming on binned weights).
+- Monte Carlo Policy (MC): each day we select the customers at their last available day and the most urgent other customers, how
+                           many of them is chosen by sampling scenarios of the following day and comparing the approximated travel
+                           time of the two days.
 '''
 
 
-import constant
+# To deal with numerical operations
+import numpy as np
 
-# global variable: total number of customers that has been post-poned that is the one that couldn't be served within their last
-#                  available day.
-num_postponed = 0
+import constant
+# import Classes
+from Classes.NeighbourhoodIndex import NeighbourhoodIndex
+from Classes.SimulationStats import SimulationStats
+# import function that builds the matrix of compatible cells
+from Functions.CostumerCompatibility import compatibility_matrix
 
-def select_customers(day, min_capacity, kg_capacity, policy, compatibility, probabilities, compatibility_index, depot_distance):
+def select_customers(day, min_capacity, kg_capacity, policy, compatibility, probabilities, compatibility_index, depot_distance,
+                     rng=None, neighbourhood_index=None, stats=None, rollout_policy=None, compatible_matrix=None):
     '''
     Select the customers for CVRP given the chosen policy, time constraint and capacity contraint.
     INPUTS:
         day: object of class Day containing information about current day in simulation
         min_capacity: aggregate time capacity expressed in minutes
         kg_capacity: aggregate weight capacity expressed in kg
-        policy: chosen policy for customers selection ("EP", "DP", "NP", "NP_1")
+        policy: chosen policy for customers selection ("EP", "DP", "NP", "NP_1", "KP", "MC")
         compatibility: list of dimension #cells whose elements are lists of convenient cells
         probabilities: dataframe column containig probability of a simulated customer to belong to a cell
         compatibility_index: numpy array of dimension #cells*#cells which contains the saving indexes
         depot_distance: numpy array of dimension #cells+1 containing all distance from depot to each cells (and the depot itself
                         in position 0)
+        [rng]: numpy Generator of the selection stream of the day, it is given to the policies that need random numbers
+        [neighbourhood_index]: object of class NeighbourhoodIndex used by policies NP_1 and KP, it keeps the cached savings between
+                               days
+        [stats]: object of class SimulationStats of the simulation, in which the postponed customers are counted
+        [rollout_policy]: object of class RolloutPolicy used by policy MC, it keeps the pool of processes between days
+        [compatible_matrix]: sparse boolean matrix of compatible cells used by policy NP, built once by compatibility_matrix; if it is
+                             None it is built from compatibility each day
     OUTPUTS:
         day: object of class Day containing information about current day in simulation (updated)
         num_postponed: total number of customers that has been postponed till the current day
     '''
+    if stats is None:
+        stats = SimulationStats(day.current_day)
     # percentage for service times: the time constraint will include both service time and travel time so I consider only a
     # percentage of the time capacity to select customers according to their service time.
     perc = constant.PERCENTAGE
     # calculate average demand (kg)
-    avg_kg = day.customer_df['kg'].mean()
+    avg_kg = day.customers.mean('kg')
     # calculate average service_times (min)
-    avg_service = day.customer_df['service_time'].mean()
+    avg_service = day.customers.mean('service_time')
     # approximate the maximum number of deliveries will be allowed with the available capacities
     num_deliveries = min(perc*min_capacity//avg_service, kg_capacity//avg_kg)
-    # apply the desired policy
+    # apply the desired policy: EP and DP read only the most urgent customers from the store, the other policies need the
+    # dataframe of all pending customers
     if policy == "EP":
-        selected_customers, selected_idx, new_customer_df = _early_policy(day.customer_df, day.current_day,
-                                                                          num_deliveries)
+        selected_customers, selected_idx = _early_policy(day, num_deliveries, stats)
     elif policy == "DP":
-        selected_customers, selected_idx, new_customer_df = _delayed_policy(day.customer_df, day.current_day,
-                                                                            num_deliveries)
-    elif policy == "NP":
-        selected_customers, selected_idx, new_customer_df = _neighbourhood_policy(day.customer_df, day.current_day,
-                                                                            num_deliveries, compatibility, probabilities)
-    elif policy == "NP_1":
-        selected_customers, selected_idx, new_customer_df = _neighbourhood_policy_1(day.customer_df, day.current_day,
-                                                                            num_deliveries, compatibility, probabilities,
-                                                                            compatibility_index, depot_distance)
-
-    # check if I've respected total capacities
-    constraints_respected = _check_capacity_constraints(selected_customers, kg_capacity, perc*min_capacity)
-    # iterate until the constraint is satisfied
-    while not constraints_respected:
-        # If capacity is not respected I have to eliminate some customer: I remove one customers from the selected ones
-        selected_idx, selected_customers, new_customer_df = _remove_client(selected_customers, new_customer_df,
-                                                                           day.current_day, selected_idx)
-        # check constraints
-        constraints_respected = _check_capacity_constraints(selected_customers, kg_capacity, perc*min_capacity)
-        # reduce the deliveries
-        num_deliveries -= 1
+        selected_customers, selected_idx = _delayed_policy(day, num_deliveries, stats)
+    else:
+        # dataframe of pending customers, built once from the store of the day
+        customer_df = day.customer_df
+        if policy == "NP":
+            selected_customers, selected_idx, new_customer_df = _neighbourhood_policy(customer_df, day.current_day,
+                                                                                num_deliveries, stats, compatibility, probabilities,
+                                                                                day.customers.occupancy, compatible_matrix)
+        elif policy == "NP_1":
+            selected_customers, selected_idx, new_customer_df = _neighbourhood_policy_1(customer_df, day.current_day,
+                                                                                num_deliveries, stats, compatibility, probabilities,
+                                                                                compatibility_index, depot_distance,
+                                                                                neighbourhood_index, day.customers.occupancy)
+        elif policy == "KP":
+            selected_customers, selected_idx, new_customer_df = _knapsack_policy(customer_df, day.current_day, kg_capacity,
+                                                                                 perc*min_capacity, compatibility, probabilities,
+                                                                                 compatibility_index, depot_distance,
+                                                                                 neighbourhood_index, day.customers.occupancy)
+        elif policy == "MC":
+            if rollout_policy is None:
+                raise ValueError('policy MC needs an object of class RolloutPolicy')
+            selected_customers, selected_idx, new_customer_df = _rollout_policy(customer_df, day.current_day, rollout_policy,
+                                                                                rng)
+        # update dataframe of pending customers
+        day.customer_df = new_customer_df
+
+    # If capacity is not respected I have to eliminate the last selected customers
+    selected_idx, selected_customers = _trim_selection(selected_customers, day, selected_idx, kg_capacity, perc*min_capacity,
+                                                       stats)
     # add labels corresponding to nodes in graph: to have a correspondence with CVRP solutions
     selected_customers['customer_label'] = range(1, len(selected_customers)+1)
-    # update dataframe of pending customers
-    day.customer_df = new_customer_df
     # create dataframe with selected customers
     day.selected_customers = selected_customers
     # save index of selected customers
     day.selected_indexes = selected_idx
-    return day, num_postponed
+    return day, stats.num_postponed
 
 
-def remove_client_VRP(day):
+def remove_client_VRP(day, stats=None):
     '''
     Remove a costumer from the dataframe of selected customers.
-    INPUT:
+    INPUTS:
         day: object of class Day containing information about current day in simulation 
+        [stats]: object of class SimulationStats of the simulation, in which the postponed customer is counted
+    OUTPUT:
+        day: object of class Day containing information about current day in simulation
+    '''
+    if stats is None:
+        stats = SimulationStats(day.current_day)
+    day.selected_indexes, day.selected_customers = _remove_client(day.selected_customers, day, day.selected_indexes, stats)
+    return day
+
+def keep_selected_prefix(day, num_selected, stats=None):
+    '''
+    Keep only the first selected customers, the other ones are left among the pending customers (and postponed if it is their
+    last available day): it is used when the CVRP is feasible only for a prefix of the selected customers.
+    INPUTS:
+        day: object of class Day containing information about current day in simulation
+        num_selected: number of selected customers to keep
+        [stats]: object of class SimulationStats of the simulation, in which the postponed customers are counted
     OUTPUT:
         day: object of class Day containing information about current day in simulation
     '''
-    day.selected_indexes, day.selected_customers, day.customer_df = _remove_client(day.selected_customers, day.customer_df,\
-     day.current_day, day.selected_indexes)
+    if stats is None:
+        stats = SimulationStats(day.current_day)
+    if num_selected < len(day.selected_indexes):
+        day.selected_indexes, day.selected_customers = _keep_prefix(day.selected_customers, day, day.selected_indexes,
+                                                                    num_selected, stats)
     return day
 
 # -------------------------------------------------------- PRIVATE METHODS ---------------------------------------------------------------------
 
 
-def _early_policy(customer_df, this_day, num_deliveries):
+def _early_policy(day, num_deliveries, stats):
     '''
     Early Policy: serve all customers as soon as demand happens. Select customer sorting them by urgency: try to serve at least
-    customers whose last available day is near to the current day.
+    customers whose last available day is near to the current day. The customers are read from the queue of urgency of the store,
+    so only the selected and the postponed ones are touched.
     INPUT:
-        customer_df: dataframe containig all information about pending customers
-        this_day: integer representing current day in simulation
+        day: object of class Day containing information about current day in simulation
         num_deliveries: number of deliveries (and customers) to select for CVRP
+        stats: object of class SimulationStats in which the postponed customers are counted
     OUTPUT:
         selected_customers: dataframe containig all information about selected customers
         selected_indexes: list of index of all selected customers
-        customer_df: dataframe containig all information about pending customers (updated)
     '''
-    # Order pending customers them by urgency
-    customer_df = customer_df.sort_values(by=['last_day', 'yet_postponed'], axis=0, ascending=[True, False],
-                                          ignore_index=False)
-    # Select all more urgent customers that can be selected
-    selected_customers = customer_df.head(int(num_deliveries))
-    # Extract the list of selected customers' indexes of the dataframe
-    selected_indexes = selected_customers.index.tolist()
-    # It is possible that some urgent clients are not served: those ones have to be postponed
-    customer_df = customer_df.apply(lambda line: _postpone_client(line, this_day, selected_indexes), axis=1)
-    return selected_customers, selected_indexes, customer_df
+    # the most urgent customers and the following ones at their last available day, that are postponed if not selected
+    urgent = day.customers.urgency_queue().ordered(int(num_deliveries), day.current_day)
+    return _urgent_selection(day, urgent, int(num_deliveries), stats)
 
 
-def _delayed_policy(customer_df, this_day, num_deliveries):
+def _delayed_policy(day, num_deliveries, stats):
     '''
-    Delayed Policy: serve only customers whose last available day is the current one.
+    Delayed Policy: serve only customers whose last available day is the current one. If they are too many, the ones that have
+    already been postponed are served first and then the other ones in order of arrival.
     INPUT:
-        customer_df: dataframe containig all information about pending customers
-        this_day: integer representing current day in simulation
+        day: object of class Day containing information about current day in simulation
         num_deliveries: number of deliveries (and customers) to select for CVRP
+        stats: object of class SimulationStats in which the postponed customers are counted
     OUTPUT:
         selected_customers: dataframe containig all information about selected customers
         selected_indexes: list of index of all selected customers
-        customer_df: dataframe containig all information about pending customers (updated)
     '''
-    # sort all customers to try and serve the at least the ones whose orders have yet been postponed
-    customer_df = customer_df.sort_values(by=['yet_postponed'], axis=0, ascending=[False],
-                                          ignore_index=False)
-    # list of indexes of customers whose last available day is the current one
-    selected_indexes = customer_df.index[customer_df['last_day'] == this_day].tolist()
-    list_length = len(selected_indexes)
-    # the number of selected customers must satisfy capacity constraints
-    selected_customers = customer_df[customer_df['last_day'] == this_day].head(int(min(list_length, num_deliveries)))
-    # check if all these customers can be served
-    if list_length > num_deliveries:
-        selected_indexes = selected_indexes[:int(num_deliveries)]
-        # It is possible that some urgent clients are not served: those ones have to be postponed
-        customer_df = customer_df.apply(lambda line: _postpone_client(line, this_day, selected_indexes), axis=1)
-    return selected_customers, selected_indexes, customer_df
+    # customers at their last available day, the postponed ones first
+    urgent = day.customers.urgency_queue().ordered(0, day.current_day)
+    return _urgent_selection(day, urgent, int(num_deliveries), stats)
 
 
 # serve customers according to probability of future demands of neighbours
-def _neighbourhood_policy(customer_df, this_day, num_deliveries, compatibility, probabilities):
+def _neighbourhood_policy(customer_df, this_day, num_deliveries, stats, compatibility, probabilities, occupancy=None,
+                          compatible_matrix=None):
     '''
     Neighbourhood Policy: each day we select customers according to a index that expresses the reward of including a customer in
     the set of selected customer, given the set of pending customer, the presence/absence of other customers in the neighbourhood
-    and the remainings days to serve him..
+    and the remainings days to serve him. Customers with the same index are selected in order of arrival.
     INPUT:
         customer_df: dataframe containig all information about pending customers
         this_day: integer representing current day in simulation
         num_deliveries: number of deliveries (and customers) to select for CVRP
+        stats: object of class SimulationStats in which the postponed customers are counted
         compatibility: list of dimension #cells whose elements are lists of convenient cells
         probabilities: dataframe column containig probabilities of a customer to belong to each cell
+        [occupancy]: object of class CellOccupancy of the pending customers
+        [compatible_matrix]: sparse boolean matrix of compatible cells, built from compatibility if it is None
     OUTPUT:
         selected_customers: dataframe containig all information about selected customers
         selected_indexes: list of index of all selected customers
         customer_df: dataframe containig all information about pending customers (updated)
     '''
-    # create a set containig all the cells of pending customers
-    all_cells = set(customer_df['cell']-1)
     # add a column to customer_df containig the index for selection
-    customer_df = customer_df.apply(lambda line: _index_selection(line, compatibility[line.cell-1], this_day, all_cells, probabilities), axis=1)
-    # sort customer_df according to the index
-    customer_df = customer_df.sort_values(by=['index'], axis=0, ascending=[False], ignore_index=False)
+    customer_df['index'] = _index_selection(customer_df, this_day, compatibility, probabilities, occupancy, compatible_matrix)
+    # sort customer_df according to the index, customers with the same index are kept in order of arrival
+    customer_df = customer_df.sort_values(by=['index'], axis=0, ascending=[False], kind='stable', ignore_index=False)
     # calculate how many customers have index above a given threshold
     num_convenient_deliveries = len(customer_df[customer_df['index']>=constant.threshold])
     # the number of deliveries must satisfy capacity constraints
@@ -184,11 +214,12 @@ def _neighbourhood_policy(customer_df, this_day, num_deliveries, compatibility,
     # list of indexes fo selected customers
     selected_indexes = selected_customers.index.tolist()
     # It is possible that some urgent clients are not served: those ones has to be postponed
-    customer_df = customer_df.apply(lambda line: _postpone_client(line, this_day, selected_indexes), axis=1)
+    customer_df = _postpone_clients(customer_df, this_day, selected_indexes, stats)
     return selected_customers, selected_indexes, customer_df
 
 
-def _neighbourhood_policy_1(customer_df, this_day, num_deliveries, compatibility, probabilities, compatibility_index, depot_distance):
+def _neighbourhood_policy_1(customer_df, this_day, num_deliveries, stats, compatibility, probabilities, compatibility_index, depot_distance,
+                            neighbourhood_index=None, occupancy=None):
     '''
     Neighbourhood Policy 1: each day we select customers according to a index that expresses the reward of including a 
     customer in the set of selected customers, given the set of pending customers, the presence/absence of other customers 
@@ -197,23 +228,26 @@ def _neighbourhood_policy_1(customer_df, this_day, num_deliveries, compatibility
         customer_df: dataframe containig all information about pending customers
         this_day: integer representing current day in simulation
         num_deliveries: number of deliveries (and customers) to select for CVRP
+        stats: object of class SimulationStats in which the postponed customers are counted
         compatibility: list of dimension #cells whose elements are lists of convenient cells
         probabilities: dataframe column containig probabilities of a customer to belong to each cell
         compatibility_index: numpy array of dimension #cells*#cells which contains the saving indexes
         depot_distance: numpy array of dimension #cells+1 containing all distance from depot to each cells (and the depot itself
                         in position 0)
+        [neighbourhood_index]: object of class NeighbourhoodIndex that keeps the cached savings between days, if it is None a new
+                               one is built
+        [occupancy]: object of class CellOccupancy of the pending customers
     OUTPUT:
         selected_customers: dataframe containig all information about selected customers
         selected_indexes: list of index of all selected customers
         customer_df: dataframe containig all information about pending customers (updated)
     '''
-    # create a set containig all the cells of pending customers
-    all_cells = set(customer_df['cell']-1)
+    if neighbourhood_index is None:
+        neighbourhood_index = NeighbourhoodIndex(compatibility, compatibility_index, probabilities, depot_distance)
     # add a column to customer_df containig the index for selection
-    customer_df = customer_df.apply(lambda line: _index_selection_1(line, compatibility[line.cell-1], this_day, all_cells, probabilities,\
-                                                                    compatibility_index, depot_distance), axis=1)
-    # sort customer_df according to the index
-    customer_df = customer_df.sort_values(by=['index'], axis=0, ascending=[False], ignore_index=False)
+    customer_df['index'] = neighbourhood_index.compute(customer_df, this_day, occupancy)
+    # sort customer_df according to the index, customers with the same index are kept in order of arrival
+    customer_df = customer_df.sort_values(by=['index'], axis=0, ascending=[False], kind='stable', ignore_index=False)
     # calculate how many customers have index above a given threshold
     num_convenient_deliveries = len(customer_df[customer_df['index']>=constant.threshold_1])
     # the number of deliveries must satisfy capacity constraints
@@ -223,171 +257,326 @@ def _neighbourhood_policy_1(customer_df, this_day, num_deliveries, compatibility
     # list of indexes fo selected customers
     selected_indexes = selected_customers.index.tolist()
     # It is possible that some urgent clients are not served: those ones have to be postponed
-    customer_df = customer_df.apply(lambda line: _postpone_client(line, this_day, selected_indexes), axis=1)
+    customer_df = _postpone_clients(customer_df, this_day, selected_indexes, stats)
+    return selected_customers, selected_indexes, customer_df
+
+
+def _knapsack_policy(customer_df, this_day, kg_capacity, min_capacity, compatibility, probabilities, compatibility_index,
+                     depot_distance, neighbourhood_index=None, occupancy=None):
+    '''
+    Knapsack Policy: each day we select all customers whose last available day is the current one and, with the remaining
+    capacity, the set of other customers that maximizes the sum of their index of policy NP_1 above threshold_1.
+    INPUT:
+        customer_df: dataframe containig all information about pending customers
+        this_day: integer representing current day in simulation
+        kg_capacity: total available capacity in kg
+        min_capacity: total available service time in min
+        compatibility: list of dimension #cells whose elements are lists of convenient cells
+        probabilities: dataframe column containig probabilities of a customer to belong to each cell
+        compatibility_index: numpy array of dimension #cells*#cells which contains the saving indexes
+        depot_distance: numpy array of dimension #cells+1 containing all distance from depot to each cells (and the depot itself
+                        in position 0)
+        [neighbourhood_index]: object of class NeighbourhoodIndex that keeps the cached savings between days, if it is None a new
+                               one is built
+        [occupancy]: object of class CellOccupancy of the pending customers
+    OUTPUT:
+        selected_customers: dataframe containig all information about selected customers, the ones at their last available day
+                            come first
+        selected_indexes: list of index of all selected customers
+        customer_df: dataframe containig all information about pending customers
+    '''
+    if neighbourhood_index is None:
+        neighbourhood_index = NeighbourhoodIndex(compatibility, compatibility_index, probabilities, depot_distance)
+    # add a column to customer_df containig the index for selection
+    customer_df['index'] = neighbourhood_index.compute(customer_df, this_day, occupancy)
+    index = customer_df['index'].to_numpy()
+    weights = customer_df[['kg', 'service_time']].to_numpy()
+    # customers at their last available day are always selected, if they exceed the capacity the last ones are removed by
+    # the trimming of the selection and postponed
+    mandatory = customer_df['last_day'].to_numpy() == this_day
+    residual = np.array([kg_capacity, min_capacity])-weights[mandatory].sum(axis=0)
+    # only the other customers with index above the threshold are worth selecting
+    optional = np.flatnonzero(~mandatory & (index > constant.threshold_1))
+    chosen = optional[_solve_knapsack(index[optional]-constant.threshold_1, weights[optional], residual)]
+    # order of selection: by decreasing index, mandatory customers first
+    mandatory = np.flatnonzero(mandatory)
+    order = np.concatenate((mandatory[np.argsort(-index[mandatory], kind='stable')],
+                            chosen[np.argsort(-index[chosen], kind='stable')]))
+    selected_customers = customer_df.iloc[order]
+    selected_indexes = selected_customers.index.tolist()
     return selected_customers, selected_indexes, customer_df
 
 
-def _postpone_client(line, this_day, served_clients=[], single_client=False):
+def _rollout_policy(customer_df, this_day, rollout_policy, rng=None):
+    '''
+    Monte Carlo Policy: each day we select all customers whose last available day is the current one and a prefix of the other
+    customers ranked by urgency, whose length minimizes the travel time of the current day plus the expected one of the following
+    day, estimated on sampled scenarios of the arrivals.
+    INPUT:
+        customer_df: dataframe containig all information about pending customers
+        this_day: integer representing current day in simulation
+        rollout_policy: object of class RolloutPolicy that evaluates the scenarios
+        [rng]: numpy Generator of the selection stream of the day, the seeds of the scenarios are drawn from it
+    OUTPUT:
+        selected_customers: dataframe containig all information about selected customers, the ones at their last available day
+                            come first
+        selected_indexes: list of index of all selected customers
+        customer_df: dataframe containig all information about pending customers
+    '''
+    if rng is None:
+        rng = np.random.default_rng(constant.SEED+this_day)
+    selected_customers = customer_df.iloc[rollout_policy.select(customer_df, this_day, rng)]
+    selected_indexes = selected_customers.index.tolist()
+    return selected_customers, selected_indexes, customer_df
+
+
+def _solve_knapsack(values, weights, capacities, num_bins=constant.KP_BINS, core_size=constant.KP_CORE):
+    '''
+    Approximate solution of a knapsack with two resources. Items are sorted by value over normalized weight and the greedy solution
+    is found; the items far before the first one that doesn't fit are kept, the ones around it (the core) are chosen by dynamic
+    programming on weights rounded up to bins of the residual capacity, then the remaining capacity is filled greedily.
+    INPUTS:
+        values: numpy array of the (positive) values of the items
+        weights: numpy array of dimension #items*2 with the weights of the items for each resource
+        capacities: numpy array with the capacity of each resource
+        [num_bins]: number of bins in which the residual capacity of each resource is divided
+        [core_size]: number of items chosen by dynamic programming
+    OUTPUT:
+        chosen: boolean numpy array, it is True for the chosen items
+    '''
+    chosen = np.zeros(len(values), dtype=bool)
+    if len(values) == 0 or np.any(capacities <= 0):
+        return chosen
+    # sort items by value over the sum of the weights normalized by the capacities
+    load = (weights/capacities).sum(axis=1)
+    order = np.argsort(-values/np.maximum(load, np.finfo(float).tiny), kind='stable')
+    # number of items of the greedy solution
+    cumulative = np.cumsum(weights[order], axis=0)
+    num_greedy = min(np.searchsorted(cumulative[:, 0], capacities[0], side='right'),
+                     np.searchsorted(cumulative[:, 1], capacities[1], side='right'))
+    # the items before the core are kept
+    start = max(0, num_greedy-core_size//2)
+    chosen[order[:start]] = True
+    core = order[start:start+core_size]
+    residual = capacities-weights[chosen].sum(axis=0)
+    # weights rounded up to bins of the residual capacities, so that the solution of the binned problem is feasible
+    bins = np.ceil(weights[core]/np.maximum(residual, np.finfo(float).tiny)*num_bins).astype(np.int64)
+    chosen[core[_binned_knapsack(values[core], bins, num_bins)]] = True
+    # fill the capacity left by the rounding with the other items, in order of value over weight
+    kg_left, min_left = (capacities-weights[chosen].sum(axis=0)).tolist()
+    left = order[~chosen[order]]
+    # only the items that fit alone in the residual capacity are tried
+    left = left[(weights[left, 0] <= kg_left) & (weights[left, 1] <= min_left)]
+    for item, (kg, minutes) in zip(left.tolist(), weights[left].tolist()):
+        if kg <= kg_left and minutes <= min_left:
+            chosen[item] = True
+            kg_left -= kg
+            min_left -= minutes
+    return chosen
+
+
+def _binned_knapsack(values, bins, num_bins):
+    '''
+    Solve exactly by dynamic programming a knapsack with two resources, whose weights are integer numbers of bins.
+    INPUTS:
+        values: numpy array of the values of the items
+        bins: numpy array of dimension #items*2 with the number of bins of each item for each resource
+        num_bins: capacity of each resource in bins
+    OUTPUT:
+        chosen: boolean numpy array, it is True for the chosen items
+    '''
+    # best[a,b]: best value with at most a bins of the first resource and b of the second one
+    best = np.zeros((num_bins+1, num_bins+1))
+    # take[i,a,b]: item i is in the best solution of the first i+1 items with capacities a and b
+    take = np.zeros((len(values), num_bins+1, num_bins+1), dtype=bool)
+    for item, (value, (kg_bins, min_bins)) in enumerate(zip(values, bins)):
+        if kg_bins > num_bins or min_bins > num_bins:
+            continue
+        # value of adding the item to the best solutions of the previous items
+        candidate = best[:num_bins+1-kg_bins, :num_bins+1-min_bins]+value
+        improved = candidate > best[kg_bins:, min_bins:]
+        take[item, kg_bins:, min_bins:] = improved
+        best[kg_bins:, min_bins:] = np.where(improved, candidate, best[kg_bins:, min_bins:])
+    # go back from the full capacity to find the chosen items
+    chosen = np.zeros(len(values), dtype=bool)
+    kg_left, min_left = num_bins, num_bins
+    for item in range(len(values)-1, -1, -1):
+        if take[item, kg_left, min_left]:
+            chosen[item] = True
+            kg_left -= bins[item, 0]
+            min_left -= bins[item, 1]
+    return chosen
+
+
+def _urgent_selection(day, urgent, num_deliveries, stats):
+    '''
+    Select the first customers found by the queue of urgency and postpone the other ones, that are at their last available day.
+    INPUT:
+        day: object of class Day containing information about current day in simulation
+        urgent: list of identifiers of the most urgent customers, in order of urgency
+        num_deliveries: number of deliveries (and customers) to select for CVRP
+        stats: object of class SimulationStats in which the postponed customers are counted
+    OUTPUT:
+        selected_customers: dataframe containig all information about selected customers
+        selected_indexes: list of index of all selected customers
+    '''
+    selected_indexes = urgent[:num_deliveries]
+    selected_customers = day.customers.to_frame(selected_indexes)
+    # the customers found after the selected ones are at their last available day
+    postponed = urgent[num_deliveries:]
+    if postponed:
+        day.postpone_customers(postponed)
+        # increment number of postponed costumers
+        stats.add_postponed(day.current_day, len(postponed))
+    return selected_customers, selected_indexes
+
+
+def _postpone_clients(customer_df, this_day, served_clients, stats):
     '''
     Postpone costumers whose last available day is the current one, but weren't included in selected customers.
     INPUTS:
-        line: line of dataframe containig customers, it represent a single customer
+        customer_df: dataframe containig all information about pending customers
         this_day: integer representing current day in simulation
-        [served_clients]: list of indexes of customers that were selected to be served
-        [single_client]: Boolean flag.
-                         True: the customer I'm trying to postpone was among the selected customers
-                         False: the customer I'm trying to postpone wasn't among the selected customers
+        served_clients: list of indexes of customers that were selected to be served
+        stats: object of class SimulationStats in which the postponed customers are counted
     OUTPUT:
-        line: line of dataframe containig customers, it represent a single customer (updated)
+        customer_df: dataframe containig all information about pending customers (updated)
     '''
-    if single_client:
-        boolean = this_day == line.last_day
-    else:
-        boolean = this_day == line.last_day and line.name not in served_clients
-    if boolean:
-        global num_postponed
-        # increment number of postponed costumers
-        num_postponed += 1
-        # postpone last available day
-        line.last_day += 1
-        # this customer has been postponed
-        line.yet_postponed = True
-    return line
+    # customers at their last available day that were not selected
+    postponed = (customer_df['last_day'].to_numpy() == this_day) & \
+                ~np.isin(customer_df.index.to_numpy(), np.asarray(served_clients, dtype=np.int64))
+    # postpone last available day
+    customer_df.loc[postponed, 'last_day'] += 1
+    # these customers have been postponed
+    customer_df.loc[postponed, 'yet_postponed'] = True
+    # increment number of postponed costumers
+    stats.add_postponed(this_day, postponed.sum())
+    return customer_df
 
 
-def _check_capacity_constraints(selected_customers_df, kg_capacity, min_capacity):
+def _trim_selection(selected_costumers, day, selected_indexes, kg_capacity, min_capacity, stats):
     '''
-    Check if the selected customers satisfy the aggegate capacity constraints.
+    Keep the longest prefix of the selected customers that satisfies the aggegate capacity constraints, the other selected
+    customers are left among the pending ones.
     INPUTS:
-        selected_customers_df: dataframe containg all information about selected customers.
+        selected_costumers: dataframe constaining the selected customers, in order of selection
+        day: object of class Day containing information about current day in simulation
+        selected_indexes: list of indexes of selected customers
         kg_capacity: total available capacity in kg.
         min_capacity: total available service time in min.
-    OUTPUT:
-        check: Boolean, if True the constraints are satisfied, if False they aren't.
+        stats: object of class SimulationStats in which the postponed customers are counted
+    OUTPUTS:
+        selected_indexes: list of indexes of selected customers (updated)
+        selected_costumers: dataframe constaining the selected customers (updated)
     '''
-    # Total kg of selected customers
-    tot_kg = selected_customers_df['kg'].sum()
-    # Total minutes of service time of selected customers
-    tot_min = selected_customers_df['service_time'].sum()
-    # check if kg-capacity constraint is respected
-    kg_constraint = tot_kg <= kg_capacity
-    # check if min-capacity constraint is respected
-    min_constraint = tot_min <= min_capacity
-    # check if both constraints are satisfied
-    check = kg_constraint and min_constraint
-    return check
+    # total kg and minutes of service time of each prefix of the selected customers
+    cumulative_kg = np.cumsum(selected_costumers['kg'].to_numpy())
+    cumulative_min = np.cumsum(selected_costumers['service_time'].to_numpy())
+    # the sums are non decreasing, so the longest feasible prefix is found by a binary search on both constraints
+    num_selected = min(np.searchsorted(cumulative_kg, kg_capacity, side='right'),
+                       np.searchsorted(cumulative_min, min_capacity, side='right'))
+    return _keep_prefix(selected_costumers, day, selected_indexes, num_selected, stats)
 
 
-def _remove_client(selected_costumers, costumers, this_day, selected_indexes):
+def _keep_prefix(selected_costumers, day, selected_indexes, num_selected, stats):
+    '''
+    Keep the first selected customers and leave the other ones among the pending ones.
+    INPUTS:
+        selected_costumers: dataframe constaining the selected customers, in order of selection
+        day: object of class Day containing information about current day in simulation
+        selected_indexes: list of indexes of selected customers
+        num_selected: number of selected customers to keep
+        stats: object of class SimulationStats in which the postponed customers are counted
+    OUTPUTS:
+        selected_indexes: list of indexes of selected customers (updated)
+        selected_costumers: dataframe constaining the selected customers (updated)
+    '''
+    if num_selected < len(selected_indexes):
+        # customers that are no longer selected
+        removed = np.asarray(selected_indexes[num_selected:], dtype=np.int64)
+        # the ones at their last available day have to be postponed
+        postponed = removed[selected_costumers['last_day'].to_numpy()[num_selected:] == day.current_day]
+        day.postpone_customers(postponed)
+        # increment number of postponed costumers
+        stats.add_postponed(day.current_day, len(postponed))
+        # update selected customers
+        selected_costumers = selected_costumers.iloc[:num_selected]
+        selected_indexes = selected_indexes[:num_selected]
+    return selected_indexes, selected_costumers
+
+
+def _remove_client(selected_costumers, day, selected_indexes, stats):
     '''
     Remove last of selected customers and leave him among the pending ones.
     INPUTS:
         selected_costumers: dataframe constaining the selected customers
-        costumers: dataframe of all pending customers
-        this_day: integer representing current day in simulation
+        day: object of class Day containing information about current day in simulation
         selected_indexes: list of indexes of selected customers
+        stats: object of class SimulationStats in which the postponed customers are counted
     OUTPUTS:
         selected_indexes: list of indexes of selected customers (updated)
         selected_costumers: dataframe constaining the selected customers (updated)
-        costumers: dataframe of all pending customers (updated)
-    '''
-    # last customers among the selected ones
-    last_client = selected_costumers.tail(1)
-    # check if I have to postpone the client
-    last_client = last_client.apply(lambda line: _postpone_client(line, this_day, single_client=True), axis=1)
-    # update costumer in costumers' dataframe
-    costumers.at[selected_indexes[-1], 'last_day'] = last_client.iloc[0]['last_day']   
-    costumers.at[selected_indexes[-1], 'yet_postponed'] = last_client.iloc[0]['yet_postponed']
+    '''
+    # check if I have to postpone the last customer among the selected ones
+    if selected_costumers['last_day'].iat[-1] == day.current_day:
+        # postpone last available day of the customer
+        day.postpone_customers([selected_indexes[-1]])
+        # increment number of postponed costumers
+        stats.add_postponed(day.current_day, 1)
     # update selected customers dataframe
     selected_costumers.drop(selected_costumers.tail(1).index, inplace=True)
     # remove index of the customer from the list of indexes
     del selected_indexes[-1]
-    return selected_indexes, selected_costumers, costumers
+    return selected_indexes, selected_costumers
 
 
-def _index_selection(line, compatibility, day, all_cells, probabilities):
+def _index_selection(customer_df, day, compatibility, probabilities, occupancy=None, compatible_matrix=None):
     '''
     Calculate index to associate to each customer for selection according to policy NP.
     Reference paper: https://www.sciencedirect.com/science/article/abs/pii/S0305054814000458
+    The cardinality of the not active compatible cells and the sum of their probabilities depend only on the cell of the customer,
+    so they are computed once for all cells with a product of the matrix of compatible cells and the vectors of empty cells.
     INPUTS:
-        line: line of dataframe of pending customers, it represents a costumer
-        compatibility: list of dimension #cells whose elements are lists of convenient cells
+        customer_df: dataframe containig all information about pending customers
         day: integer representing current day in simulation
-        all_cells: set of all cells from which at least one of the pending customers comes from
+        compatibility: list of dimension #cells whose elements are lists of convenient cells
         probabilities: dataframe column containig probabilities of a customer to belong to each cell
+        [occupancy]: object of class CellOccupancy of the pending customers, if it is None the occupied cells are found from
+                     customer_df
+        [compatible_matrix]: sparse boolean matrix of compatible cells returned by compatibility_matrix, built from compatibility
+                             if it is None
     OUTPUT:
-        line: line of dataframe of pending customers, it represents a costumer (updated)
-    '''
-    # last available day to serve this costumer
-    last_day = line.last_day
-    # convert into a set the list of compatible cells
-    compatibility = set(compatibility)
-    # compute set of compatible cells that have no pending costumer coming from (not active compatible cells)
-    not_present_cell = compatibility.difference(all_cells)
-    
+        index: numpy array containing the index of each customer, in the order of customer_df
+    '''
+    # matrix of compatible cells
+    matrix = compatible_matrix if compatible_matrix is not None else compatibility_matrix(compatibility)
+    num_cells = matrix.shape[0]
+    # cells in the lists of compatible cells of the customers (the list of cell c is in position c-1)
+    keys = customer_df['cell'].to_numpy()-1
+    # cells from which at least one of the pending customers comes from (in the positions of the compatible lists)
+    occupied = np.zeros(num_cells, dtype=bool)
+    if occupancy is not None:
+        occupied[:-1] = occupancy.occupied[1:num_cells]
+    else:
+        occupied[keys[keys >= 0]] = True
+    # for each cell: cardinality of not active compatible cells and sum of their probabilities
+    empty = (~occupied).astype(np.float64)
+    cardinality = matrix @ empty
+    missing_probability = matrix @ (probabilities.to_numpy()*empty)
+    # gather the values of the cell of each customer (negative positions are counted from the end, as in a list)
+    cardinality = cardinality[keys]
+    missing_probability = missing_probability[keys]
     # compute time distance
-    availability = last_day-day
-    # cardinality of not active compatible cells
-    cardinality = len(not_present_cell)
+    availability = customer_df['last_day'].to_numpy()-day
     # Compute index
-    M =constant.M
+    M = constant.M
     gamma = constant.gamma
-    if availability>0:
-        if cardinality>0:
-            line['index'] = 1/availability*(1+1/cardinality*(cardinality-probabilities[list(not_present_cell)].sum()))
-        else:
-            line['index'] = M/availability
-    else:
-        if line.yet_postponed == False:
-            line['index'] = M
-        else:
-            line['index'] = M+gamma
-    return line
-
-
-def _index_selection_1(line, compatibility, day, all_cells, probabilities, compatibility_index, depot_distance):
-    '''
-    Calculate index to associate to each customer for selection according to policy NP_1.
-    This is a modify of previous index that takes into account that costumers near to depot are much easier to serve than the
-    ones that are very far from it. Moreover the index takes into accout the actual percentage savings and the expected ones,
-    balancing them by travel time and service time of the customer.
-    INPUTS:
-        line: line of dataframe of pending customers, it represents a costumer
-        compatibility: list of dimension #cells whose elements are lists of convenient cells
-        day: integer representing current day in simulation
-        all_cells: set of all cells from which at least one of the pending customers comes from
-        probabilities: dataframe column containig probabilities of a customer to belong to each cell
-        compatibility_index: numpy array of dimension #cells*#cells which contains the saving indexes
-        depot_distance: numpy array of dimension #cells+1 containing all distances from depot to each cells (and the depot itself
-                        in position 0)
-    OUTPUT:
-        line: line of dataframe of pending customers, it represents a costumer (updated)
-    '''
-    # average of new costumers
-    N = constant.AVG_CUSTOMERS
-    # last available day
-    last_day = line.last_day
-    # convert into a set the list of compatible cells
-    compatibility = set(compatibility)
-    # compute set of possible future compatible cells
-    future_costumers = compatibility.difference(all_cells)
-    # compute set of actual compatible cells
-    present_costumers = compatibility.difference(future_costumers)
-    # compute time distance
-    T = last_day-day
-    # cell of the considered costumer
-    cell = line.cell
-    # cumpute savings with present_costumers
-    present_savings = compatibility_index[cell-1][list(present_costumers)].sum()
-    # compute expected future savings
-    exp_future_savings = (1-(1-probabilities[list(future_costumers)])**(T*N)) @ compatibility_index[cell-1][list(future_costumers)]
-    # percentage time distance considering both travel and service time
-    distance_perc = (depot_distance[cell]+line.service_time)/(max(depot_distance)+constant.BIG_TIME_MAX)
-    # Compute the index
-    if T>0:
-        line['index'] = 1/T*((1-distance_perc)*present_savings-distance_perc*exp_future_savings)
-    else:
-        line['index'] = constant.M_1
-    
-    return line
-    
+    index = np.where(customer_df['yet_postponed'].to_numpy(), M+gamma, M).astype(np.float64)
+    # customers that can still be postponed
+    available = availability > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        index[available] = np.where(cardinality[available] > 0,
+                                    1/availability[available]*(1+1/cardinality[available]*(cardinality[available]-
+                                                                                          missing_probability[available])),
+                                    M/availability[available])
+    return index
@@ -0,0 +1,112 @@
+"""
+This file contains the functions that repair an unfeasible CVRP: when the selected customers cannot be served by the available
+vehicles, the CVRP is solved on the largest feasible prefix of the ranked selected customers, instead of removing the last customer
+and solving again from scratch until a feasible solution is found.
+The prefix is found by bisection over its length, so a day needs O(log(#selected)) solver calls instead of O(#removed customers).
+For OR-Tools the bisection is driven by cheap Clarke and Wright feasibility probes, then OR-Tools is called on the prefix found.
+"""
+
+# import Classes
+from Classes.ClarkWrightSolver import ClarkWrightSolver
+# import functions
+from VRP_optimization.mainVRP import VRP_optimization
+
+
+def largest_feasible_prefix(num_customers, probe, upper=None):
+    '''
+    Find by bisection the largest number of customers for which the CVRP is feasible, assuming that if the CVRP on a prefix of the
+    customers is feasible the CVRP on a shorter prefix is feasible too.
+    INPUTS:
+        num_customers: number of selected customers
+        probe: function probe(k) that solves the CVRP on the first k customers, it returns the solution if it is feasible and None
+               otherwise
+        [upper]: number of customers for which the CVRP is known to be unfeasible, the longest prefix is tried first if not given
+    OUTPUTS:
+        num_feasible: number of customers of the largest feasible prefix
+        result: solution returned by probe(num_feasible)
+        num_probes: number of calls of probe
+    '''
+    num_probes = 0
+    if upper is None:
+        # in most days all selected customers can be served
+        result = probe(num_customers)
+        num_probes += 1
+        if result is not None:
+            return num_customers, result, num_probes
+        upper = num_customers
+    # lower is feasible (the empty prefix is feasible), upper is unfeasible
+    lower, lower_result = 0, None
+    while upper-lower > 1:
+        middle = (lower+upper)//2
+        result = probe(middle)
+        num_probes += 1
+        if result is not None:
+            lower, lower_result = middle, result
+        else:
+            upper = middle
+    if lower_result is None:
+        # solution of the empty prefix
+        lower_result = probe(lower)
+        num_probes += 1
+    return lower, lower_result, num_probes
+
+
+def repair_cwts(selected_customers, depot):
+    '''
+    Find the initial Clarke and Wright solution of the largest feasible prefix of the selected customers.
+    INPUTS:
+        selected_customers: dataframe of the selected customers, in order of selection
+        depot: numpy array with x-coordinate and y-coordinate of the depot
+    OUTPUTS:
+        num_feasible: number of customers that can be served
+        clark_wright_sol: object of class ClarkWrightSolver with the feasible solution of the first num_feasible customers
+        num_probes: number of solved CVRPs
+    '''
+    return largest_feasible_prefix(len(selected_customers), lambda k: _probe_cwts(selected_customers.iloc[:k], depot))
+
+
+def repair_ortools(selected_customers, depot, vehicles, capacity):
+    '''
+    Solve with OR-Tools the largest feasible prefix of the selected customers: if the whole selection is unfeasible, the prefix is
+    found with Clarke and Wright probes and then checked by OR-Tools.
+    INPUTS:
+        selected_customers: dataframe of the selected customers, in order of selection
+        depot: numpy array with x-coordinate and y-coordinate of the depot
+        vehicles: number of available vehicles
+        capacity: capacity of each vehicle (kg)
+    OUTPUTS:
+        num_feasible: number of customers that can be served
+        result: tuple (data, manager, routing, solution, obj_value) returned by VRP_optimization for the first num_feasible customers
+        num_probes: number of solved CVRPs
+    '''
+
+    def probe(k):
+        result = VRP_optimization(selected_customers.iloc[:k], depot, vehicles, capacity)
+        return result if result[3] else None
+
+    num_customers = len(selected_customers)
+    result = probe(num_customers)
+    if result is not None:
+        return num_customers, result, 1
+    # prefix that Clarke and Wright can serve
+    num_feasible, _, num_probes = largest_feasible_prefix(num_customers, lambda k: _probe_cwts(selected_customers.iloc[:k], depot),
+                                                          upper=num_customers)
+    result = probe(num_feasible)
+    if result is not None:
+        return num_feasible, result, num_probes+2
+    # OR-Tools needs a shorter prefix
+    num_feasible, result, ortools_probes = largest_feasible_prefix(num_feasible, probe, upper=num_feasible)
+    return num_feasible, result, num_probes+ortools_probes+2
+
+
+def _probe_cwts(customers, depot):
+    '''
+    Clarke and Wright feasibility probe.
+    INPUTS:
+        customers: dataframe of the customers of the CVRP
+        depot: numpy array with x-coordinate and y-coordinate of the depot
+    OUTPUT:
+        clark_wright_sol: object of class ClarkWrightSolver with the solution, None if it is not feasible
+    '''
+    clark_wright_sol = ClarkWrightSolver(customers, depot)
+    return clark_wright_sol if clark_wright_sol.solve() else None
@@ -0,0 +1,65 @@
+"""
+This file contains the functions that estimate, before any CVRP solver runs, whether the available vehicles can serve the selected
+customers. The selection only checks the aggregate kg and minutes of service, while each vehicle also serves at most
+CUSTOMER_CAPACITY customers and has to come back to the depot within TIME minutes.
+Three cheap lower bounds on the number of vehicles needed are computed for each prefix of the selected customers:
+- kg: max(ceil(total kg/CAPACITY), number of customers whose demand is more than CAPACITY/2), since two of them never fit in the
+      same vehicle (bin-packing bound)
+- customers: ceil(number of customers/CUSTOMER_CAPACITY)
+- time: ceil((total service time + 2/CUSTOMER_CAPACITY*total distance from depot)/TIME), since a route is at least twice as long as
+        the distance of its farthest customer from the depot, which is at least the average distance of its customers
+All of them never decrease when a customer is added, so the longest prefix that the fleet may serve is found by a binary search
+and the selection is trimmed before calling a solver that would certainly fail.
+"""
+
+# To deal with numerical operations
+import numpy as np
+from scipy.spatial import distance
+
+import constant
+
+
+def fleet_lower_bounds(customers, depot, capacity=constant.CAPACITY):
+    '''
+    Compute the lower bounds on the number of vehicles needed to serve each prefix of the customers.
+    INPUTS:
+        customers: dataframe of the customers, in order of selection
+        depot: numpy array with x-coordinate and y-coordinate of the depot
+        [capacity]: capacity of each vehicle (kg)
+    OUTPUT:
+        bounds: dictionary containing for each bound a numpy array, whose element k is the bound for the first k+1 customers
+                'kg' -> bin-packing bound on the demands
+                'customers' -> bound on the number of customers served by each vehicle
+                'time' -> bound on the service time and on the travel time from and to the depot
+    '''
+    demand = customers['kg'].to_numpy()
+    # distances from the depot are rounded as in the distance matrix of the solvers
+    depot_distance = np.round(distance.cdist(np.atleast_2d(depot), customers[['x', 'y']].to_numpy())[0], 3) \
+        if len(customers) else np.zeros(0)
+    # minimum duration of the routes serving each prefix
+    min_time = np.cumsum(customers['service_time'].to_numpy()+2*depot_distance/constant.CUSTOMER_CAPACITY)
+    return {
+        'kg': np.maximum(-(-np.cumsum(demand)//capacity), np.cumsum(2*demand > capacity)),
+        'customers': -(-np.arange(1, len(customers)+1)//constant.CUSTOMER_CAPACITY),
+        'time': np.ceil(min_time/constant.TIME).astype(np.int64)
+    }
+
+
+def bounded_prefix(customers, depot, vehicles, capacity=constant.CAPACITY):
+    '''
+    Find the longest prefix of the customers that is not excluded by the lower bounds on the number of vehicles.
+    INPUTS:
+        customers: dataframe of the customers, in order of selection
+        depot: numpy array with x-coordinate and y-coordinate of the depot
+        vehicles: number of available vehicles
+        [capacity]: capacity of each vehicle (kg)
+    OUTPUTS:
+        num_bounded: number of customers of the longest prefix whose bounds do not exceed the available vehicles
+        prefix_bounds: dictionary containing the value of each bound for that prefix (0 for the empty prefix)
+    '''
+    bounds = fleet_lower_bounds(customers, depot, capacity)
+    # the bounds never decrease along the prefixes, so their maximum does not decrease either
+    needed = np.maximum.reduce(list(bounds.values()))
+    num_bounded = int(np.searchsorted(needed, vehicles, side='right'))
+    prefix_bounds = {name: int(values[num_bounded-1]) if num_bounded else 0 for name, values in bounds.items()}
+    return num_bounded, prefix_bounds
@@ -18,7 +18,7 @@ def check_arguments(argv):
     '''
     Parse command line and check if the passed arguments are correct:
     Run code with command line arguments:
-        input_file_path -p policy -d days_simulation -s solver
+        input_file_path -p policy -d days_simulation -s solver [--trace trace_dir]
     WHERE:
         - input_file_path is the file containing density distribution (i.e. grid.txt)
         - policy is the desired policy to select which customers to serve
@@ -26,10 +26,13 @@ def check_arguments(argv):
             DP : delayed policy
             NP : neighbourhood policy
             NP_1 : neighbourhood policy 1
+            KP : knapsack policy
+            MC : Monte Carlo policy
         - days_simulation is the number of day you want to simulate
         - solver is the solver for CVRP
             ortools : Google ORtools solver
             cwts : CW-TS solver
+        - trace_dir is an optional directory containing the arrivals to replay, generated by command generate-trace
     
     INPUT:
         argv: command line arguments
@@ -39,6 +42,7 @@ def check_arguments(argv):
         policy: the selected policy for simulation
         n_days: number of days of simulation
         solver: solver type for CVRP
+        trace_path: path of the trace to replay, empty string if the arrivals have to be simulated
     ''' 
     # Initialize variables
     error = False
@@ -46,11 +50,12 @@ def check_arguments(argv):
     policy = ''
     n_days = ''
     solver = ''
+    trace_path = ''
     # Check if the number of input arguments is correct
-    if len(argv)==8:
+    if len(argv)==8 or len(argv)==10:
         # file with initial distribution of clients
         input_path = argv[1]
-        if argv[2]=="-p" and (argv[3]=="EP" or argv[3]=="DP" or argv[3]=="NP" or argv[3]=="NP_1"):
+        if argv[2]=="-p" and (argv[3]=="EP" or argv[3]=="DP" or argv[3]=="NP" or argv[3]=="NP_1" or argv[3]=="KP" or argv[3]=="MC"):
             # policy for customer selections
             policy = argv[3]
         else:
@@ -68,43 +73,91 @@ def check_arguments(argv):
         else:
             sys.stderr.write("Error: not available inserted solver\n")
             error = True
+        if len(argv)==10:
+            if argv[8]=="--trace":
+                # directory of the arrivals' trace
+                trace_path = argv[9]
+            else:
+                sys.stderr.write("Error: optional argument\n")
+                error = True
     else:
         error = True
     if error:
         print(argv)
-        sys.stderr.write("Run code with command line arguments:\n input_file_path -p policy -d days_simulation -s solver\n WHERE:\n\
+        sys.stderr.write("Run code with command line arguments:\n input_file_path -p policy -d days_simulation -s solver [--trace trace_dir]\n WHERE:\n\
         - input_file_path is the file containing density distribution (i.e. grid.txt)\n\
         - policy is the desired policy to select which customers to serve \n\
-        \t EP : early policy\n \t\t DP : delayed policy\n \t\t NP : neighbourhood policy\n \t\t NP_1 : neighbourhood policy 1\n\
+        \t EP : early policy\n \t\t DP : delayed policy\n \t\t NP : neighbourhood policy\n \t\t NP_1 : neighbourhood policy 1\n \t\t KP : knapsack policy\n \t\t MC : Monte Carlo policy\n\
         - days_simulation is the number of day you want to simulate\n\
         - solver is the solver to solve CVRP \n\
-        \t ortools: Google ORtools solver\n \t\t cwts: CW-TS solver\n")
-    return error, input_path, policy, n_days, solver
+        \t ortools: Google ORtools solver\n \t\t cwts: CW-TS solver\n\
+        - trace_dir is an optional directory of arrivals to replay, generated by command generate-trace\n")
+    return error, input_path, policy, n_days, solver, trace_path
+
+
+def check_trace_arguments(argv):
+    '''
+    Parse command line of command generate-trace and check if the passed arguments are correct:
+    Run code with command line arguments:
+        generate-trace input_file_path -d days_simulation -o trace_dir
+    WHERE:
+        - input_file_path is the file containing density distribution (i.e. grid.txt)
+        - days_simulation is the number of day of arrivals to simulate
+        - trace_dir is the directory in which the trace is saved
+
+    INPUT:
+        argv: command line arguments
+    OUTPUTS:
+        error: True if there is some kind of error in the input arguments
+        input_path: path of input file containing cells' distributions
+        n_days: number of days of simulation
+        trace_path: path of the directory of the trace
+    '''
+    # Initialize variables
+    error = False
+    input_path = ''
+    n_days = ''
+    trace_path = ''
+    if len(argv)==7 and argv[1]=="generate-trace" and argv[3]=="-d" and argv[5]=="-o":
+        # file with initial distribution of clients
+        input_path = argv[2]
+        # number of simulated days
+        n_days = int(argv[4])
+        # directory of the trace
+        trace_path = argv[6]
+    else:
+        error = True
+        sys.stderr.write("Run code with command line arguments:\n generate-trace input_file_path -d days_simulation -o trace_dir\n")
+    return error, input_path, n_days, trace_path
     
     
 
-def clean_files(): 
+def clean_files(output_dir='.', layout='text'):
     '''
     Clean pre-existing files:
-        './Data/simulated_clients.txt' will contain all information of the custumers generated by the simulation, each day all
-                                       pending customers will be saved
-        './Data/selected_customers.txt' will contain all information of selected customer according to the chosen policy, each day
-                                        the customers used in a feasible CVRP will be saved
-        './Solution/routes.sol' will contain the routes found by CVRP solver, each day the customers served by each vehicle (and
-                                their order) will be saved
+        'Data/simulated_clients.txt' will contain all information of the custumers generated by the simulation, each day all
+                                     pending customers will be saved
+        'Data/selected_customers.txt' will contain all information of selected customer according to the chosen policy, each day
+                                      the customers used in a feasible CVRP will be saved
+        'Solution/routes.sol' will contain the routes found by CVRP solver, each day the customers served by each vehicle (and
+                              their order) will be saved, with layout 'jsonl' 'Solution/routes.jsonl' is cleaned instead
+    INPUTS:
+        [output_dir]: directory that contains the output files
+        [layout]: layout of the file of the daily routes ('text' or 'jsonl'), only the file of this layout is cleaned
     '''
-    file1 = open('./Data/simulated_clients.txt', 'w+') 
+    # Create directories, if they don't exist yet
+    for directory in ('Data', 'Solution'):
+        if not os.path.exists(os.path.join(output_dir, directory)):
+            os.makedirs(os.path.join(output_dir, directory))
+
+    file1 = open(os.path.join(output_dir, 'Data', 'simulated_clients.txt'), 'w+') 
     file1.close()
 
-    file2 = open('./Data/selected_customers.txt', 'w+') 
+    file2 = open(os.path.join(output_dir, 'Data', 'selected_customers.txt'), 'w+') 
     file2.close()
 
-    # Create directory, if it doesn't exist yet
-    if not os.path.exists('Solution'):
-        os.mkdir('Solution')
-
-    file3 = open('./Solution/routes.sol', 'w+') 
-    file3.close()    
+    file3 = open(os.path.join(output_dir, 'Solution', 'routes.sol' if layout == 'text' else 'routes.jsonl'), 'w+')
+    file3.close()
 
 
 
@@ -168,7 +221,7 @@ def load_distribution(file_path):
 
 
 
-def save_routes(day, data, manager, routing, solution, file_path='./Solution/routes.sol'):
+def save_routes(day, data, manager, routing, solution, writer):
     '''
     Save routes found by CVRP solver: each day the file containg all the solutions of the simulationis updated.
     INPUTS:
@@ -183,63 +236,39 @@ def save_routes(day, data, manager, routing, solution, file_path='./Solution/rou
         manager: routing index manager
         routing: routing model
         solution: solution to CVRP
-        [file_path]: path to file in which the solutions to CVRPs are saved
+        writer: object of class SolutionWriter used to save the solution
     OUTPUT:
         num_empty_route: number of empty vehicles in the current day
     '''
-    # Initialize variables:
-    # lenght of the longest route
-    max_route_distance = 0
-    # total lenght of all routes
-    total_distance = 0
-    # total load of all routes
-    total_load = 0
     # number of empty vehicles
     num_empty_route = 0
-    # Save the current day
-    with open(file_path, 'a') as fp:            
-        fp.write(f'\n DAY: {day.current_day} \n')
-    # Save routes of all vehicles
+    # records of the routes of all vehicles
+    records = []
     for vehicle_id in range(data['num_vehicles']):
         index = routing.Start(vehicle_id)
-        plan_output = 'Route for vehicle {}:\n'.format(vehicle_id)
+        # path of the route
+        route = []
         # lenght of route for a single vehicle
         route_distance = 0
         # load for a single vehicle
         route_load = 0
-        # number of customer for a single vehicle
-        empty_route = 0
         # Cycle on all customers served by the considered vehicle
         while not routing.IsEnd(index):
-            empty_route += 1
             # index of the customer
             node_index = manager.IndexToNode(index)
             # demand of the customer
             route_load += data['demands'][node_index]
-            plan_output += ' {} -> '.format(node_index)
+            route.append(node_index)
             previous_index = index
             # select following customer
             index = solution.Value(routing.NextVar(index))
             # add the real lenght of the arc
             route_distance += data['distance_matrix'][manager.IndexToNode(previous_index)][manager.IndexToNode(index)]
-        plan_output += '{}\n'.format(manager.IndexToNode(index))
-        # Save travel and service time of the route (h)
-        plan_output += 'Travel and service time of the route: {} h\n'.format(round(route_distance/60,2))
-        # Save load of the route (kg)
-        plan_output += 'Load of the route: {} kg \n'.format(round(route_load,2))
-        total_distance += route_distance
-        total_load += route_load
-        max_route_distance = max(max_route_distance, route_distance)
+        route.append(manager.IndexToNode(index))
         # If the only node in the route for the vehicle is the depot this vehicle is empty
-        if empty_route<=1 :
+        if len(route) <= 2:
             num_empty_route += 1
-        with open(file_path, 'a') as fp:          
-            fp.write(plan_output)
-    with open(file_path, 'a') as fp:          
-            fp.write('Total travel and service time of all routes: {} h\n'.format(round(total_distance/60,2)))
-            fp.write('Total load of all routes: {} kg\n'.format(round(total_load, 2)))
-            fp.write('Maximum of the route travel time: {} h\n'.format(round(max_route_distance/60,2)))
+        records.append({'vehicle': vehicle_id, 'route': route, 'load_kg': route_load, 'load_min': route_distance})
+    # Save the routes of the current day, the last node of each route is written without the leading space
+    writer.write_day(day.current_day, records, last_separator='')
     return num_empty_route
-
-
-    
\ No newline at end of file
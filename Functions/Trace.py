@@ -0,0 +1,106 @@
+'''
+Arrival traces:
+The following functions are useful
+- to simulate once the customers' arrivals of all days and save them in a trace
+- to load a trace and read the arrivals of a single day, so that the same customers can be replayed with different policies
+  and solvers without simulating them again
+
+A trace is a directory containing one numpy file (.npy) for each column of the customers
+    x.npy, y.npy, kg.npy, service_time.npy, last_day.npy, cell.npy
+where the customers of all days are stored one after the other, and the file
+    offsets.npy
+containing #days+1 integers: the customers arrived in day d (starting from 1) are the rows offsets[d-1]:offsets[d] of each column.
+The columns are memory-mapped when the trace is loaded, so only the rows of the current day are read from disk.
+Any order history can be replayed by writing it in this format, 'last_day' is expressed as absolute day of simulation.
+'''
+
+
+import os
+import numpy as np
+
+# import Classes
+from Classes.Day import Day
+from Classes.CustomerStore import CustomerStore
+
+# columns saved in a trace
+TRACE_COLUMNS = ('x', 'y', 'kg', 'service_time', 'last_day', 'cell')
+
+
+class TraceError(ValueError):
+    '''
+    Error raised when a trace cannot be replayed, e.g. it contains fewer days than the simulation.
+    '''
+
+
+def generate_trace(distribution_df, new_customers, trace_dir, streams=None):
+    '''
+    Simulate the arrivals of all days and save them in a trace.
+    INPUTS:
+        distribution_df: dataframe containg all information about cells, each row represents a cell
+        new_customers: numpy array with the number of new customers arriving in each day
+        trace_dir: path to the directory of the trace
+        [streams]: object of class RandomStreams, None to use the global random state
+    '''
+    # Create directory, if it doesn't exist yet
+    if not os.path.exists(trace_dir):
+        os.makedirs(trace_dir)
+    # the multinomial simulation assigns exactly new_customers[day] customers to the cells
+    offsets = np.concatenate(([0], np.cumsum(new_customers))).astype(np.int64)
+    # preallocate the columns directly on disk
+    columns = {}
+    for name in TRACE_COLUMNS:
+        columns[name] = np.lib.format.open_memmap(os.path.join(trace_dir, name+'.npy'), mode='w+',
+                                                  dtype=CustomerStore.dtypes[name], shape=(int(offsets[-1]),))
+    for day in range(len(new_customers)):
+        # random generator of the arrivals of the day, the same used by main
+        rng = streams.generator('arrivals', day+1) if streams is not None else None
+        # simulate the day on an empty store, so that only its arrivals are kept in memory
+        if day == 0:
+            new_day = Day(new_customers[day], True, distribution_df, rng=rng)
+        else:
+            new_day = Day(new_customers[day], previous_customers=CustomerStore(), rng=rng)
+        for name in TRACE_COLUMNS:
+            columns[name][offsets[day]:offsets[day+1]] = new_day.customers.column(name)
+    for values in columns.values():
+        values.flush()
+    np.save(os.path.join(trace_dir, 'offsets.npy'), offsets)
+
+
+def load_trace(trace_dir):
+    '''
+    Load a trace memory-mapping its columns.
+    INPUT:
+        trace_dir: path to the directory of the trace
+    OUTPUT:
+        trace: dictionary containing the memory-mapped columns of the trace and the array of the day offsets ('offsets')
+    '''
+    trace = {name: np.load(os.path.join(trace_dir, name+'.npy'), mmap_mode='r') for name in TRACE_COLUMNS}
+    trace['offsets'] = np.load(os.path.join(trace_dir, 'offsets.npy'))
+    return trace
+
+
+def trace_days(trace):
+    '''
+    OUTPUT:
+        number of days stored in the trace
+    '''
+    return len(trace['offsets'])-1
+
+
+def read_trace_day(trace, day):
+    '''
+    Read the customers that arrived in a day of the trace.
+    INPUTS:
+        trace: dictionary returned by load_trace
+        day: day of simulation (starting from 1)
+    OUTPUT:
+        customers_data: dictionary containing the columns of the new customers, with the same keys of Day._simulate_customers
+    '''
+    # rows of the customers of the day
+    start, end = trace['offsets'][day-1], trace['offsets'][day]
+    customers_data = {name: np.asarray(trace[name][start:end]) for name in TRACE_COLUMNS}
+    # at the beginning no customer has been postponed
+    customers_data['yet_postponed'] = np.zeros(end-start, dtype=bool)
+    # initialize index
+    customers_data['index'] = np.zeros(end-start)
+    return customers_data
@@ -6,6 +6,16 @@ in other part of the code'''
 
 # number of days not to consider in objective function
 NUM_DAYS = 10
+# if True all pending and selected customers are also saved every day as text in Data/simulated_clients.txt and
+# Data/selected_customers.txt, otherwise only the daily events are saved in the binary log Data/events.log
+TEXT_SNAPSHOTS = False
+# layout of the file of the daily routes: 'text' saves Solution/routes.sol, 'jsonl' saves Solution/routes.jsonl with a JSON object
+# for each route
+SOLUTION_LAYOUT = 'text'
+# maximum number of write operations of the output files waiting for the background writer thread
+OUTPUT_QUEUE_SIZE = 64
+# directory in which the data computed from the grid of cells are cached, if it is empty they are computed in each simulation
+GRID_CACHE_DIR = './Data/cache'
 # seed for simulations
 SEED = 57
 # time limit for CVRP solver (never reached)
@@ -52,6 +62,11 @@ BIG_TIME_MAX = 135
 MIN_DAY = 3
 # maximum number of day after the current day which specify the availability of a customer
 MAX_DAY = 5
+# if True new customers are simulated cell by cell and all components share the global random state seeded with SEED,
+# reproducing bit-for-bit the random stream of the original simulator;
+# if False all the customers of a day are simulated at once with array-wide draws and each day and component (arrivals,
+# selection, CW-TS solver) has its own random stream spawned from SEED
+LEGACY_RANDOM_STREAM = False
 
 # ------------------------------------------------ TUNED PARAMETERS POLICY NP--------------------------------------------------------------------
 
@@ -60,6 +75,15 @@ threshold = 0.9992
 # Threashold to select which cells in the neighbourhood of a specific cell give percentage savings higher than rho:
 # it must be < 0.5 otherwise none of the neighbours is considered
 rho = 0.45
+# if True the saving indexes of the cells are kept in a sparse float32 matrix, with only the ones higher than COMPATIBILITY_FLOOR:
+# the dense matrix #cells*#cells doesn't fit in memory for fine-grained grids
+SPARSE_COMPATIBILITY = False
+# minimum saving index kept in the sparse matrix, it must not be higher than rho
+COMPATIBILITY_FLOOR = 0.4
+# memory (MB) available for the temporary arrays used to compute the saving indexes of the cells
+COMPATIBILITY_MEMORY_MB = 256
+# number of threads that compute the saving indexes of the cells
+COMPATIBILITY_WORKERS = 1
 # Constant index assigned to clients that are at their last available day to be served
 M = 5
 # Constant value to add to M for clients that are at their last available day and are yet be postponed
@@ -74,6 +98,31 @@ M_1 = 8
 # Threshold for selecting which customers to serve according to index generated by policy NP_1
 threshold_1 = -0.4
 
+# ------------------------------------------------ TUNED PARAMETERS POLICY KP--------------------------------------------------------------------
+
+# Policy KP uses the index of policy NP_1: the value of a customer in the knapsack is his index minus threshold_1
+# Number of bins in which the residual kg and minutes are divided in the dynamic programming step of the knapsack
+KP_BINS = 100
+# Number of customers around the greedy solution whose selection is decided by dynamic programming
+KP_CORE = 200
+
+# ------------------------------------------------ TUNED PARAMETERS POLICY MC--------------------------------------------------------------------
+
+# Number of scenarios of the arrivals of the following day sampled each day
+MC_SCENARIOS = 64
+# Number of scenarios evaluated by each task of the pool of processes
+MC_BATCH = 8
+# Maximum number of candidate selections compared in each day
+MC_CANDIDATES = 11
+# Time (s) available each day to evaluate the scenarios, the scenarios not evaluated within it are discarded
+MC_TIME_BUDGET = 5
+# Number of processes that evaluate the scenarios, with 1 they are evaluated in the main process
+MC_WORKERS = 4
+# Constant of the local tour in the approximation of the travel time (Beardwood-Halton-Hammersley constant)
+MC_TOUR_CONSTANT = 0.7124
+# Travel time (min) charged for each customer left at his last available day that doesn't fit in the capacity of the next day
+MC_LATE_PENALTY = 120
+
 
 # ------------------------------------------------ CW-TS SOLVER'S PARAMETERS --------------------------------------------------------------------------
 
@@ -85,4 +134,9 @@ NUM_PERM = 20
 GAP_WORSE = 250
 # Length of the Tabu List
 TABU_LENGTH = 40
+# Instances with more customers than this are initialized with the granular version of Clark and Wright (with the default fleet of
+# NUM_VEHICLES*CUSTOMER_CAPACITY = 250 customers such instances never fit, so the granular solution is discarded for all pairs)
+CW_GRANULAR_MIN = 1000
+# Number of nearest neighbours of each customer whose savings are considered by the granular version of Clark and Wright
+CW_NEIGHBOURS = 30
 
@@ -0,0 +1,180 @@
+"""
+EXPERIMENTS
+
+Run a grid of simulations, one for each combination of seeds, policies, solvers and values of the overridden constants, on a pool
+of worker processes. Each simulation writes its output files in its own directory and the final statistics of all simulations are
+collected in one results table.
+
+Run with command line arguments:
+    python experiments.py input_file_path -d days_simulation --seeds seed [seed ...] --policies policy [policy ...]
+                          --solvers solver [solver ...] [--set NAME=VALUE[,VALUE...] ...] [--workers N] [--trace trace_dir]
+                          [-o output_dir] [--results file_name]
+WHERE:
+    - input_file_path is the file containing density distribution (i.e. grid.txt)
+    - days_simulation is the number of day you want to simulate
+    - seed is a seed for the simulation (it overrides constant.SEED)
+    - policy is a policy to select which customers to serve (EP, DP, NP, NP_1, KP, MC)
+    - solver is a solver for CVRP (ortools, cwts)
+    - NAME=VALUE overrides a constant of constant.py, a comma separated list of values adds one dimension to the grid
+    - N is the number of worker processes (default: number of CPUs), each one runs one simulation and policy MC doesn't start
+      other processes unless MC_WORKERS is overridden
+    - trace_dir is an optional directory of arrivals to replay, generated by command generate-trace of main.py
+    - output_dir is the directory of the output files (default: Experiments), each simulation writes in output_dir/jobs/job_name
+    - file_name is the name of the results table in output_dir (default: results.csv), a .parquet extension saves it in Parquet
+      format (it needs pyarrow)
+
+For example
+    python experiments.py grid.txt -d 100 --seeds 1 2 3 --policies EP NP_1 --solvers ortools cwts --set MAX_TIME=5 --workers 32
+"""
+
+# import to parse command line arguments
+import argparse
+# import to parse the values of the overridden constants
+import ast
+# import to build the grid of simulations
+import itertools
+# import to deal with paths
+import os
+# import to run the simulations in parallel
+from concurrent.futures import ProcessPoolExecutor, as_completed
+# To deal with data frame
+import pandas as pd
+
+# import constant variables
+import constant
+
+
+def parse_overrides(assignments):
+    '''
+    Parse the overrides of constants given as NAME=VALUE[,VALUE...].
+    INPUT:
+        assignments: list of strings NAME=VALUE[,VALUE...]
+    OUTPUT:
+        overrides: dictionary that has as key the name of the constant and as value the list of its values
+    '''
+    overrides = {}
+    for assignment in assignments:
+        name, _, values = assignment.partition('=')
+        if not hasattr(constant, name) or not values:
+            raise ValueError(f'not available constant override {assignment}')
+        overrides[name] = [ast.literal_eval(value) for value in values.split(',')]
+    return overrides
+
+
+def build_grid(seeds, policies, solvers, overrides):
+    '''
+    Build the list of simulations to run.
+    INPUTS:
+        seeds: list of seeds
+        policies: list of policies
+        solvers: list of solvers
+        overrides: dictionary of the overridden constants, the key is the name and the value is the list of values
+    OUTPUT:
+        jobs: list of dictionaries, one for each simulation, containing 'name', 'seed', 'policy', 'solver', 'overrides'
+    '''
+    names = list(overrides)
+    jobs = []
+    for seed, policy, solver, values in itertools.product(seeds, policies, solvers,
+                                                          itertools.product(*[overrides[name] for name in names])):
+        job_overrides = dict(zip(names, values))
+        # name of the job, it is also the name of its output directory
+        job_name = '_'.join([policy, solver, f'seed{seed}']+[f'{name}{value}' for name, value in job_overrides.items()])
+        jobs.append({'name': job_name, 'seed': seed, 'policy': policy, 'solver': solver, 'overrides': job_overrides})
+    return jobs
+
+
+def run_job(job, input_path, n_days, trace_path, output_dir):
+    '''
+    Run one simulation, it is executed in a worker process.
+    INPUTS:
+        job: dictionary describing the simulation (see build_grid)
+        input_path: path to file containing the distribution of cells
+        n_days: days of simulation
+        trace_path: directory of the arrivals to replay, empty if they have to be simulated
+        output_dir: directory in which the output files of the simulation are saved
+    OUTPUT:
+        result: dictionary containing the description of the simulation and its final statistics
+    '''
+    # override constants before the simulation modules are imported, so that also default arguments take the new values
+    for name, value in job['overrides'].items():
+        setattr(constant, name, value)
+    constant.SEED = job['seed']
+    # the CPUs are already shared among the jobs, so policy MC evaluates its scenarios in the job process unless the number of
+    # its processes is overridden
+    if 'MC_WORKERS' not in job['overrides']:
+        constant.MC_WORKERS = 1
+    from main import simulate
+    result = {'name': job['name'], 'seed': job['seed'], 'policy': job['policy'], 'solver': job['solver']}
+    result.update(job['overrides'])
+    stats = simulate(input_path, job['policy'], n_days, job['solver'], trace_path, output_dir, verbose=False)
+    # the results table keeps only the final statistics, not the daily ones
+    result.update({name: value for name, value in stats.items() if not isinstance(value, list)})
+    return result
+
+
+def run_experiments(input_path, n_days, jobs, workers=None, trace_path='', output_dir='Experiments'):
+    '''
+    Run all the simulations on a pool of worker processes: each worker process runs only one simulation, so that the overridden
+    constants and the class variables of a simulation never leak into the following ones.
+    INPUTS:
+        input_path: path to file containing the distribution of cells
+        n_days: days of simulation
+        jobs: list of simulations returned by build_grid
+        [workers]: number of worker processes, by default the number of CPUs
+        [trace_path]: directory of the arrivals to replay
+        [output_dir]: directory of the output files
+    OUTPUT:
+        results: dataframe with one row for each simulation, failed simulations have the error message in column 'error'
+    '''
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=1) as executor:
+        futures = {executor.submit(run_job, job, input_path, n_days, trace_path,
+                                   os.path.join(output_dir, 'jobs', job['name'])): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                rows.append(future.result())
+                print(f'Completed {job["name"]}')
+            except Exception as err:
+                rows.append({'name': job['name'], 'seed': job['seed'], 'policy': job['policy'], 'solver': job['solver'],
+                             **job['overrides'], 'error': repr(err)})
+                print(f'Failed {job["name"]}: {err!r}')
+    # sort the results in the order of the grid
+    order = {job['name']: i for i, job in enumerate(jobs)}
+    results = pd.DataFrame(sorted(rows, key=lambda row: order[row['name']]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a grid of CVRP simulations in parallel.')
+    parser.add_argument('input_path', help='file containing density distribution (i.e. grid.txt)')
+    parser.add_argument('-d', dest='n_days', type=int, required=True, help='number of days to simulate')
+    parser.add_argument('--seeds', nargs='+', type=int, default=[constant.SEED])
+    parser.add_argument('--policies', nargs='+', choices=['EP', 'DP', 'NP', 'NP_1', 'KP', 'MC'], required=True)
+    parser.add_argument('--solvers', nargs='+', choices=['ortools', 'cwts'], required=True)
+    parser.add_argument('--set', dest='overrides', action='append', default=[], metavar='NAME=VALUE[,VALUE...]')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--trace', dest='trace_path', default='')
+    parser.add_argument('-o', dest='output_dir', default='Experiments')
+    parser.add_argument('--results', default='results.csv')
+    args = parser.parse_args()
+    try:
+        overrides = parse_overrides(args.overrides)
+    except (ValueError, SyntaxError) as err:
+        parser.error(str(err))
+    jobs = build_grid(args.seeds, args.policies, args.solvers, overrides)
+    print(f'Running {len(jobs)} simulations')
+    results = run_experiments(args.input_path, args.n_days, jobs, args.workers, args.trace_path, args.output_dir)
+    # save the results table
+    os.makedirs(args.output_dir, exist_ok=True)
+    results_path = os.path.join(args.output_dir, args.results)
+    if results_path.endswith('.parquet'):
+        results.to_parquet(results_path, index=False)
+    else:
+        results.to_csv(results_path, index=False)
+    print(f'Saved results in {results_path}')
+
+
+# Call main function
+if __name__ == '__main__':
+    main()
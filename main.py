@@ -19,17 +19,24 @@ The distribution of customers' arrivals, the policy for customer selection and t
 parameters as command line arguments.
 The we simulate the arrivals of the customers and select which ones to serve day by day.
 Once selected the customers to serve, a CVRP is solved to minimize the travel cost and the total number of vehicles to use.
-The simulated customers, the ones selected for CVRP and the best routes found day by day are saved in output files.
+The daily events of the customers (arrivals, selections, postponements and services) are saved in the binary log Data/events.log,
+from which the pending customers of any day can be rebuilt by EventLog.pending_customers, and the best routes found day by day are
+saved in Solution/routes.sol.
 Some statistics about the simulation are printed on the standard output.
 
 
+The arrivals of all days can be simulated once and saved in a trace with command generate-trace, then the same arrivals can be
+replayed by different policies and solvers with option --trace.
+
+
 Main steps of simulation:
 
 1) INITIALIZATION: read command-line arguments, empty pre-existent simulation file, initialize variables used in simulation
 2) DATA LOADING: read customers' distribution from input file
-Optional) NP & NP_1: costruct variables that are needed only for policy NP and NP_1
+Optional) NP, NP_1 & KP: costruct variables that are needed only for policies NP, NP_1 and KP
 3) SIMULATION: each day
-    - Customers simulation: simulate new customers and save data related to pending customers in the current day
+    - Customers simulation: simulate new customers (or read them from the trace given with option --trace) and save data related
+                            to pending customers in the current day
     - Customers selection: select which customers to serve in the current day.
                           The following selection policies are available:
                           - EP: early policy, each customer is served as soon as he makes a request
@@ -41,6 +48,12 @@ Optional) NP & NP_1: costruct variables that are needed only for policy NP and N
                                                             the distribution of his neighbours, the amount of its demand in terms
                                                             of service time and its distance from the depot. Customers are then 
                                                             selected by decreasing index
+                          - KP: knapsack policy: customers at their last available day are always selected, the other ones
+                                are chosen to maximize the sum of their index of NP_1 subject to the available kg and minutes
+                          - MC: Monte Carlo policy: customers at their last available day are always selected, the number of
+                                other customers selected by urgency is chosen on sampled scenarios of the following day
+    - Fleet feasibility check: remove the selected customers that cannot be served according to cheap lower bounds on the number
+                               of vehicles needed (demands, customers per vehicle, service and travel time from the depot)
     - CVRP optimization: find a feasible solution to CVRP problem with the selected customers or a subset of them
     - Save daily routes: append to solution file the new best routes find by CVRP solver
     - Final updates: save the information related to selected customers that lead to a feasible solution of CVRP and
@@ -52,9 +65,9 @@ Optional) NP & NP_1: costruct variables that are needed only for policy NP and N
       postponed to the following day
     - Average of empty vehicles: mean over the number of vehicles used each day of simulation
     - Average of served customers: mean over the number of customers served each day
-    - Average of cycles: there is a cycle over CVRP solver that guarantees the feasibility of the daily solution, each time that the
-                         problem is unfeasible a customer is removed from the list of the customers to serve in the current day and 
-                         the solution with CVRP solver is tried again and the number of daily cycles is incremented by one.
+    - Average of cycles: number of CVRPs solved each day to guarantee the feasibility of the daily solution: if the problem is
+                         unfeasible the largest feasible prefix of the customers to serve in the current day is found by bisection
+                         and the customers that are not in it are left for the following days.
     - Average of travel cost: mean over the daily travel time 
     - Time for simulation: total time to run simulation (hh:mm:ss)
 
@@ -62,6 +75,8 @@ Optional) NP & NP_1: costruct variables that are needed only for policy NP and N
 
 # import sys to deal with command line arguments
 import sys
+# import to build the paths of output files
+import os
 # import to calculate average
 from statistics import mean
 # import to calculate time for simulation
@@ -70,38 +85,158 @@ import time
 import numpy as np
 
 # import functions
-from Functions.InputOutput import load_distribution, save_routes, clean_files, check_arguments
-from Functions.CostumerSelection import select_customers, remove_client_VRP
+from Functions.InputOutput import load_distribution, save_routes, clean_files, check_arguments, check_trace_arguments
+from Functions.Trace import generate_trace, load_trace, trace_days, read_trace_day, TraceError
+from Functions.CostumerSelection import select_customers, keep_selected_prefix
+from Functions.FeasibilityRepair import repair_cwts, repair_ortools
+from Functions.FleetBounds import bounded_prefix
 from Classes.Day import Day
-from VRP_optimization.mainVRP import VRP_optimization
-from Functions.CostumerCompatibility import select_compatible_cells
-from Classes.ClarkWrightSolver import ClarkWrightSolver
+from Functions.CostumerCompatibility import select_compatible_cells, sparse_compatible_cells, compatibility_matrix
 from Classes.TabuSearch import TabuSearch
+from Classes.RandomStreams import RandomStreams
+from Classes.EventLog import EventLog
+from Classes.SolutionWriter import SolutionWriter
+from Classes.OutputPipeline import OutputPipeline
+from Classes.GridCache import GridCache
+from Classes.NeighbourhoodIndex import NeighbourhoodIndex
+from Classes.SimulationStats import SimulationStats
+from Classes.RolloutPolicy import RolloutPolicy
 
 # import constant variables
 import constant
 
 
-def main():
+def random_streams():
+    '''
+    Initialize the random streams of the simulation.
+    OUTPUT:
+        streams: object of class RandomStreams seeded with constant.SEED, None if the global random state has to be used to
+                 reproduce the original random stream (constant.LEGACY_RANDOM_STREAM)
+    '''
+    if constant.LEGACY_RANDOM_STREAM:
+        np.random.seed(constant.SEED)
+        return None
+    return RandomStreams(constant.SEED)
+
+
+def simulate_new_customers(n_days, streams):
+    '''
+    Simulate the number of new customers arriving in each day.
+    INPUTS:
+        n_days: days of simulation
+        streams: object of class RandomStreams, None to use the global random state
+    OUTPUT:
+        new_customers: numpy array with the number of new customers of each day
+    '''
+    low = constant.AVG_CUSTOMERS-constant.GAP_CUSTOMERS
+    high = constant.AVG_CUSTOMERS+constant.GAP_CUSTOMERS
+    if streams is None:
+        return np.random.randint(low=low, high=high, size=n_days)
+    # each day has its own stream, so the number of customers of a day doesn't depend on the length of the simulation
+    return np.array([streams.generator('customers', day+1).integers(low=low, high=high) for day in range(n_days)])
+
+
+def main_generate_trace():
+    '''
+    Simulate once the arrivals of all days and save them in a trace, that can be replayed by main with option --trace.
+    Run with command line arguments:
+        generate-trace input_file_path -d days_simulation -o trace_dir
+    '''
+    # random streams of the simulation
+    streams = random_streams()
+    # parse command line arguments
+    error, input_path, n_days, trace_path = check_trace_arguments(sys.argv)
+    if error:
+        return
+    # new customers arriving in each day, they are drawn as in main so that the replay gives the same customers
+    new_customers = simulate_new_customers(n_days, streams)
+    # load distribution from input file
+    distribution_df, depot = load_distribution(input_path)
+    # simulate and save all arrivals
+    generate_trace(distribution_df, new_customers, trace_path, streams)
+    print(f'Saved trace of {n_days} days in {trace_path}')
+
+
+def close_outputs(rollout_policy, event_log, solution_writer, output_pipeline):
+    '''
+    Release the resources of a simulation: stop the pool of processes of policy MC and flush all the output files.
+    INPUTS:
+        rollout_policy: object of class RolloutPolicy of policy MC, None for the other policies
+        event_log: object of class EventLog of the simulation
+        solution_writer: object of class SolutionWriter of the simulation
+        output_pipeline: object of class OutputPipeline that writes the outputs
+    OUTPUT:
+        writer_error: exception raised by a write operation of the writer thread, None if all the outputs were written
+    '''
+    if rollout_policy is not None:
+        # stop the pool of processes and release its shared memory
+        rollout_policy.close()
+    try:
+        event_log.close()
+        solution_writer.close()
+    except RuntimeError:
+        # the submissions fail only if the writer thread has failed, its error is returned below
+        if output_pipeline.error is None:
+            raise
+    # wait for all pending writes
+    output_pipeline.close(raise_error=False)
+    return output_pipeline.error
+
+
+def simulate(input_path, policy, n_days, solver, trace_path='', output_dir='.', verbose=True):
+    '''
+    Run the simulation of all days.
+    INPUTS:
+        input_path: path to file containing the distribution of cells
+        policy: the selected policy for simulation
+        n_days: days of simulation
+        solver: solver type for CVRP
+        [trace_path]: directory of the arrivals to replay, empty if they have to be simulated
+        [output_dir]: directory in which the output files Data/events.log, Data/simulated_clients.txt, Data/selected_customers.txt and
+                      Solution/routes.sol are saved
+        [verbose]: flag that specify if the simulated days are printed on the standard output
+    OUTPUT:
+        stats: dictionary containing the final statistics of the simulation
+            'total_obj_fun' -> total minutes of travel time along all days of simulation
+            'num_postponed' -> total number of postponed customers
+            'postponed_per_day' -> list of the number of postponed customers in each day
+            'avg_empty_vehicles' -> average of empty vehicles
+            'avg_served_customers' -> average of served customers
+            'avg_cycles' -> average of cycles over CVRP solver
+            'num_trimmed' -> total number of selected customers removed because of the lower bounds on the vehicles needed
+            'fleet_bounds_per_day' -> list of dictionaries with the lower bounds on the vehicles needed ('kg', 'customers', 'time')
+                                      for the customers given to the solver in each day
+            'avg_travel_cost' -> average of travel cost
+            'time' -> time for simulation (s)
+    '''
 
 # ------------------------------------------------ INITIALIZATION -------------------------------------------------------
 
-    np.random.seed(constant.SEED)
+    # random streams of the simulation: independent generators for each day and component
+    streams = random_streams()
     # starting time for simulation  
     start = time.time()
-    # parse command line arguments:
-    # error: there is an erroe in the arguments
-    # input_path: path to file containing the distribution of cells
-    # n_days: days of simulation
-    error, input_path, policy, n_days, solver = check_arguments(sys.argv)
-    if error:
-        return
-    # empty pre-existent files: Solution/routes.sol, Data/selected_customers.txt, Data/simulated_clients.txt
-    clean_files()
+    # arrivals' trace to replay
+    trace = None
+    if trace_path:
+        trace = load_trace(trace_path)
+        if trace_days(trace) < n_days:
+            raise TraceError(f'the trace contains only {trace_days(trace)} days')
+    # empty pre-existent files: Solution/routes.sol (Solution/routes.jsonl), Data/selected_customers.txt, Data/simulated_clients.txt
+    clean_files(output_dir, constant.SOLUTION_LAYOUT)
+    # output files
+    clients_path = os.path.join(output_dir, 'Data', 'simulated_clients.txt')
+    selected_path = os.path.join(output_dir, 'Data', 'selected_customers.txt')
+    routes_path = os.path.join(output_dir, 'Solution', 'routes.sol' if constant.SOLUTION_LAYOUT == 'text' else 'routes.jsonl')
+    # all output files are written on a background thread: the day loop submits snapshots of the data to save
+    output_pipeline = OutputPipeline(constant.OUTPUT_QUEUE_SIZE)
+    # log of the daily events: arrivals, selections, postponements and services of customers
+    event_log = EventLog(os.path.join(output_dir, 'Data', 'events.log'), output_pipeline)
+    # writer of the daily routes, the solution file stays open for the whole simulation
+    solution_writer = SolutionWriter(routes_path, constant.SOLUTION_LAYOUT, pipeline=output_pipeline)
 
     # new customers arriving in each day
-    new_customers = np.random.randint(low=constant.AVG_CUSTOMERS-constant.GAP_CUSTOMERS,\
-        high=constant.AVG_CUSTOMERS+constant.GAP_CUSTOMERS, size=n_days)
+    new_customers = simulate_new_customers(n_days, streams)
     # number of available vehicles
     vehicles = constant.NUM_VEHICLES
     # capacity of each vehicle
@@ -115,12 +250,14 @@ def main():
     num_empty_route = [0]*n_days
     # initialize vector for couting served clients in each day 
     num_served_clients = [0]*n_days
-    # number of while cycles in each day to get a feasible solution for CVRP
+    # number of CVRPs solved in each day to get a feasible solution
     num_cycles = [0]*n_days
     # daily travel cost
     daily_obj = [0]*n_days
     # initialize objective function
     total_obj_fun = 0
+    # statistics updated by the selection of customers: postponed customers of each day
+    simulation_stats = SimulationStats(n_days)
     # Initialize flag for simulation
     first_day = True
 
@@ -129,7 +266,12 @@ def main():
     # load distribution and depot position from input file:
     # distribution_df: a pandas dataframe where each row contains information about a cell of the simulated region
     # depot: numpy array with x-coordinate and y-coordinate of the depot
-    distribution_df, depot = load_distribution(input_path)
+    # with a cache directory the grid is parsed only in the first simulation on it
+    grid_cache = GridCache(input_path, constant.GRID_CACHE_DIR) if constant.GRID_CACHE_DIR else None
+    if grid_cache is not None:
+        distribution_df, depot = grid_cache.load_distribution()
+    else:
+        distribution_df, depot = load_distribution(input_path)
 
 # ------------------------------------------------ NP & NP_1 variables -------------------------------------------------------
 
@@ -137,81 +279,124 @@ def main():
     compatibility_list = []
     compatibility_index = []
     depot_distance = []
-    if policy == "NP" or policy == "NP_1":
+    neighbourhood_index = None
+    compatible_matrix = None
+    if policy == "NP" or policy == "NP_1" or policy == "KP":
         # compatibility_list: list with dimension equal to the number of cells, each element of the list is a list of
         #                     neighbours cells that allow percentage savings > rho
         # compatibility_index: symmetric matrix with dimension #cells*#cells, each element (i,j) is the percentage saving
         #                      including cell i and cell j in the same route
         # depot_distance: numpy array with dimension equal to the number of cells, each element is the Euclidean distance
         #                 from depot to the centre of a cell
-        compatibility_list, compatibility_index, depot_distance = select_compatible_cells(distribution_df, depot, constant.rho)
+        # with SPARSE_COMPATIBILITY compatibility_index is a sparse matrix containing only the indexes higher than a floor
+        floor = constant.COMPATIBILITY_FLOOR if constant.SPARSE_COMPATIBILITY else None
+        if grid_cache is not None:
+            compatibility_list, compatibility_index, depot_distance = grid_cache.compatible_cells(distribution_df, depot, constant.rho,
+                                                                                                  floor)
+        elif floor is not None:
+            compatibility_list, compatibility_index, depot_distance = sparse_compatible_cells(distribution_df, depot, constant.rho,
+                                                                                              floor)
+        else:
+            compatibility_list, compatibility_index, depot_distance = select_compatible_cells(distribution_df, depot, constant.rho)
+    if policy == "NP":
+        # compatible_matrix: sparse boolean matrix of compatible cells used by NP to count the empty neighbours of all cells at once
+        compatible_matrix = compatibility_matrix(compatibility_list)
+    if policy == "NP_1" or policy == "KP":
+        # neighbourhood_index: object of class NeighbourhoodIndex that computes the index of NP_1 (used by KP too), the expected future savings
+        #                      of each cell are kept between days until the occupancy of its neighbours changes
+        neighbourhood_index = NeighbourhoodIndex(compatibility_list, compatibility_index, distribution_df.probability,
+                                                 depot_distance)
+    # rollout_policy: object of class RolloutPolicy of policy MC, its pool of processes reads the cells from shared memory
+    rollout_policy = None
+    if policy == "MC":
+        rollout_policy = RolloutPolicy(distribution_df, depot, kg_capacity, constant.PERCENTAGE*min_capacity)
     
 # ------------------------------------------------- SIMULATION ---------------------------------------------------------
 
-    for day in range(n_days):
+    try:
+        for day in range(n_days):
         
-        # ---------------------------------------- Customers simulation ------------------------------------------------
-
-        # Instantiate a new day
-        # new day: object of class Day with attributes
-        # current_day -> number of the current day in simulation
-        # df_distribution -> distribution_df
-        # customer_df -> dataframe of pending customer
-        # selected_customers -> dataframe of selected customers
-        # selected_indexes -> list of index of selected customers
-        if first_day:
-            new_day = Day(new_customers[day], first_day, distribution_df)
-            first_day = False
-        else:
-            # append new customers to the ones that were not served in the previous day
-            new_day = Day(new_customers[day], previous_df=new_day.customer_df)
-
-        print(f'Simulated day {new_day.current_day}')
-
-        # save simulated clients' data
-        new_day.save_data_costumers()
-
-        # ---------------------------------------- Customers selection ------------------------------------------------
-
-        # select customers accordingly to the desired policy:
-        # updated_day: object of class Day with updates regarding attributes customer_df, selected_customers, selected_indexes
-        # num_postponed: total number of customers postponed up to the current day
-        updated_day, num_postponed = select_customers(new_day, min_capacity, kg_capacity, policy, compatibility_list,\
-                distribution_df.probability, compatibility_index, depot_distance)
-
-        # ---------------------------------------- CVRP optimization ---------------------------------------------------
+            # ---------------------------------------- Customers simulation ------------------------------------------------
+
+            # Instantiate a new day
+            # new day: object of class Day with attributes
+            # current_day -> number of the current day in simulation
+            # df_distribution -> distribution_df
+            # customers -> store of pending customers
+            # customer_df -> dataframe of pending customer
+            # selected_customers -> dataframe of selected customers
+            # selected_indexes -> list of index of selected customers
+            # with a trace, the new customers are read from it instead of being simulated
+            arrivals = read_trace_day(trace, day+1) if trace is not None else None
+            # random generators of the day
+            arrivals_rng = streams.generator('arrivals', day+1) if streams is not None else None
+            selection_rng = streams.generator('selection', day+1) if streams is not None else None
+            solver_rng = streams.generator('solver', day+1) if streams is not None else None
+            if first_day:
+                new_day = Day(new_customers[day], first_day, distribution_df, arrivals=arrivals, rng=arrivals_rng)
+                first_day = False
+            else:
+                # append new customers to the ones that were not served in the previous day
+                new_day = Day(new_customers[day], previous_customers=new_day.customers, arrivals=arrivals, rng=arrivals_rng)
+
+            if verbose:
+                print(f'Simulated day {new_day.current_day}')
+
+            # save simulated clients' data
+            event_log.write(new_day.current_day, EventLog.ARRIVAL, new_day.customers, new_day.new_ids)
+            if constant.TEXT_SNAPSHOTS:
+                output_pipeline.submit(Day.save_dataframe, new_day.current_day, new_day.customer_df, clients_path)
+
+            # ---------------------------------------- Customers selection ------------------------------------------------
+
+            # select customers accordingly to the desired policy:
+            # updated_day: object of class Day with updates regarding attributes customer_df, selected_customers, selected_indexes
+            # num_postponed: total number of customers postponed up to the current day
+            updated_day, num_postponed = select_customers(new_day, min_capacity, kg_capacity, policy, compatibility_list,\
+                    distribution_df.probability, compatibility_index, depot_distance, selection_rng, neighbourhood_index,
+                    simulation_stats, rollout_policy, compatible_matrix)
+            # save selected customers' data
+            event_log.write(updated_day.current_day, EventLog.SELECTION, updated_day.customers, updated_day.selected_indexes)
+
+            # ---------------------------------------- Fleet feasibility check --------------------------------------------
+
+            # lower bounds on the vehicles needed: the selected customers that certainly cannot be served are left for the following
+            # days before calling the CVRP solver
+            num_bounded, fleet_bounds = bounded_prefix(updated_day.selected_customers, depot, vehicles, capacity)
+            simulation_stats.add_fleet_bounds(updated_day.current_day, fleet_bounds, len(updated_day.selected_customers)-num_bounded)
+            updated_day = keep_selected_prefix(updated_day, num_bounded, simulation_stats)
+
+            # ---------------------------------------- CVRP optimization ---------------------------------------------------
         
-        # flag for while cycle
-        solution = False
-        # iterate until a feasible solution is reached
-        while not(solution):
-            num_cycles[day] += 1
-            # Solve CVRP
-
-            if solver == 'ortools':            
-            # data: dictionary containig information about
-            #      'distance_matrix' -> travel time + service time of selected customers
-            #      'num_vehicles' -> number of available vehicles
-            #      'depot' -> index of depot
-            #      'demands' -> list of demands of selected customers in kg
-            #      'vehicle_capacities' -> list of capacities of each vehicle in kg
-            # manager: routing index manager
-            # routing: routing model
-            # solution: solution to CVRP
-                data, manager, routing, solution, obj_value = VRP_optimization(updated_day.selected_customers, depot, vehicles, capacity)
-
-            elif solver == 'cwts': 
-                # Starting time of the CW-TS algorithm                                
+            # Solve CVRP: if the selected customers cannot be served, the solver is given the largest feasible prefix of them
+            num_selected = len(updated_day.selected_customers)
+            if solver == 'ortools':
+                # data: dictionary containig information about
+                #      'distance_matrix' -> travel time + service time of selected customers
+                #      'num_vehicles' -> number of available vehicles
+                #      'depot' -> index of depot
+                #      'demands' -> list of demands of selected customers in kg
+                #      'vehicle_capacities' -> list of capacities of each vehicle in kg
+                # manager: routing index manager
+                # routing: routing model
+                # solution: solution to CVRP
+                num_feasible, (data, manager, routing, solution, obj_value), num_cycles[day] = \
+                    repair_ortools(updated_day.selected_customers, depot, vehicles, capacity)
+
+            elif solver == 'cwts':
+                # Starting time of the CW-TS algorithm
                 start_tabu = time.time()
                 # Initialize elapsed time
                 elapsed_time = 0
-                # Find an initial solution to the CVRP
-                clark_wright_sol = ClarkWrightSolver(updated_day.selected_customers, depot)
-                solution = clark_wright_sol.solve()
-                if solution:
+                # Find an initial feasible solution to the CVRP
+                num_feasible, clark_wright_sol, num_cycles[day] = repair_cwts(updated_day.selected_customers, depot)
+                # The swap moves of Tabu Search need at least two routes
+                if len(clark_wright_sol.routes) < 2:
+                    tabu_search_sol = clark_wright_sol
+                else:
                     # The initial solution is feasible, so we proceed with the Tabu Search step to improve the results
-                    tabu_search = TabuSearch(clark_wright_sol, constant.MAX_TIME)
-                    # Iterate until the time limit for the CW-TS solver is reached                           
+                    tabu_search = TabuSearch(clark_wright_sol, constant.MAX_TIME, solver_rng)
+                    # Iterate until the time limit for the CW-TS solver is reached
                     while elapsed_time <= constant.MAX_TIME:
                         # Perform one iteration of CW-TS solver
                         tabu_search.solve()
@@ -222,62 +407,112 @@ def main():
                     # Save the best solution
                     tabu_search_sol = tabu_search.current_solution
 
-                    # If we want to consider only the first feasible solution
-                    #tabu_search_sol = clark_wright_sol
-                    
-                    
-            if not(solution):
-                # I've selected too many customers so the CVRP became unfeasible, so I remove one customer from selected_customers,
-                # selected_indexes and I put it again in customer_df to be served in the following days               
-                updated_day = remove_client_VRP(updated_day)
-        # save number of served customers
-        num_served_clients[day] = len(updated_day.selected_customers)
-        # save total service time for served customers
-        total_time = updated_day.selected_customers.service_time.sum()
-
-        # ---------------------------------------- Save daily routes --------------------------------------------------
+                # If we want to consider only the first feasible solution
+                #tabu_search_sol = clark_wright_sol
+
+            if num_feasible < num_selected:
+                # I've selected too many customers so the CVRP became unfeasible: the customers that are not in the feasible prefix
+                # are removed from selected_customers, selected_indexes and put again in customer_df to be served in the following days
+                updated_day = keep_selected_prefix(updated_day, num_feasible, simulation_stats)
+            # save number of served customers
+            num_served_clients[day] = len(updated_day.selected_customers)
+            # save total service time for served customers
+            total_time = updated_day.selected_customers.service_time.sum()
+
+            # ---------------------------------------- Save daily routes --------------------------------------------------
         
-        # save daily roads in Solution/routes.sol
-        if solver == 'ortools':
-            num_empty_route[day] = save_routes(updated_day, data, manager, routing, solution)
-        elif solver == 'cwts':
-            num_empty_route[day] = tabu_search_sol.print_solution(updated_day)
+            # save daily roads in Solution/routes.sol
+            if solver == 'ortools':
+                num_empty_route[day] = save_routes(updated_day, data, manager, routing, solution, solution_writer)
+            elif solver == 'cwts':
+                num_empty_route[day] = tabu_search_sol.print_solution(updated_day, solution_writer)
         
-        # --------------------------------------- Final updates -------------------------------------------------------
+            # --------------------------------------- Final updates -------------------------------------------------------
         
-        # save selected customer passed to VRP solver in Data/selected_customers.txt
-        updated_day.save_selected_costumers()        
-        # delete served customer from customer_df
-        updated_day.delete_served_customers()        
-        # update the day
-        new_day = updated_day
+            # save postponed customers and selected customer passed to VRP solver, that have been served
+            event_log.write(updated_day.current_day, EventLog.POSTPONEMENT, updated_day.customers, updated_day.postponed_ids)
+            event_log.write(updated_day.current_day, EventLog.SERVICE, updated_day.customers, updated_day.selected_indexes)
+            if constant.TEXT_SNAPSHOTS:
+                # save selected customer passed to VRP solver in Data/selected_customers.txt
+                output_pipeline.submit(Day.save_dataframe, updated_day.current_day, updated_day.selected_customers.copy(),
+                                       selected_path)
+            # delete served customer from customer_df
+            updated_day.delete_served_customers()        
+            # update the day
+            new_day = updated_day
         
-        # --------------------------------------- Objective function --------------------------------------------------
+            # --------------------------------------- Objective function --------------------------------------------------
+
+            # In DP we start serving customers from the 4th day, we need to do a right comparison among the policies, so to
+            # study the objective function on the long run I don't consider for statistics a transient period of NUM_DAYS
+
+            # In the objective function I consider only the travel time, not the service one which cannot be optimized
+            if solver == 'ortools':
+                daily_obj[day] = obj_value-total_time
+            elif solver == 'cwts':
+                daily_obj[day] = tabu_search_sol.total_cost-total_time
+
+            if new_day.current_day >= constant.NUM_DAYS:
+                total_obj_fun += daily_obj[day]
+
+    except BaseException as day_error:
+        # the outputs of the completed days are flushed also when a day fails, an error of the writer thread is chained to the
+        # error of the day
+        writer_error = close_outputs(rollout_policy, event_log, solution_writer, output_pipeline)
+        # the error of the day may be the one of the writer thread, raised at a submission
+        if writer_error is not None and day_error.__cause__ is not writer_error:
+            raise writer_error from day_error
+        raise
+    # wait for all pending writes, an error of the writer thread is raised here
+    writer_error = close_outputs(rollout_policy, event_log, solution_writer, output_pipeline)
+    if writer_error is not None:
+        raise RuntimeError('write of the simulation outputs failed') from writer_error
 
-        # In DP we start serving customers from the 4th day, we need to do a right comparison among the policies, so to
-        # study the objective function on the long run I don't consider for statistics a transient period of NUM_DAYS
+    # ------------------------------------------------ STATISICS -------------------------------------------------------
 
-        # In the objective function I consider only the travel time, not the service one which cannot be optimized
-        if solver == 'ortools':
-            daily_obj[day] = obj_value-total_time
-        elif solver == 'cwts':
-            daily_obj[day] = tabu_search_sol.total_cost-total_time
+    stats = {
+        'total_obj_fun': np.round(total_obj_fun,3),
+        'num_postponed': simulation_stats.num_postponed,
+        'postponed_per_day': simulation_stats.postponed.tolist(),
+        'avg_empty_vehicles': np.round(mean(num_empty_route[constant.NUM_DAYS-1:]),3),
+        'avg_served_customers': np.round(mean(num_served_clients[constant.NUM_DAYS-1:])),
+        'avg_cycles': mean(num_cycles),
+        'num_trimmed': int(simulation_stats.trimmed.sum()),
+        'fleet_bounds_per_day': [{name: int(values[day]) for name, values in simulation_stats.fleet_bounds.items()}
+                                 for day in range(n_days)],
+        'avg_travel_cost': np.round(mean(daily_obj[constant.NUM_DAYS-1:])),
+        # ending time for simulation
+        'time': time.time()-start
+    }
+    return stats
 
-        if new_day.current_day >= constant.NUM_DAYS:
-            total_obj_fun += daily_obj[day]
 
-    # ------------------------------------------------ STATISICS -------------------------------------------------------
+def main():
+    '''
+    Run the simulation with the command line arguments and print on the standard output some statistics.
+    '''
+    # parse command line arguments:
+    # error: there is an erroe in the arguments
+    # input_path: path to file containing the distribution of cells
+    # n_days: days of simulation
+    # trace_path: directory of the arrivals to replay, empty if they have to be simulated
+    error, input_path, policy, n_days, solver, trace_path = check_arguments(sys.argv)
+    if error:
+        return
+    try:
+        stats = simulate(input_path, policy, n_days, solver, trace_path)
+    except TraceError as err:
+        sys.stderr.write(f'Error: {err}\n')
+        return
 
     # Print on the standard output some statistics
-    print(f'Total objective function: {np.round(total_obj_fun,3)}')
-    print(f'Total number of postponed costumers: {num_postponed}')
-    print(f'Average of empty vehicles: {np.round(mean(num_empty_route[constant.NUM_DAYS-1:]),3)}')
-    print(f'Average of served customers: {np.round(mean(num_served_clients[constant.NUM_DAYS-1:]))}') 
-    print(f'Average of cycles: {mean(num_cycles)}') 
-    print(f'Average of travel cost: {np.round(mean(daily_obj[constant.NUM_DAYS-1:]))}') 
-    # ending time for simulation  
-    end = time.time()
-    str_time = time.strftime("%H:%M:%S", time.gmtime(end-start))
+    print(f'Total objective function: {stats["total_obj_fun"]}')
+    print(f'Total number of postponed costumers: {stats["num_postponed"]}')
+    print(f'Average of empty vehicles: {stats["avg_empty_vehicles"]}')
+    print(f'Average of served customers: {stats["avg_served_customers"]}') 
+    print(f'Average of cycles: {stats["avg_cycles"]}') 
+    print(f'Average of travel cost: {stats["avg_travel_cost"]}') 
+    str_time = time.strftime("%H:%M:%S", time.gmtime(stats['time']))
     print('Time for simulation: '+str_time+'\n')
 
     return
@@ -285,4 +520,7 @@ def main():
 
 # Call main function
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] == 'generate-trace':
+        main_generate_trace()
+    else:
+        main()
\ No newline at end of file
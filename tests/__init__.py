@@ -0,0 +1,4 @@
+'''
+Unit tests of the simulation, run from the root of the repository with
+    python -m pytest tests
+'''
@@ -0,0 +1,104 @@
+'''
+Tests of the store of pending customers: after any sequence of arrivals, services and updates it must contain the same customers
+as a reference dataframe updated with the same operations.
+'''
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from Classes.CustomerStore import CustomerStore
+
+NUM_CELLS = 6
+
+
+def random_customers(rng, num_customers):
+    '''
+    Data of some random customers, with the columns of the store.
+    '''
+    return {'x': rng.uniform(0, 100, num_customers), 'y': rng.uniform(0, 100, num_customers),
+            'kg': rng.integers(1, 30, num_customers), 'service_time': rng.integers(1, 20, num_customers),
+            'last_day': rng.integers(1, 6, num_customers), 'yet_postponed': rng.random(num_customers) < 0.2,
+            'cell': rng.integers(0, NUM_CELLS, num_customers), 'index': np.zeros(num_customers)}
+
+
+def check_store(store, reference):
+    '''
+    Compare the store with the reference dataframe of pending customers.
+    '''
+    assert len(store) == len(reference)
+    pd.testing.assert_frame_equal(store.to_frame(), reference, check_index_type=False)
+    np.testing.assert_array_equal(store.live_ids(), reference.index.to_numpy())
+    # running sums and cell occupancy
+    assert store.sums['kg'] == reference['kg'].sum()
+    assert store.sums['service_time'] == reference['service_time'].sum()
+    counts = np.bincount(reference['cell'].to_numpy(), minlength=NUM_CELLS)
+    np.testing.assert_array_equal(store.occupancy.counts, counts)
+    np.testing.assert_array_equal(store.occupancy.occupied, counts > 0)
+    # the identifiers of the used rows are always increasing
+    assert np.all(np.diff(store.ids[:store.size]) > 0)
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_interleaved_operations_match_reference(seed):
+    rng = np.random.default_rng(seed)
+    # small arrays, so that they grow and are compacted many times
+    store = CustomerStore(capacity=4, compaction_ratio=0.3, num_cells=NUM_CELLS)
+    reference = pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in CustomerStore.dtypes.items()})
+    deleted = []
+    num_compactions = 0
+    for step in range(200):
+        operation = rng.choice(['append', 'delete', 'update']) if len(reference) else 'append'
+        if operation == 'append':
+            data = random_customers(rng, int(rng.integers(1, 12)))
+            new_ids = store.append(data)
+            new_rows = pd.DataFrame(data, index=new_ids).astype(CustomerStore.dtypes)
+            reference = pd.concat([reference, new_rows]) if len(reference) else new_rows
+        elif operation == 'delete':
+            customer_ids = rng.choice(reference.index.to_numpy(), size=int(rng.integers(1, len(reference)+1)), replace=False)
+            size = store.size
+            store.delete(customer_ids)
+            num_compactions += store.size < size
+            reference = reference.drop(customer_ids)
+            deleted += customer_ids.tolist()
+        else:
+            name = rng.choice(['x', 'kg', 'service_time', 'last_day', 'yet_postponed', 'index'])
+            customer_ids = rng.choice(reference.index.to_numpy(), size=int(rng.integers(1, len(reference)+1)), replace=False)
+            values = random_customers(rng, len(customer_ids))[name]
+            store.update(customer_ids, name, values)
+            reference.loc[customer_ids, name] = values
+        if step == 100:
+            # the urgency queue is built in the middle, from then on it is maintained by the store
+            store.urgency_queue()
+        check_store(store, reference)
+    assert num_compactions > 0
+    # a subset of customers, in the order they are asked
+    if len(reference):
+        customer_ids = rng.permutation(reference.index.to_numpy())[:5]
+        pd.testing.assert_frame_equal(store.to_frame(customer_ids), reference.loc[customer_ids], check_index_type=False)
+    # the urgency queue contains the pending customers in order of (last_day, not yet_postponed, identifier)
+    urgent = reference.assign(not_postponed=~reference['yet_postponed'], id=reference.index)
+    urgent = urgent.sort_values(['last_day', 'not_postponed', 'id'])
+    assert store.urgency_queue().ordered(len(reference), 0) == urgent.index.tolist()
+    # the deleted customers are no longer pending
+    if deleted:
+        with pytest.raises(KeyError):
+            store.rows(deleted[:1])
+
+
+def test_mean_of_empty_store_is_nan():
+    store = CustomerStore()
+    assert np.isnan(store.mean('kg'))
+    new_ids = store.append(random_customers(np.random.default_rng(0), 3))
+    assert store.mean('kg') == store.column('kg').mean()
+    store.delete(new_ids)
+    assert len(store) == 0 and np.isnan(store.mean('service_time'))
+
+
+def test_rows_of_unknown_customers_raise():
+    store = CustomerStore()
+    store.append(random_customers(np.random.default_rng(0), 3))
+    with pytest.raises(KeyError):
+        store.rows([3])
+    with pytest.raises(KeyError):
+        store.rows([-1])
@@ -0,0 +1,61 @@
+'''
+Tests of the bisection on the prefixes of the selected customers that are served.
+'''
+
+import math
+
+import pytest
+
+from Functions.FeasibilityRepair import largest_feasible_prefix
+
+
+def make_probe(num_feasible):
+    '''
+    Probe whose CVRP is feasible on the prefixes of at most num_feasible customers, it records the probed lengths.
+    INPUT:
+        num_feasible: length of the largest feasible prefix
+    OUTPUT:
+        probe: function probe(k) that returns ('solution', k) if the prefix is feasible and None otherwise
+        probed: list of the lengths probed
+    '''
+    probed = []
+
+    def probe(num_customers):
+        probed.append(num_customers)
+        return ('solution', num_customers) if num_customers <= num_feasible else None
+
+    return probe, probed
+
+
+@pytest.mark.parametrize('num_customers', [0, 1, 2, 7, 64, 100])
+def test_all_customers_feasible_needs_one_probe(num_customers):
+    probe, probed = make_probe(num_customers)
+    assert largest_feasible_prefix(num_customers, probe) == (num_customers, ('solution', num_customers), 1)
+    assert probed == [num_customers]
+
+
+@pytest.mark.parametrize('num_customers', [1, 2, 7, 64, 100])
+def test_finds_the_largest_feasible_prefix(num_customers):
+    for num_feasible in range(num_customers):
+        probe, probed = make_probe(num_feasible)
+        found, result, num_probes = largest_feasible_prefix(num_customers, probe)
+        assert found == num_feasible
+        assert result == ('solution', num_feasible)
+        assert num_probes == len(probed)
+        # the full prefix, the bisection and at most one probe of the empty prefix
+        assert num_probes <= 2+math.ceil(math.log2(num_customers))
+
+
+def test_known_unfeasible_upper_bound_is_not_probed():
+    probe, probed = make_probe(5)
+    found, result, _ = largest_feasible_prefix(20, probe, upper=12)
+    assert (found, result) == (5, ('solution', 5))
+    assert 20 not in probed and 12 not in probed
+    assert all(length < 12 for length in probed)
+
+
+def test_no_customer_feasible_returns_the_empty_prefix():
+    probe, probed = make_probe(0)
+    found, result, num_probes = largest_feasible_prefix(10, probe)
+    assert (found, result) == (0, ('solution', 0))
+    assert probed[-1] == 0 and num_probes == len(probed)
@@ -0,0 +1,74 @@
+'''
+Tests of the knapsack with two resources of policy KP, compared with the brute force solution of tiny instances.
+'''
+
+import itertools
+
+import numpy as np
+import pytest
+
+from Functions.CostumerSelection import _solve_knapsack, _binned_knapsack
+
+
+def brute_force(values, weights, capacities):
+    '''
+    Best value of a knapsack with two resources, trying all subsets of items.
+    INPUTS:
+        values: numpy array of the values of the items
+        weights: numpy array of dimension #items*2 with the weights of the items for each resource
+        capacities: numpy array with the capacity of each resource
+    OUTPUT:
+        best: value of the best feasible subset
+    '''
+    best = 0
+    for chosen in itertools.product([False, True], repeat=len(values)):
+        chosen = np.array(chosen, dtype=bool)
+        if np.all(weights[chosen].sum(axis=0) <= capacities):
+            best = max(best, values[chosen].sum())
+    return best
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_binned_knapsack_is_optimal(seed):
+    rng = np.random.default_rng(seed)
+    num_items, num_bins = rng.integers(1, 9), int(rng.integers(1, 12))
+    values = rng.integers(1, 50, size=num_items).astype(np.float64)
+    bins = rng.integers(0, num_bins+3, size=(num_items, 2))
+    chosen = _binned_knapsack(values, bins, num_bins)
+    assert np.all(bins[chosen].sum(axis=0) <= num_bins)
+    assert values[chosen].sum() == brute_force(values, bins, np.array([num_bins, num_bins]))
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_solve_knapsack_is_optimal_when_the_bins_are_exact(seed):
+    # the core starts core_size//2 items before the end of the greedy solution, so with core_size 2*#items all items are in the
+    # core, and with integer weights on bins of unit size the rounding loses nothing
+    rng = np.random.default_rng(seed)
+    num_items, num_bins = rng.integers(1, 9), 20
+    values = rng.integers(1, 50, size=num_items).astype(np.float64)
+    weights = rng.integers(1, 12, size=(num_items, 2)).astype(np.float64)
+    capacities = np.array([num_bins, num_bins], dtype=np.float64)
+    chosen = _solve_knapsack(values, weights, capacities, num_bins=num_bins, core_size=2*num_items)
+    assert np.all(weights[chosen].sum(axis=0) <= capacities)
+    assert values[chosen].sum() == brute_force(values, weights, capacities)
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_solve_knapsack_is_feasible(seed):
+    rng = np.random.default_rng(seed)
+    num_items = rng.integers(1, 11)
+    values = rng.uniform(0.1, 10, size=num_items)
+    weights = rng.uniform(1, 50, size=(num_items, 2))
+    capacities = rng.uniform(10, 100, size=2)
+    chosen = _solve_knapsack(values, weights, capacities, num_bins=8, core_size=int(rng.integers(1, 6)))
+    assert np.all(weights[chosen].sum(axis=0) <= capacities)
+    # the capacity left is filled: no item left out fits alone in it
+    left = capacities-weights[chosen].sum(axis=0)
+    assert not np.any(np.all(weights[~chosen] <= left, axis=1))
+
+
+def test_solve_knapsack_without_capacity():
+    values = np.array([1.0, 2.0])
+    weights = np.array([[1.0, 1.0], [2.0, 2.0]])
+    assert not _solve_knapsack(values, weights, np.array([0.0, 10.0])).any()
+    assert not _solve_knapsack(np.zeros(0), np.zeros((0, 2)), np.array([1.0, 1.0])).any()
@@ -0,0 +1,71 @@
+'''
+Tests of the replay of a simulation: the days are run on the arrivals of a trace and the pending customers rebuilt from the event
+log at the end of each day must be the ones of the live store.
+'''
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from Classes.Day import Day
+from Classes.EventLog import EventLog
+from Functions.CostumerCompatibility import select_compatible_cells
+from Functions.CostumerSelection import select_customers
+from Functions.Trace import generate_trace, load_trace, read_trace_day, trace_days
+
+NUM_DAYS = 6
+
+
+def grid(side=4, size=10.0):
+    '''
+    Dataframe of a square grid of side*side cells with the same probability.
+    '''
+    rows, cols = np.divmod(np.arange(side*side), side)
+    return pd.DataFrame({'cell_name': np.arange(side*side), 'x': cols*size, 'y': rows*size,
+                         'length': np.full(side*side, size), 'height': np.full(side*side, size),
+                         'probability': np.full(side*side, 1/(side*side))})
+
+
+@pytest.fixture
+def trace_dir(tmp_path):
+    generate_trace(grid(), np.full(NUM_DAYS, 40), str(tmp_path/'trace'))
+    return str(tmp_path/'trace')
+
+
+@pytest.mark.parametrize('policy', ['EP', 'DP', 'NP'])
+def test_event_log_replays_the_pending_customers(tmp_path, trace_dir, policy):
+    distribution_df, depot = grid(), np.array([20.0, 20.0])
+    compatibility, compatibility_index, depot_distance = select_compatible_cells(distribution_df, depot, 0.45)
+    trace = load_trace(trace_dir)
+    assert trace_days(trace) == NUM_DAYS
+    log_path = str(tmp_path/'events.log')
+    event_log = EventLog(log_path)
+    day = None
+    for day_number in range(1, NUM_DAYS+1):
+        arrivals = read_trace_day(trace, day_number)
+        if day is None:
+            day = Day(0, True, distribution_df, arrivals=arrivals)
+        else:
+            day = Day(0, previous_customers=day.customers, arrivals=arrivals)
+        # the arrivals of the day are the rows of the trace
+        for name in ('x', 'kg', 'last_day', 'cell'):
+            np.testing.assert_array_equal(day.customers.to_frame(day.new_ids)[name].to_numpy(), arrivals[name])
+        event_log.write(day.current_day, EventLog.ARRIVAL, day.customers, day.new_ids)
+        # small capacities, so that some customers are postponed
+        day, _ = select_customers(day, 300, 200, policy, compatibility, distribution_df.probability, compatibility_index,
+                                  depot_distance)
+        event_log.write(day.current_day, EventLog.SELECTION, day.customers, day.selected_indexes)
+        event_log.write(day.current_day, EventLog.POSTPONEMENT, day.customers, day.postponed_ids)
+        event_log.write(day.current_day, EventLog.SERVICE, day.customers, day.selected_indexes)
+        day.delete_served_customers()
+        event_log.file.flush()
+        replayed = EventLog.pending_customers(log_path, day.current_day)
+        live = day.customers.to_frame()
+        assert replayed.index.tolist() == live.index.tolist()
+        pd.testing.assert_frame_equal(replayed[list(EventLog.columns)], live[list(EventLog.columns)], check_dtype=False,
+                                      check_index_type=False)
+    event_log.close()
+    # customers have been both served and postponed
+    events = EventLog.read_events(log_path)
+    assert np.any(events['event'] == EventLog.SERVICE)
+    assert np.any(events['event'] == EventLog.POSTPONEMENT)
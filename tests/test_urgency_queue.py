@@ -0,0 +1,78 @@
+'''
+Tests of the lazy invalidation of the urgency queue: stale entries stay in the heap but are never returned.
+'''
+
+import numpy as np
+import pytest
+
+from Classes.UrgencyQueue import UrgencyQueue
+
+
+def push(queue, keys, customer_ids, last_day, yet_postponed):
+    '''
+    Push some customers in the queue and in the dictionary of the expected keys.
+    '''
+    queue.push(np.asarray(customer_ids), np.asarray(last_day), np.asarray(yet_postponed))
+    for customer_id, day, postponed in zip(customer_ids, last_day, yet_postponed):
+        keys[customer_id] = (day, not postponed)
+
+
+def expected_order(keys):
+    '''
+    Identifiers of the customers in order of urgency: last day, postponed ones first, then identifier.
+    '''
+    return sorted(keys, key=lambda customer_id: keys[customer_id]+(customer_id,))
+
+
+def test_updated_keys_leave_stale_entries():
+    queue, keys = UrgencyQueue(rebuild_ratio=10), {}
+    push(queue, keys, [0, 1, 2, 3], [3, 1, 2, 1], [False, False, False, True])
+    assert queue.ordered(4, 0) == [3, 1, 2, 0]
+    # customer 0 is postponed and becomes the most urgent, customer 1 is served
+    push(queue, keys, [0], [1], [True])
+    queue.remove(np.array([1]))
+    del keys[1]
+    # the old entries of customers 0 and 1 are still in the heap
+    assert len(queue.heap) == 5 and len(queue) == 3
+    assert queue.ordered(3, 0) == [0, 3, 2]
+
+
+def test_ordered_does_not_change_the_queue():
+    queue, keys = UrgencyQueue(), {}
+    push(queue, keys, list(range(6)), [2, 4, 1, 2, 5, 1], [False]*6)
+    first = queue.ordered(2, 2)
+    # the first 2 customers and all the others due by day 2
+    assert first == [2, 5, 0, 3]
+    assert queue.ordered(2, 2) == first
+    assert queue.ordered(6, 0) == expected_order(keys)
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_random_operations_match_sorted_keys(seed):
+    rng = np.random.default_rng(seed)
+    queue, keys = UrgencyQueue(rebuild_ratio=2), {}
+    next_id = 0
+    for step in range(300):
+        operation = rng.integers(3) if keys else 0
+        if operation == 0:
+            num_new = int(rng.integers(1, 6))
+            customer_ids = list(range(next_id, next_id+num_new))
+            next_id += num_new
+            push(queue, keys, customer_ids, rng.integers(1, 8, num_new).tolist(), (rng.random(num_new) < 0.3).tolist())
+        elif operation == 1:
+            customer_ids = rng.choice(list(keys), size=int(rng.integers(1, len(keys)+1)), replace=False).tolist()
+            push(queue, keys, customer_ids, rng.integers(1, 8, len(customer_ids)).tolist(), [True]*len(customer_ids))
+        else:
+            customer_ids = rng.choice(list(keys), size=int(rng.integers(1, len(keys)+1)), replace=False)
+            queue.remove(customer_ids)
+            for customer_id in customer_ids.tolist():
+                del keys[customer_id]
+        if operation != 2:
+            # the heap is rebuilt by push when the stale entries are too many
+            assert len(queue.heap) <= queue.rebuild_ratio*max(len(keys), 1)
+        assert len(queue) == len(keys)
+        order = expected_order(keys)
+        num_customers, until_day = int(rng.integers(0, len(keys)+1)), int(rng.integers(0, 8))
+        # the first num_customers customers and the following ones due by until_day
+        due = [customer_id for customer_id in order[num_customers:] if keys[customer_id][0] <= until_day]
+        assert queue.ordered(num_customers, until_day) == order[:num_customers]+due